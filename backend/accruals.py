@@ -0,0 +1,500 @@
+"""Pro-rata interest accrual calculation and the daily accrual ledger.
+
+Accruals can be computed on the fly from contract columns
+(:func:`iter_accrual_batches`) or read from the ``juros_diarios`` ledger,
+which :func:`close_ledger` fills incrementally using balances taken from
+imported movements. Either source is rendered by :func:`accruals_csv`.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from io import StringIO
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.orm import Session, aliased
+
+from .exports import EXPORT_CHUNK_SIZE
+from .models import (
+    Contrato,
+    Extrato,
+    FechamentoJuros,
+    JurosDiario,
+    Movimentacao,
+    TaxaContrato,
+)
+
+ACCRUAL_BATCH_SIZE = int(os.environ.get("ACCRUAL_BATCH_SIZE", 5000))
+
+CSV_HEADER = ["contract_id", "principal", "annual_rate", "days", "interest"]
+
+# Sorted ``(vigencia, taxa_anual)`` breakpoints of a contract's rate history.
+RateHistory = List[Tuple[date, float]]
+# Column arrays keyed by ``CSV_HEADER`` names.
+AccrualBatch = Dict[str, np.ndarray]
+
+
+def compute_accruals(
+    saldo: np.ndarray,
+    taxa_anual: np.ndarray,
+    data_inicio: np.ndarray,
+    start: date,
+    end: date,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return ``(days, interest)`` arrays for a batch of contracts.
+
+    ``data_inicio`` must be a ``datetime64[D]`` array. Each contract accrues
+    from the later of ``start`` and its own start date through ``end``
+    inclusive, using ``interest = principal * annual_rate * days / 365``.
+    Contracts starting after ``end`` get zero days.
+    """
+
+    period_start = np.maximum(data_inicio, np.datetime64(start, "D"))
+    days = (np.datetime64(end, "D") - period_start).astype(np.int64) + 1
+    days = np.clip(days, 0, None)
+    interest = saldo * taxa_anual * days / 365
+    return days, interest
+
+
+def effective_rate(
+    base_rate: float, history: RateHistory, start: date, end: date
+) -> float:
+    """Return the day-weighted mean annual rate between ``start`` and ``end``.
+
+    ``history`` holds the repricing breakpoints sorted by date; ``base_rate``
+    applies before the first one. The rate in effect at ``start`` is found by
+    binary search and only the breakpoints inside the period are visited, so
+    the cost is O(log n + changes) regardless of the period length.
+    Multiplying the result by ``principal * days / 365`` gives the pro-rata
+    interest summed across every rate change.
+    """
+
+    total_days = (end - start).days + 1
+    if total_days <= 0:
+        return base_rate
+    # Search and walk ``history`` in place; a list of its dates or a slice
+    # would cost O(n) on every call.
+    idx = bisect_right(history, start, key=itemgetter(0)) - 1
+    rate = history[idx][1] if idx >= 0 else base_rate
+    weighted = 0.0
+    segment_start = start
+    for i in range(idx + 1, len(history)):
+        vigencia, next_rate = history[i]
+        if vigencia > end:
+            break
+        weighted += rate * (vigencia - segment_start).days
+        segment_start, rate = vigencia, next_rate
+    weighted += rate * ((end - segment_start).days + 1)
+    return weighted / total_days
+
+
+def load_rate_history(
+    db: Session, contrato_ids: Sequence[int], until: date
+) -> Dict[int, RateHistory]:
+    """Fetch rate breakpoints up to ``until`` for a batch of contracts."""
+
+    history: Dict[int, RateHistory] = defaultdict(list)
+    rows = db.execute(
+        select(TaxaContrato.contrato_id, TaxaContrato.vigencia, TaxaContrato.taxa_anual)
+        .where(
+            TaxaContrato.contrato_id.in_(contrato_ids),
+            TaxaContrato.vigencia <= until,
+        )
+        .order_by(TaxaContrato.contrato_id, TaxaContrato.vigencia)
+    )
+    for contrato_id, vigencia, taxa in rows:
+        history[contrato_id].append((vigencia, taxa))
+    return history
+
+
+def _compute_batch(
+    batch: Sequence, history: Dict[int, RateHistory], start: date, end: date
+) -> AccrualBatch:
+    ids, saldos, taxas, inicios = zip(*batch)
+    saldo = np.asarray(saldos, dtype=np.float64)
+    taxa = np.asarray(taxas, dtype=np.float64)
+    inicio = np.asarray(inicios, dtype="datetime64[D]")
+    # Repriced contracts use their effective rate over their own period.
+    for i, contrato_id in enumerate(ids):
+        if contrato_id in history:
+            taxa[i] = effective_rate(
+                taxas[i], history[contrato_id], max(start, inicios[i]), end
+            )
+    days, interest = compute_accruals(saldo, taxa, inicio, start, end)
+    active = days > 0
+    return {
+        "contract_id": np.asarray(ids, dtype=np.int64)[active],
+        "principal": saldo[active],
+        "annual_rate": taxa[active],
+        "days": days[active],
+        "interest": interest[active],
+    }
+
+
+def iter_accrual_batches(
+    db: Session, start: date, end: date, batch_size: int = ACCRUAL_BATCH_SIZE
+) -> Iterator[AccrualBatch]:
+    """Compute accruals for every contract active within the period.
+
+    Contract columns are fetched in batches of ``batch_size`` from a
+    server-side cursor and each batch is computed with array operations,
+    with rate histories applied through :func:`effective_rate`.
+    """
+
+    stmt = (
+        select(
+            Contrato.id,
+            Contrato.saldo,
+            Contrato.taxa_anual,
+            Contrato.data_inicio,
+        )
+        .where(Contrato.data_inicio <= end)
+        .order_by(Contrato.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for batch in db.execute(stmt).partitions(batch_size):
+        history = load_rate_history(db, [row[0] for row in batch], end)
+        yield _compute_batch(batch, history, start, end)
+
+
+def accruals_csv(
+    batches: Iterable[AccrualBatch], chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[str]:
+    """Render accrual batches as CSV, yielded in chunks of ``chunk_size``."""
+
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for batch in batches:
+        writer.writerows(
+            (cid, f"{s:.2f}", t, d, f"{i:.2f}")
+            for cid, s, t, d, i in zip(*(batch[col].tolist() for col in CSV_HEADER))
+        )
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def closed_through(db: Session) -> Optional[date]:
+    """Return the last day covered by the accrual ledger, if ever closed."""
+    return db.scalar(select(func.max(FechamentoJuros.fechado_ate)))
+
+
+def _step_values(
+    days: np.ndarray, dates: Sequence[date], values: Sequence[float], default
+) -> np.ndarray:
+    """Value in effect on each of ``days``.
+
+    That is the last of ``values`` (sorted by ``dates``) dated on or before
+    the day, or ``default`` before the first one.
+    """
+
+    if not dates:
+        return np.full(len(days), default, dtype=np.float64)
+    idx = np.searchsorted(np.array(dates, dtype="datetime64[D]"), days, side="right")
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(idx > 0, values[np.maximum(idx - 1, 0)], default)
+
+
+def _movement_balances(contrato_ids: Sequence[int]):
+    """Dated movements carrying a balance, of the given contracts."""
+
+    return (
+        select(Extrato.contrato_id, Movimentacao.data_lanc, Movimentacao.saldo)
+        .join(Extrato, Movimentacao.extrato_id == Extrato.id)
+        .where(
+            Extrato.contrato_id.in_(contrato_ids),
+            Movimentacao.saldo.is_not(None),
+            Movimentacao.data_lanc.is_not(None),
+        )
+    )
+
+
+def _daily_balances(
+    db: Session, contrato: Contrato, days: np.ndarray
+) -> np.ndarray:
+    """Return the outstanding balance of ``contrato`` for each of ``days``.
+
+    The balance on a day is the ``saldo`` of the latest movement launched on
+    or before it; before the first movement the contract's ``saldo`` applies.
+    """
+
+    first = days[0].astype(object)
+    last = days[-1].astype(object)
+    with_saldo = _movement_balances([contrato.id])
+    prior = db.execute(
+        with_saldo.where(Movimentacao.data_lanc < first)
+        .order_by(Movimentacao.data_lanc.desc(), Movimentacao.id.desc())
+        .limit(1)
+    ).all()
+    movs = prior + db.execute(
+        with_saldo.where(Movimentacao.data_lanc.between(first, last)).order_by(
+            Movimentacao.data_lanc, Movimentacao.id
+        )
+    ).all()
+    return _step_values(
+        days, [m.data_lanc for m in movs], [m.saldo for m in movs], contrato.saldo
+    )
+
+
+def _daily_rates(db: Session, contrato: Contrato, days: np.ndarray) -> np.ndarray:
+    """Return the annual rate of ``contrato`` in effect on each of ``days``."""
+
+    history = load_rate_history(db, [contrato.id], days[-1].astype(object))
+    return _rates_on(days, history.get(contrato.id, []), contrato.taxa_anual)
+
+
+def _rates_on(days: np.ndarray, history: RateHistory, base_rate: float) -> np.ndarray:
+    return _step_values(
+        days, [v for v, _ in history], [t for _, t in history], base_rate
+    )
+
+
+def refresh_contract_ledger(
+    db: Session, contrato: Contrato, since: date, until: date
+) -> int:
+    """Recompute ledger rows of ``contrato`` from ``since`` through ``until``.
+
+    Existing rows from ``since`` onwards are replaced, and rows before the
+    contract start (left over when it moved later) are dropped. Returns the
+    number of rows written; the caller commits.
+    """
+
+    db.execute(
+        delete(JurosDiario).where(
+            JurosDiario.contrato_id == contrato.id,
+            or_(JurosDiario.data >= since, JurosDiario.data < contrato.data_inicio),
+        )
+    )
+    since = max(since, contrato.data_inicio)
+    if since > until:
+        return 0
+
+    days = np.arange(
+        np.datetime64(since, "D"),
+        np.datetime64(until, "D") + 1,
+        dtype="datetime64[D]",
+    )
+    saldo = _daily_balances(db, contrato, days)
+    taxa = _daily_rates(db, contrato, days)
+    juros = saldo * taxa / 365
+    db.execute(
+        insert(JurosDiario),
+        [
+            {
+                "contrato_id": contrato.id,
+                "data": day,
+                "saldo": s,
+                "taxa_anual": t,
+                "juros": j,
+            }
+            for day, s, t, j in zip(
+                days.astype(object), saldo.tolist(), taxa.tolist(), juros.tolist()
+            )
+        ],
+    )
+    return len(days)
+
+
+def sync_contract_ledger(
+    db: Session, contrato_id: int, since: Optional[date] = None
+) -> int:
+    """Bring one contract's ledger back in line after its data changed.
+
+    Recomputes from ``since`` (default: the contract start) through the last
+    closed day. Does nothing while the ledger has never been closed.
+    """
+
+    fechado = closed_through(db)
+    contrato = db.get(Contrato, contrato_id)
+    if fechado is None or contrato is None:
+        return 0
+    return refresh_contract_ledger(
+        db, contrato, since or contrato.data_inicio, fechado
+    )
+
+
+def _balances_before(
+    db: Session, contrato_ids: Sequence[int], day: date
+) -> Dict[int, float]:
+    """Balance of the latest movement before ``day``, per contract."""
+
+    moves = _movement_balances(contrato_ids).where(Movimentacao.data_lanc < day)
+    ranked = moves.add_columns(
+        func.row_number()
+        .over(
+            partition_by=Extrato.contrato_id,
+            order_by=(Movimentacao.data_lanc.desc(), Movimentacao.id.desc()),
+        )
+        .label("ordem")
+    ).subquery()
+    return dict(
+        db.execute(
+            select(ranked.c.contrato_id, ranked.c.saldo).where(ranked.c.ordem == 1)
+        ).all()
+    )
+
+
+def _ledger_rows(
+    db: Session,
+    contratos: Sequence[Tuple[int, float, float]],
+    since: date,
+    until: date,
+    history: Dict[int, RateHistory],
+) -> List[dict]:
+    """Ledger rows from ``since`` through ``until`` of ``(id, saldo, taxa)``s.
+
+    The balance carried into ``since`` is the one on the contract's last
+    ledger day or, without one, that of its latest earlier movement. One
+    query each fetches those and the movements within the period.
+    """
+
+    ids = [contrato_id for contrato_id, _, _ in contratos]
+    days = np.arange(
+        np.datetime64(since, "D"),
+        np.datetime64(until, "D") + 1,
+        dtype="datetime64[D]",
+    )
+    carried = dict(
+        db.execute(
+            select(JurosDiario.contrato_id, JurosDiario.saldo).where(
+                JurosDiario.contrato_id.in_(ids),
+                JurosDiario.data == since - timedelta(days=1),
+            )
+        ).all()
+    )
+    missing = [contrato_id for contrato_id in ids if contrato_id not in carried]
+    if missing:
+        carried.update(_balances_before(db, missing, since))
+    movs: Dict[int, list] = defaultdict(list)
+    for contrato_id, data_lanc, saldo in db.execute(
+        _movement_balances(ids)
+        .where(Movimentacao.data_lanc.between(since, until))
+        .order_by(Extrato.contrato_id, Movimentacao.data_lanc, Movimentacao.id)
+    ):
+        movs[contrato_id].append((data_lanc, saldo))
+
+    rows = []
+    dias = days.astype(object)
+    for contrato_id, saldo_base, taxa_base in contratos:
+        moves = movs.get(contrato_id, [])
+        saldo = _step_values(
+            days,
+            [d for d, _ in moves],
+            [v for _, v in moves],
+            carried.get(contrato_id, saldo_base),
+        )
+        taxa = _rates_on(days, history.get(contrato_id, []), taxa_base)
+        juros = saldo * taxa / 365
+        rows.extend(
+            {
+                "contrato_id": contrato_id,
+                "data": day,
+                "saldo": s,
+                "taxa_anual": t,
+                "juros": j,
+            }
+            for day, s, t, j in zip(dias, saldo.tolist(), taxa.tolist(), juros.tolist())
+        )
+    return rows
+
+
+def close_ledger(
+    db: Session, until: date, batch_size: int = ACCRUAL_BATCH_SIZE
+) -> int:
+    """Extend the ledger of every contract through ``until``.
+
+    Contracts are read in batches of ``batch_size`` with their last ledger
+    day, and only the days after it are computed. Within a batch, the
+    contracts resuming on the same day share their queries. On a daily
+    close that is nearly all of them, so the close costs a few statements
+    per batch rather than several per contract. Returns the number of rows
+    written and records the close; the caller commits.
+    """
+
+    ultimo = (
+        select(func.max(JurosDiario.data))
+        .where(JurosDiario.contrato_id == Contrato.id)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(
+            Contrato.id,
+            Contrato.saldo,
+            Contrato.taxa_anual,
+            Contrato.data_inicio,
+            ultimo,
+        )
+        .where(Contrato.data_inicio <= until)
+        .order_by(Contrato.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    written = 0
+    for batch in db.execute(stmt).partitions(batch_size):
+        pending: Dict[date, list] = defaultdict(list)
+        for contrato_id, saldo, taxa, inicio, last in batch:
+            since = last + timedelta(days=1) if last else inicio
+            if since <= until:
+                pending[since].append((contrato_id, saldo, taxa))
+        if not pending:
+            continue
+        history = load_rate_history(
+            db, [c[0] for group in pending.values() for c in group], until
+        )
+        rows = []
+        for since, contratos in pending.items():
+            rows.extend(_ledger_rows(db, contratos, since, until, history))
+        db.execute(insert(JurosDiario), rows)
+        written += len(rows)
+
+    db.add(FechamentoJuros(fechado_ate=until, executado_em=datetime.utcnow()))
+    return written
+
+
+def iter_ledger_batches(
+    db: Session, start: date, end: date, batch_size: int = ACCRUAL_BATCH_SIZE
+) -> Iterator[AccrualBatch]:
+    """Aggregate precomputed ledger rows per contract for the period.
+
+    ``principal`` and ``annual_rate`` are the values in effect on ``end``;
+    ``interest`` is the sum of the daily accruals within the period.
+    """
+
+    ultimo = aliased(JurosDiario)
+    stmt = (
+        select(
+            JurosDiario.contrato_id,
+            ultimo.saldo,
+            ultimo.taxa_anual,
+            func.count(),
+            func.sum(JurosDiario.juros),
+        )
+        .join(
+            ultimo,
+            (ultimo.contrato_id == JurosDiario.contrato_id) & (ultimo.data == end),
+        )
+        .where(JurosDiario.data.between(start, end))
+        .group_by(JurosDiario.contrato_id, ultimo.saldo, ultimo.taxa_anual)
+        .order_by(JurosDiario.contrato_id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for batch in db.execute(stmt).partitions(batch_size):
+        ids, saldos, taxas, days, juros = zip(*batch)
+        yield {
+            "contract_id": np.asarray(ids, dtype=np.int64),
+            "principal": np.asarray(saldos, dtype=np.float64),
+            "annual_rate": np.asarray(taxas, dtype=np.float64),
+            "days": np.asarray(days, dtype=np.int64),
+            "interest": np.asarray(juros, dtype=np.float64),
+        }
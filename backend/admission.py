@@ -0,0 +1,155 @@
+"""Admission control for statement uploads.
+
+Before an upload is accepted, :meth:`UploadAdmission.check` looks at the
+total depth of the upload queues (shared and per tenant) and at the pages a
+tenant (empresa) already has waiting:
+
+* above ``UPLOAD_MAX_QUEUE_DEPTH`` queued jobs, or with more than
+  ``UPLOAD_MAX_PENDING_PAGES`` pages pending for the tenant, the upload is
+  refused with ``429`` and a ``Retry-After`` estimated from the backlog;
+* above ``UPLOAD_DEFER_PENDING_PAGES`` the job goes to the low-priority
+  queue, which workers only drain when ``uploads`` is empty.
+
+Pending pages are tracked per tenant in a Redis hash keyed by extrato id:
+reserved at upload, released by ``tasks.parse_sicoob`` when it finishes.
+Releases are idempotent and the hash expires after
+``UPLOAD_PENDING_TTL`` seconds without activity, so a crashed job cannot
+block a tenant forever. Redis errors fail open. With a local job backend
+(``JOB_BACKEND=thread|process``) only the depth of the in-process pool is
+limited and Redis is not used.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import re
+from typing import Optional
+
+from fastapi import HTTPException
+from redis import Redis
+from redis.exceptions import RedisError
+from rq import Queue
+
+from .config import get_redis
+from .jobs import is_local, local_backend
+from .scheduling import UPLOAD_LOW_QUEUE, UPLOAD_QUEUE, upload_queue_names
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_MAX_QUEUE_DEPTH = int(os.environ.get("UPLOAD_MAX_QUEUE_DEPTH", 1000))
+UPLOAD_MAX_PENDING_PAGES = int(os.environ.get("UPLOAD_MAX_PENDING_PAGES", 5000))
+UPLOAD_DEFER_PENDING_PAGES = int(
+    os.environ.get("UPLOAD_DEFER_PENDING_PAGES", 1000)
+)
+# Estimated processing time of one page, used for ``Retry-After``.
+UPLOAD_SECONDS_PER_PAGE = float(os.environ.get("UPLOAD_SECONDS_PER_PAGE", 0.5))
+UPLOAD_RETRY_AFTER_MIN = int(os.environ.get("UPLOAD_RETRY_AFTER_MIN", 10))
+UPLOAD_RETRY_AFTER_MAX = int(os.environ.get("UPLOAD_RETRY_AFTER_MAX", 3600))
+UPLOAD_PENDING_TTL = int(os.environ.get("UPLOAD_PENDING_TTL", 6 * 3600))
+# Page estimate for PDFs whose page objects are inside compressed streams.
+UPLOAD_BYTES_PER_PAGE = int(
+    os.environ.get("UPLOAD_BYTES_PER_PAGE", 100 * 1024)
+)
+
+_PAGE_RE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+def estimate_pages(content: bytes) -> int:
+    """Estimate the page count of a PDF without parsing it."""
+
+    pages = len(_PAGE_RE.findall(content))
+    if pages:
+        return pages
+    return max(1, math.ceil(len(content) / UPLOAD_BYTES_PER_PAGE))
+
+
+class UploadAdmission:
+    """Queue-depth and per-tenant backlog limits for uploads."""
+
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+        self.enabled = True
+        self.max_queue_depth = UPLOAD_MAX_QUEUE_DEPTH
+        self.max_pending_pages = UPLOAD_MAX_PENDING_PAGES
+        self.defer_pending_pages = UPLOAD_DEFER_PENDING_PAGES
+        # Per-tenant page accounting lives in Redis, next to the RQ queues.
+        self.track_pages = not is_local()
+
+    def _key(self, tenant: int) -> str:
+        return f"uploads:pending_pages:{tenant}"
+
+    def queue_depth(self) -> int:
+        if is_local():
+            return local_backend().count()
+        return sum(
+            Queue(name, connection=self.redis).count
+            for name in upload_queue_names(self.redis)
+        )
+
+    def pending_pages(self, tenant: int) -> int:
+        if not self.track_pages:
+            return 0
+        return sum(int(v) for v in self.redis.hvals(self._key(tenant)))
+
+    def _retry_after(self, pages: int) -> str:
+        seconds = math.ceil(pages * UPLOAD_SECONDS_PER_PAGE)
+        seconds = min(max(seconds, UPLOAD_RETRY_AFTER_MIN), UPLOAD_RETRY_AFTER_MAX)
+        return str(seconds)
+
+    def _reject(self, detail: str, pages: int) -> HTTPException:
+        return HTTPException(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": self._retry_after(pages)},
+        )
+
+    def check(self, tenant: int, pages: int) -> str:
+        """Return the queue for a new upload of ``pages``, or raise ``429``."""
+
+        if not self.enabled:
+            return UPLOAD_QUEUE
+        try:
+            depth = self.queue_depth()
+            pending = self.pending_pages(tenant)
+        except RedisError as exc:
+            logger.warning("Controle de admissão indisponível: %s", exc)
+            return UPLOAD_QUEUE
+
+        if depth >= self.max_queue_depth:
+            # Without per-job sizes, assume queued jobs are one page each.
+            raise self._reject("Upload queue is full, try again later", depth)
+        if pending + pages > self.max_pending_pages:
+            raise self._reject(
+                "Too many pages pending for this company, try again later", pending
+            )
+        if pending + pages > self.defer_pending_pages:
+            return UPLOAD_LOW_QUEUE
+        return UPLOAD_QUEUE
+
+    def reserve(self, tenant: int, extrato_id: int, pages: int) -> None:
+        if not self.enabled or not self.track_pages:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(self._key(tenant), str(extrato_id), pages)
+            pipe.expire(self._key(tenant), UPLOAD_PENDING_TTL)
+            pipe.execute()
+        except RedisError as exc:
+            logger.warning(
+                "Falha ao reservar páginas do extrato %s: %s", extrato_id, exc
+            )
+
+    def release(self, tenant: Optional[int], extrato_id: int) -> None:
+        if tenant is None or not self.enabled or not self.track_pages:
+            return
+        try:
+            self.redis.hdel(self._key(tenant), str(extrato_id))
+        except RedisError as exc:
+            logger.warning(
+                "Falha ao liberar páginas do extrato %s: %s", extrato_id, exc
+            )
+
+
+upload_admission = UploadAdmission(get_redis())
@@ -0,0 +1,200 @@
+"""Authentication: user store, password hashing and JWT access tokens.
+
+Password hashes live in the ``usuarios`` table; nothing is hashed at import.
+bcrypt is deliberately slow, so it only runs in worker threads (``login`` is
+a sync endpoint), never on the event loop. Verified tokens are kept in a
+small TTL cache so authenticated requests skip JWT decoding and the user
+lookup.
+
+Create or update a user with::
+
+    python -m backend.auth create-user <username>
+"""
+
+from __future__ import annotations
+
+import argparse
+import getpass
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .models import Usuario
+
+SECRET_KEY = os.environ.get("SECRET_KEY", "secret")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 30
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", 1024))
+# Seconds a verified token is trusted without re-checking the user.
+AUTH_TOKEN_CACHE_TTL = float(os.environ.get("AUTH_TOKEN_CACHE_TTL", 60))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def authenticate_user(
+    db: Session, username: str, password: str
+) -> Optional[Usuario]:
+    """Return the active user matching the credentials (blocking: bcrypt)."""
+
+    user = db.scalar(select(Usuario).where(Usuario.username == username))
+    if user is None or not user.ativo:
+        # Spend the same time as a real check so unknown names are not revealed.
+        pwd_context.dummy_verify()
+        return None
+    if not verify_password(password, user.senha_hash):
+        return None
+    return user
+
+
+def create_access_token(data: dict, expires_delta: timedelta | None = None):
+    to_encode = data.copy()
+    expire = datetime.utcnow() + (
+        expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    to_encode.update({"exp": expire})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+class TokenCache:
+    """LRU of verified tokens bounded by ``maxsize``.
+
+    Entries live ``ttl`` seconds at most and never past the token's expiry.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return user
+
+    def put(self, token: str, user: dict, exp: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        lifetime = self.ttl
+        if exp is not None:
+            lifetime = min(lifetime, exp - time.time())
+        if lifetime <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (time.monotonic() + lifetime, user)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_CACHE_TTL)
+
+
+def _user_is_active(username: str) -> bool:
+    with SessionLocal() as db:
+        return bool(
+            db.scalar(
+                select(Usuario.id).where(
+                    Usuario.username == username, Usuario.ativo.is_(True)
+                )
+            )
+        )
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
+    credentials_exception = HTTPException(
+        status_code=401,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    username: str | None = payload.get("sub")
+    if not username or not await run_in_threadpool(_user_is_active, username):
+        raise credentials_exception
+    user = {"username": username}
+    token_cache.put(token, user, payload.get("exp"))
+    return user
+
+
+def create_user(username: str, password: str) -> None:
+    """Create ``username`` or reset its password and reactivate it."""
+
+    with SessionLocal() as db:
+        user = db.scalar(select(Usuario).where(Usuario.username == username))
+        if user is None:
+            user = Usuario(username=username)
+            db.add(user)
+        user.senha_hash = hash_password(password)
+        user.ativo = True
+        db.commit()
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.auth")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create-user", help="create or update a user")
+    create.add_argument("username")
+    create.add_argument(
+        "--password-stdin",
+        action="store_true",
+        help="read the password from standard input instead of prompting",
+    )
+    args = parser.parse_args(argv)
+
+    if args.password_stdin:
+        password = sys.stdin.readline().rstrip("\n")
+    else:
+        password = getpass.getpass("Senha: ")
+        if password != getpass.getpass("Confirme a senha: "):
+            print("As senhas não conferem.", file=sys.stderr)
+            return 1
+    if not password:
+        print("Senha vazia.", file=sys.stderr)
+        return 1
+    create_user(args.username, password)
+    print(f"Usuário {args.username} salvo.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
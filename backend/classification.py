@@ -0,0 +1,46 @@
+"""Registered versions of the classification rules.
+
+Every import records the configuration its movements were classified with
+in ``regras_contabeis`` (:func:`register_rules`). When the rules change,
+``tasks.reclassify_movimentacoes`` compares that configuration with the
+current one and reclassifies only the movements containing an affected
+keyword; the others keep their accounts and version, and
+:func:`valid_versions` tells the exports which versions are still as good as
+the current one.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import RegrasContabeis
+
+
+def register_rules(db: Session, versao: str, cfg: dict) -> None:
+    """Record ``cfg`` as rules version ``versao`` unless already known.
+
+    ``INSERT ... ON CONFLICT DO NOTHING``, so concurrent imports do not
+    collide; the row is written with the caller's transaction.
+    """
+
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(RegrasContabeis).values(
+        versao=versao, config=cfg, registrada_em=datetime.utcnow()
+    )
+    db.execute(stmt.on_conflict_do_nothing(index_elements=[RegrasContabeis.versao]))
+
+
+def valid_versions(db: Session, versao: str) -> Set[Optional[str]]:
+    """Versions whose stored accounts are the ones ``versao`` assigns."""
+
+    synced = db.scalars(
+        select(RegrasContabeis.versao).where(
+            RegrasContabeis.sincronizada_com == versao
+        )
+    )
+    return {versao, *synced}
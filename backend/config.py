@@ -2,6 +2,7 @@ import os
 from redis import Redis
 from functools import lru_cache
 
+
 @lru_cache()
 def get_redis() -> Redis:
     """Return a Redis connection using environment variables.
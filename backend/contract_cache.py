@@ -0,0 +1,129 @@
+"""Redis cache of serialized contract responses.
+
+Keys embed a version counter (``contracts:version``); writes bump it, so every
+cached entry becomes unreachable at once and simply expires. Recomputation
+is single-flight: on a miss one request takes a short lock and rebuilds the
+entry while the others poll for it, so a bump does not send every concurrent
+reader to the database.
+
+Misses are filled from the primary database, not the read replica: a
+replica lagging behind the write that bumped the version would otherwise
+put stale data under the new version for the whole TTL.
+
+The cache fails open: if Redis errors, the value is computed directly and the
+cache is bypassed for ``CONTRACT_CACHE_RETRY`` seconds so requests do not
+each wait on a dead connection.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+import uuid
+from typing import Callable, Optional
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from .config import get_redis
+
+logger = logging.getLogger(__name__)
+
+CONTRACT_CACHE_TTL = int(os.environ.get("CONTRACT_CACHE_TTL", 300))
+CONTRACT_CACHE_LOCK_TIMEOUT = float(os.environ.get("CONTRACT_CACHE_LOCK_TIMEOUT", 5))
+CONTRACT_CACHE_WAIT = float(os.environ.get("CONTRACT_CACHE_WAIT", 2))
+CONTRACT_CACHE_RETRY = float(os.environ.get("CONTRACT_CACHE_RETRY", 30))
+
+
+class ContractCache:
+    """Versioned, single-flight cache of byte payloads; ``ttl <= 0`` disables it."""
+
+    poll_interval = 0.05
+
+    def __init__(self, redis: Redis, ttl: int, prefix: str = "contracts") -> None:
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+        self.lock_timeout = CONTRACT_CACHE_LOCK_TIMEOUT
+        self.wait = CONTRACT_CACHE_WAIT
+        self._retry_at = 0.0
+
+    @property
+    def _version_key(self) -> str:
+        return f"{self.prefix}:version"
+
+    def _available(self) -> bool:
+        return self.ttl > 0 and time.monotonic() >= self._retry_at
+
+    def _trip(self, exc: RedisError) -> None:
+        logger.warning("Cache de contratos indisponível: %s", exc)
+        self._retry_at = time.monotonic() + CONTRACT_CACHE_RETRY
+
+    def get_or_compute(self, name: str, compute: Callable[[], bytes]) -> bytes:
+        """Return the cached payload for ``name``, computing it on a miss."""
+
+        if not self._available():
+            return compute()
+        try:
+            version = int(self.redis.get(self._version_key) or 0)
+            key = f"{self.prefix}:v{version}:{name}"
+            value = self.redis.get(key)
+            if value is not None:
+                return value
+            token = uuid.uuid4().hex
+            leader = self.redis.set(
+                f"{key}:lock", token, nx=True, px=int(self.lock_timeout * 1000)
+            )
+        except RedisError as exc:
+            self._trip(exc)
+            return compute()
+
+        if not leader:
+            value = self._wait_for(key)
+            return value if value is not None else compute()
+        value = None
+        try:
+            # The previous leader may have stored it since our miss.
+            value = self.redis.get(key)
+            if value is None:
+                value = compute()
+                self.redis.set(key, value, ex=self.ttl)
+        except RedisError as exc:
+            self._trip(exc)
+        finally:
+            self._release(f"{key}:lock", token)
+        return value if value is not None else compute()
+
+    def _wait_for(self, key: str) -> Optional[bytes]:
+        deadline = time.monotonic() + self.wait
+        try:
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                value = self.redis.get(key)
+                if value is not None:
+                    return value
+        except RedisError as exc:
+            self._trip(exc)
+        return None
+
+    def _release(self, lock: str, token: str) -> None:
+        try:
+            if self.redis.get(lock) == token.encode():
+                self.redis.delete(lock)
+        except RedisError:
+            pass
+
+    def invalidate(self) -> None:
+        """Bump the version so every cached entry is bypassed."""
+
+        if self.ttl <= 0:
+            return
+        try:
+            self.redis.incr(self._version_key)
+        except RedisError as exc:
+            # Entries still expire after ``ttl``.
+            logger.error("Falha ao invalidar cache de contratos: %s", exc)
+
+
+contract_cache = ContractCache(get_redis(), CONTRACT_CACHE_TTL)
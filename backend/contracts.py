@@ -0,0 +1,42 @@
+"""Contract removal shared by the API and the background purge.
+
+``DELETE /contracts/{id}`` removes small contracts in the request and hands
+large ones to ``tasks.purge_contract``; both finish with
+:func:`delete_contract_rows`. It lives here rather than in ``tasks`` so the
+API does not import the parsers and other worker-only modules.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from .models import (
+    Contrato,
+    Extrato,
+    JurosDiario,
+    Movimentacao,
+    ResumoContrato,
+    TaxaContrato,
+)
+
+
+def delete_contract_rows(session: Session, contract_id: int) -> None:
+    """Delete a contract and the rows below it with set-based statements.
+
+    Children go first, so the result does not depend on the database
+    enforcing ``ON DELETE CASCADE`` (SQLite only does with
+    ``PRAGMA foreign_keys``). Objects already loaded in ``session`` are not
+    synchronized.
+    """
+
+    extratos = select(Extrato.id).where(Extrato.contrato_id == contract_id)
+    for stmt in (
+        delete(Movimentacao).where(Movimentacao.extrato_id.in_(extratos)),
+        delete(Extrato).where(Extrato.contrato_id == contract_id),
+        delete(JurosDiario).where(JurosDiario.contrato_id == contract_id),
+        delete(TaxaContrato).where(TaxaContrato.contrato_id == contract_id),
+        delete(ResumoContrato).where(ResumoContrato.contrato_id == contract_id),
+        delete(Contrato).where(Contrato.id == contract_id),
+    ):
+        session.execute(stmt, execution_options={"synchronize_session": False})
@@ -0,0 +1,29 @@
+"""RQ cron configuration for periodic maintenance jobs.
+
+Run with ``rq cron backend.cron``.
+"""
+
+import os
+
+from rq import cron
+
+from backend.tasks import (
+    close_accruals,
+    maintain_partitions,
+    reclassify_movimentacoes,
+)
+
+ACCRUAL_CLOSE_CRON = os.environ.get("ACCRUAL_CLOSE_CRON", "15 0 * * *")
+PARTITION_MAINTENANCE_CRON = os.environ.get(
+    "PARTITION_MAINTENANCE_CRON", "30 1 * * *"
+)
+# Checks whether account_rules.json changed; a no-op when it did not.
+RULES_SYNC_CRON = os.environ.get("RULES_SYNC_CRON", "*/5 * * * *")
+
+cron.register(close_accruals, queue_name="uploads", cron=ACCRUAL_CLOSE_CRON)
+cron.register(
+    maintain_partitions, queue_name="uploads", cron=PARTITION_MAINTENANCE_CRON
+)
+cron.register(
+    reclassify_movimentacoes, queue_name="uploads", cron=RULES_SYNC_CRON
+)
@@ -0,0 +1,138 @@
+"""On-disk cache of rendered export files.
+
+Entries are keyed by endpoint, query parameters, rules version and the data
+version of the extratos involved, so any change to those produces a new key.
+Files are prefixed with a tag (e.g. ``empresa12``) so every entry of a tenant
+can be dropped when new movements are imported. The total size is kept under
+a budget by evicting the least recently used files.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .models import Contrato, Extrato
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CACHE_DIR = os.environ.get("EXPORT_CACHE_DIR", "export_cache")
+EXPORT_CACHE_MAX_BYTES = int(
+    os.environ.get("EXPORT_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+)
+
+
+def empresa_tag(empresa_id: int) -> str:
+    return f"empresa{empresa_id}"
+
+
+def empresa_data_version(db: Session, empresa_id: int) -> str:
+    """Return a token that changes whenever the empresa's extratos change."""
+
+    count, last_id = db.execute(
+        select(func.count(Extrato.id), func.max(Extrato.id))
+        .join(Contrato, Extrato.contrato_id == Contrato.id)
+        .where(Contrato.empresa_id == empresa_id, Extrato.status == "importado")
+    ).one()
+    return f"{count}:{last_id or 0}"
+
+
+class ExportCache:
+    """LRU file cache bounded by ``max_bytes``."""
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, tag: str, endpoint: str, **params) -> str:
+        digest = hashlib.sha256(
+            json.dumps([endpoint, params], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f"{tag}-{digest}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[BinaryIO]:
+        """Open a cached file for reading, marking it as recently used.
+
+        The caller reads and closes the returned file. Once opened it stays
+        readable even if :meth:`evict` or :meth:`invalidate` unlinks the
+        entry concurrently.
+        """
+
+        try:
+            f = open(self._path(key), "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(f.fileno())
+        return f
+
+    def store(
+        self, key: str, chunks: Iterable[Union[str, bytes]]
+    ) -> Iterator[Union[str, bytes]]:
+        """Yield ``chunks`` unchanged while writing them to the cache.
+
+        The file only becomes visible once the stream completes, so an
+        aborted download never leaves a truncated entry behind.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        complete = False
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk.encode() if isinstance(chunk, str) else chunk)
+                    yield chunk
+            os.replace(tmp_path, self._path(key))
+            complete = True
+        finally:
+            if not complete:
+                os.unlink(tmp_path)
+        self.evict()
+
+    def invalidate(self, tag: str) -> int:
+        """Remove every entry stored under ``tag``."""
+
+        removed = 0
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            if name.startswith(f"{tag}-"):
+                try:
+                    os.unlink(self._path(name))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def evict(self) -> None:
+        """Delete least recently used entries until within the size budget."""
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith(".tmp-"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+export_cache = ExportCache(EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_BYTES)
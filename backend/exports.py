@@ -0,0 +1,329 @@
+"""Helpers for streaming export responses."""
+
+from __future__ import annotations
+
+import csv
+import os
+import zlib
+from datetime import date
+from io import StringIO
+from typing import (
+    BinaryIO,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .classification import valid_versions
+from .models import Contrato, Extrato, Movimentacao
+from .rules import classify, current_version
+
+try:  # pragma: no cover - optional dependency
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 64 * 1024))
+EXPORT_YIELD_PER = int(os.environ.get("EXPORT_YIELD_PER", 2000))
+
+# Media type and file extension of each export format.
+EXPORT_FORMATS = {
+    "sci": ("text/plain", "txt"),
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+BINARY_FORMATS = {"arrow", "parquet"}
+# Formats that are already compressed and are sent as is.
+COMPRESSED_FORMATS = {"parquet"}
+
+EXPORT_GZIP_LEVEL = int(os.environ.get("EXPORT_GZIP_LEVEL", 6))
+EXPORT_ZSTD_LEVEL = int(os.environ.get("EXPORT_ZSTD_LEVEL", 3))
+
+# File extension and media type of compressed downloads.
+COMPRESSED_DOWNLOADS = {
+    "gzip": ("gz", "application/gzip"),
+    "zstd": ("zst", "application/zstd"),
+}
+
+# (data, conta_debito, conta_credito, valor, historico)
+TransactionRecord = Tuple[date, str, str, float, str]
+
+TRANSACTION_SCHEMA = pa.schema(
+    [
+        ("date", pa.date32()),
+        ("debit_account", pa.string()),
+        ("credit_account", pa.string()),
+        ("amount", pa.float64()),
+        ("description", pa.string()),
+    ]
+)
+ACCRUAL_SCHEMA = pa.schema(
+    [
+        ("contract_id", pa.int64()),
+        ("principal", pa.float64()),
+        ("annual_rate", pa.float64()),
+        ("days", pa.int64()),
+        ("interest", pa.float64()),
+    ]
+)
+
+
+def chunked(
+    lines: Iterable[str], chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[str]:
+    """Group ``lines`` into strings of roughly ``chunk_size`` characters.
+
+    Yielding one string per line makes the ASGI server write one tiny frame
+    per row; buffering keeps writes large while memory stays bounded.
+    """
+
+    buffer: list[str] = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def iter_transactions(
+    db: Session, empresa_id: int, start: date, end: date
+) -> Iterator[TransactionRecord]:
+    """Yield classified movements of ``empresa_id`` launched within the period.
+
+    Rows come as column tuples from a server-side cursor: no ORM identity
+    map and only ``EXPORT_YIELD_PER`` rows held in memory at a time.
+    """
+
+    stmt = (
+        select(
+            Movimentacao.data_lanc,
+            Movimentacao.data_ref,
+            Movimentacao.descricao,
+            Movimentacao.valor_debito,
+            Movimentacao.valor_credito,
+            Movimentacao.conta_debito,
+            Movimentacao.conta_credito,
+            Movimentacao.regras_versao,
+        )
+        .join(Extrato, Movimentacao.extrato_id == Extrato.id)
+        .join(Contrato, Extrato.contrato_id == Contrato.id)
+        .where(
+            Contrato.empresa_id == empresa_id,
+            Movimentacao.data_lanc >= start,
+            Movimentacao.data_lanc <= end,
+        )
+        .order_by(Movimentacao.data_lanc)
+        .execution_options(stream_results=True, yield_per=EXPORT_YIELD_PER)
+    )
+
+    versoes = valid_versions(db, current_version())
+    for row in db.execute(stmt):
+        debito, credito = row.conta_debito, row.conta_credito
+        if row.regras_versao not in versoes:
+            # Not yet reclassified under the current rules.
+            debito, credito = classify(row.descricao or "")
+        valor = row.valor_debito or row.valor_credito or 0
+        yield (
+            row.data_lanc or row.data_ref or start,
+            debito,
+            credito,
+            valor,
+            row.descricao or "",
+        )
+
+
+def transactions_sci(records: Iterable[TransactionRecord]) -> Iterator[str]:
+    """Render records as SCI TXT lines."""
+
+    for data, debito, credito, valor, historico in records:
+        yield (
+            f"{data.strftime('%d/%m/%Y')};{debito};{credito};"
+            f"{valor:.2f};{historico}\n"
+        )
+
+
+def transactions_csv(
+    records: Iterable[TransactionRecord], chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[str]:
+    """Render records as CSV with ISO dates, in chunks of ``chunk_size``."""
+
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(TRANSACTION_SCHEMA.names)
+    for data, debito, credito, valor, historico in records:
+        writer.writerow([data.isoformat(), debito, credito, f"{valor:.2f}", historico])
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def record_batches(
+    rows: Iterable[Sequence],
+    schema: pa.Schema,
+    batch_size: int = EXPORT_YIELD_PER,
+) -> Iterator[pa.RecordBatch]:
+    """Group row tuples into Arrow record batches of ``batch_size`` rows."""
+
+    columns: List[list] = [[] for _ in schema.names]
+    for row in rows:
+        for column, value in zip(columns, row):
+            column.append(value)
+        if len(columns[0]) >= batch_size:
+            yield pa.record_batch(columns, schema=schema)
+            columns = [[] for _ in schema.names]
+    if columns[0]:
+        yield pa.record_batch(columns, schema=schema)
+
+
+def column_batches(
+    batches: Iterable[Mapping[str, Sequence]], schema: pa.Schema
+) -> Iterator[pa.RecordBatch]:
+    """Convert column mappings (e.g. NumPy arrays) into Arrow record batches."""
+
+    for batch in batches:
+        yield pa.record_batch([batch[name] for name in schema.names], schema=schema)
+
+
+class _DrainableSink:
+    """Write-only file object whose contents are handed out as they arrive."""
+
+    closed = False
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_arrow(
+    batches: Iterable[pa.RecordBatch], schema: pa.Schema, fmt: str
+) -> Iterator[bytes]:
+    """Stream record batches as an Arrow IPC stream or a Parquet file.
+
+    Each record batch becomes one IPC message or one Parquet row group and
+    is yielded as soon as it is encoded, so memory stays bounded by the
+    batch size.
+    """
+
+    sink = _DrainableSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for batch in batches:
+        writer.write_batch(batch)
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def available_encodings() -> List[str]:
+    """Return supported content codings, most preferred first."""
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick a content coding from an ``Accept-Encoding`` header.
+
+    The client's q-values take precedence; ties are broken by the server
+    preference of :func:`available_encodings`. Returns ``None`` when the
+    body should be sent uncompressed.
+    """
+
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    supported = available_encodings()
+    candidates = [
+        (weights.get(coding, weights.get("*", 0.0)), -rank, coding)
+        for rank, coding in enumerate(supported)
+    ]
+    q, _, coding = max(candidates)
+    return coding if q > 0 else None
+
+
+def compress_stream(
+    chunks: Iterable[Union[str, bytes]], encoding: str
+) -> Iterator[bytes]:
+    """Compress ``chunks`` incrementally with ``gzip`` or ``zstd``.
+
+    Only the compressor state is kept in memory; output is yielded as soon
+    as the compressor emits it.
+    """
+
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression is not available")
+        compressor = zstandard.ZstdCompressor(level=EXPORT_ZSTD_LEVEL).compressobj()
+    elif encoding == "gzip":
+        compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31)
+    else:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    tail = compressor.flush()
+    if tail:
+        yield tail
+
+
+def iter_file(f: BinaryIO, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Read the open file ``f`` in chunks of ``chunk_size`` bytes, then close it."""
+
+    with f:
+        while chunk := f.read(chunk_size):
+            yield chunk
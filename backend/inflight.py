@@ -0,0 +1,191 @@
+"""In-flight statement imports: duplicate detection and cancellation.
+
+An upload claims ``uploads:inflight:<sha256>:<contract_id>`` with the id of
+its extrato; a second upload of the same file for the same contract while the
+first one is queued or running gets that extrato back instead of a new job.
+``tasks.parse_sicoob`` releases the claim when it finishes. A claim whose
+extrato is no longer in ``fila`` (its worker died) is taken over by the next
+upload, and the key expires after ``UPLOAD_INFLIGHT_TTL`` seconds anyway.
+
+Cancellation is cooperative: ``POST /uploads/{id}/cancel`` sets
+``uploads:cancel:<extrato_id>`` and the task checks it before starting and
+between pages. Redis errors fail open (no deduplication, no cancellation).
+With ``JOB_BACKEND=thread`` the flags live in process memory instead; the
+``process`` backend still needs Redis for them, as its jobs run in other
+processes.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from .config import get_redis
+from .jobs import JOB_BACKEND
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_INFLIGHT_TTL = int(os.environ.get("UPLOAD_INFLIGHT_TTL", 6 * 3600))
+UPLOAD_CANCEL_TTL = int(os.environ.get("UPLOAD_CANCEL_TTL", 24 * 3600))
+
+# Compare-and-delete / compare-and-set of a claim, so that a job never drops
+# or overwrites a claim another upload took in the meantime.
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+REPLACE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class MemoryStore:
+    """The few Redis string commands used here, kept in process memory."""
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry[1]:
+            del self._data[key]
+            return None
+        return entry[0]
+
+    def set(self, key: str, value, nx: bool = False, ex: Optional[int] = None):
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return None
+            expires = time.monotonic() + ex if ex else float("inf")
+            self._data[key] = (str(value).encode(), expires)
+            return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(key)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def eval(self, script: str, numkeys: int, key: str, *args) -> int:
+        """Run :data:`RELEASE_SCRIPT` or :data:`REPLACE_SCRIPT`."""
+
+        with self._lock:
+            if self._live(key) != str(args[0]).encode():
+                return 0
+            if script == RELEASE_SCRIPT:
+                del self._data[key]
+            elif script == REPLACE_SCRIPT:
+                expires = time.monotonic() + int(args[2])
+                self._data[key] = (str(args[1]).encode(), expires)
+            else:
+                raise ValueError("Script não suportado")
+            return 1
+
+
+class UploadRegistry:
+    """Claims on in-flight (file, contract) pairs and cancellation flags."""
+
+    def __init__(self, redis) -> None:
+        self.redis = redis
+        self.enabled = True
+
+    def _inflight_key(self, sha256: str, contract_id: int) -> str:
+        return f"uploads:inflight:{sha256}:{contract_id}"
+
+    def _cancel_key(self, extrato_id: int) -> str:
+        return f"uploads:cancel:{extrato_id}"
+
+    def inflight(self, sha256: str, contract_id: int) -> Optional[int]:
+        """Extrato currently importing this file for this contract, if any."""
+
+        if not self.enabled:
+            return None
+        try:
+            value = self.redis.get(self._inflight_key(sha256, contract_id))
+        except RedisError as exc:
+            logger.warning("Registro de importações indisponível: %s", exc)
+            return None
+        return int(value) if value is not None else None
+
+    def claim(self, sha256: str, contract_id: int, extrato_id: int) -> Optional[int]:
+        """Claim the pair for ``extrato_id``; return the owner if already taken."""
+
+        if not self.enabled:
+            return None
+        key = self._inflight_key(sha256, contract_id)
+        try:
+            if self.redis.set(key, extrato_id, nx=True, ex=UPLOAD_INFLIGHT_TTL):
+                return None
+            owner = self.redis.get(key)
+        except RedisError as exc:
+            logger.warning("Registro de importações indisponível: %s", exc)
+            return None
+        # The owner may have finished between both commands: keep our job.
+        return int(owner) if owner is not None else None
+
+    def replace(
+        self, sha256: str, contract_id: int, stale_id: int, extrato_id: int
+    ) -> bool:
+        """Hand the claim of ``stale_id`` over to ``extrato_id``."""
+
+        if not self.enabled:
+            return False
+        key = self._inflight_key(sha256, contract_id)
+        try:
+            return bool(
+                self.redis.eval(
+                    REPLACE_SCRIPT,
+                    1,
+                    key,
+                    stale_id,
+                    extrato_id,
+                    UPLOAD_INFLIGHT_TTL,
+                )
+            )
+        except RedisError as exc:
+            logger.warning("Registro de importações indisponível: %s", exc)
+            return False
+
+    def release(self, sha256: str, contract_id: int, extrato_id: int) -> None:
+        if not self.enabled:
+            return
+        key = self._inflight_key(sha256, contract_id)
+        try:
+            self.redis.eval(RELEASE_SCRIPT, 1, key, extrato_id)
+        except RedisError as exc:
+            logger.warning("Falha ao liberar importação %s: %s", extrato_id, exc)
+
+    def cancel(self, extrato_id: int) -> None:
+        """Ask the job of ``extrato_id`` to stop; raises ``RedisError``."""
+
+        self.redis.set(self._cancel_key(extrato_id), 1, ex=UPLOAD_CANCEL_TTL)
+
+    def is_cancelled(self, extrato_id: int) -> bool:
+        if not self.enabled:
+            return False
+        try:
+            return self.redis.get(self._cancel_key(extrato_id)) is not None
+        except RedisError as exc:
+            logger.warning("Falha ao consultar cancelamento: %s", exc)
+            return False
+
+
+upload_registry = UploadRegistry(
+    MemoryStore() if JOB_BACKEND == "thread" else get_redis()
+)
@@ -0,0 +1,191 @@
+"""Job execution backends.
+
+``JOB_BACKEND`` selects where background jobs such as ``tasks.parse_sicoob``
+run:
+
+* ``rq`` (default): RQ queues in Redis, drained by ``python -m backend.worker``;
+* ``thread``: a pool of ``JOB_WORKERS`` threads inside the API process;
+* ``process``: a pool of ``JOB_WORKERS`` processes started by the API.
+
+:func:`get_queue` returns an object with the ``enqueue`` interface of
+:class:`rq.Queue` for either choice. The local pools need neither Redis nor a
+worker, so a job starts as soon as it is enqueued. Jobs still pending when the
+API stops are lost (their extrato stays in ``fila``), and the scheduled jobs of
+``backend.cron`` still require RQ.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from functools import lru_cache
+from importlib import import_module
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from rq import Queue
+
+from .config import get_redis
+
+logger = logging.getLogger(__name__)
+
+JOB_BACKEND = os.environ.get("JOB_BACKEND", "rq").lower()
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+
+if JOB_BACKEND not in {"rq", "thread", "process"}:
+    raise ValueError(f"JOB_BACKEND inválido: {JOB_BACKEND!r}")
+
+# ``Queue.enqueue`` options that only make sense for RQ.
+_RQ_OPTIONS = {
+    "job_timeout",
+    "result_ttl",
+    "ttl",
+    "failure_ttl",
+    "depends_on",
+    "description",
+    "at_front",
+    "meta",
+    "retry",
+}
+
+
+def resolve(name: str) -> Callable:
+    """Import the function ``module.func``, looking in this package first.
+
+    Job names follow the RQ workers, which run from ``backend/`` and refer to
+    ``tasks.parse_sicoob`` rather than ``backend.tasks.parse_sicoob``.
+    """
+
+    module_name, _, func = name.rpartition(".")
+    qualified = f"{__package__}.{module_name}"
+    try:
+        module = import_module(qualified)
+    except ModuleNotFoundError as exc:
+        if not f"{qualified}.".startswith(f"{exc.name}."):
+            raise
+        module = import_module(module_name)
+    return getattr(module, func)
+
+
+def _run(func: Union[str, Callable], args: tuple, kwargs: dict) -> Any:
+    if isinstance(func, str):
+        func = resolve(func)
+    return func(*args, **kwargs)
+
+
+class LocalBackend:
+    """Bounded thread or process pool shared by every local queue."""
+
+    def __init__(self, kind: str, workers: int) -> None:
+        self.kind = kind
+        self.workers = max(1, workers)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._queued: Counter = Counter()
+        self._jobs: Dict[str, Future] = {}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # Forking a threaded server is unsafe; spawn clean interpreters.
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="jobs"
+                )
+        return self._executor
+
+    def submit(
+        self,
+        queue: str,
+        func: Union[str, Callable],
+        args: tuple,
+        kwargs: dict,
+        job_id: Optional[str] = None,
+    ) -> Future:
+        with self._lock:
+            if job_id is not None:
+                existing = self._jobs.get(job_id)
+                if existing is not None and not existing.done():
+                    # Same semantics as RQ: one pending job per id.
+                    return existing
+            future = self._get_executor().submit(_run, func, args, kwargs)
+            self._queued[queue] += 1
+            if job_id is not None:
+                self._jobs[job_id] = future
+        future.add_done_callback(lambda f: self._finished(queue, func, job_id, f))
+        return future
+
+    def _finished(self, queue, func, job_id, future: Future) -> None:
+        with self._lock:
+            self._queued[queue] -= 1
+            if job_id is not None and self._jobs.get(job_id) is future:
+                del self._jobs[job_id]
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Job %s falhou", func, exc_info=future.exception())
+
+    def count(self, queue: Optional[str] = None) -> int:
+        """Jobs queued or running, in ``queue`` or overall."""
+
+        with self._lock:
+            if queue is None:
+                return sum(self._queued.values())
+            return self._queued[queue]
+
+    def queue_depths(self) -> List[dict]:
+        with self._lock:
+            return [
+                {"queue": name, "empresa_id": None, "queued": count}
+                for name, count in sorted(self._queued.items())
+                if count
+            ]
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+class LocalQueue:
+    """:class:`rq.Queue` look-alike that runs jobs on a :class:`LocalBackend`."""
+
+    def __init__(self, name: str, backend: LocalBackend) -> None:
+        self.name = name
+        self.backend = backend
+
+    @property
+    def count(self) -> int:
+        return self.backend.count(self.name)
+
+    def enqueue(self, func: Union[str, Callable], *args, **kwargs) -> Future:
+        job_id = kwargs.pop("job_id", None)
+        for option in _RQ_OPTIONS:
+            kwargs.pop(option, None)
+        return self.backend.submit(self.name, func, args, kwargs, job_id=job_id)
+
+
+@lru_cache()
+def local_backend() -> LocalBackend:
+    return LocalBackend(JOB_BACKEND, JOB_WORKERS)
+
+
+def is_local() -> bool:
+    return JOB_BACKEND != "rq"
+
+
+def get_queue(name: str) -> Union[Queue, LocalQueue]:
+    """Queue ``name`` on the configured backend."""
+
+    if is_local():
+        return LocalQueue(name, local_backend())
+    return Queue(name, connection=get_redis())
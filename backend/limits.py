@@ -0,0 +1,120 @@
+"""Per-job resource limits for statement imports.
+
+Large PDFs are what push a worker toward the container memory limit:
+pdfplumber and the OCR images keep every page alive while a file is parsed.
+:class:`JobGuard` is checked by ``tasks.parse_sicoob`` before each page and
+before the final commit, and raises :class:`JobLimitExceeded` when the job
+
+* has more than ``JOB_MAX_PAGES`` pages,
+* runs with more than ``JOB_MAX_RSS_MB`` of resident memory, or
+* spends more than ``JOB_STAGE_TIMEOUT`` seconds in one stage.
+
+The task then records the reason in ``Extrato.meta`` instead of being killed
+halfway through a transaction. Checks are cooperative: a single page that
+hangs is only stopped by the RQ job timeout. Zero disables a limit. The same
+checkpoints raise :class:`JobCancelled` once the job has been cancelled.
+"""
+
+from __future__ import annotations
+
+import os
+import resource
+import time
+from typing import Callable, Optional
+
+JOB_MAX_PAGES = int(os.environ.get("JOB_MAX_PAGES", 500))
+JOB_MAX_RSS_MB = int(os.environ.get("JOB_MAX_RSS_MB", 1536))
+JOB_STAGE_TIMEOUT = float(os.environ.get("JOB_STAGE_TIMEOUT", 600))
+# RQ kills the work horse after ``job_timeout`` without running the task's
+# error handling, so the job is given room for both of its stages (parse and
+# save) to reach their own limit first. ``None`` keeps RQ's default.
+JOB_TIMEOUT = int(2 * JOB_STAGE_TIMEOUT + 60) if JOB_STAGE_TIMEOUT > 0 else None
+
+
+def rss_mb() -> float:
+    """Resident memory of the current process, in megabytes."""
+
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Peak instead of current usage (kilobytes on Linux).
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class JobLimitExceeded(Exception):
+    """A job went over one of its limits; ``reason`` names which one."""
+
+    def __init__(self, reason: str, message: str) -> None:
+        super().__init__(message)
+        self.reason = reason
+
+    def meta(self) -> dict:
+        return {"error": str(self), "limite": self.reason}
+
+
+class JobCancelled(Exception):
+    """The job was cancelled while it ran."""
+
+
+class JobGuard:
+    """Page, memory and per-stage time limits of one job.
+
+    ``cancelled``, if given, is polled at every checkpoint.
+    """
+
+    def __init__(
+        self,
+        max_pages: int = JOB_MAX_PAGES,
+        max_rss_mb: int = JOB_MAX_RSS_MB,
+        stage_timeout: float = JOB_STAGE_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.stage_timeout = stage_timeout
+        self.clock = clock
+        self.cancelled = cancelled
+        self.stage: Optional[str] = None
+        # Page count of the statement, as reported by the parser.
+        self.pages = 0
+        self._deadline: Optional[float] = None
+
+    def start(self, stage: str) -> None:
+        """Begin ``stage``; its time limit counts from now."""
+
+        self.stage = stage
+        self._deadline = (
+            self.clock() + self.stage_timeout if self.stage_timeout > 0 else None
+        )
+
+    def check(self) -> None:
+        if self.cancelled is not None and self.cancelled():
+            raise JobCancelled("Importação cancelada")
+        if self._deadline is not None and self.clock() > self._deadline:
+            raise JobLimitExceeded(
+                "tempo",
+                f"Etapa '{self.stage}' excedeu {self.stage_timeout:g} segundos",
+            )
+        if self.max_rss_mb > 0:
+            rss = rss_mb()
+            if rss > self.max_rss_mb:
+                raise JobLimitExceeded(
+                    "memoria",
+                    f"Uso de memória de {rss:.0f} MB excede o limite de "
+                    f"{self.max_rss_mb} MB",
+                )
+
+    def on_page(self, number: int, total: int) -> None:
+        """Parser callback, called before page ``number`` of ``total``."""
+
+        self.pages = total
+        if self.max_pages > 0 and total > self.max_pages:
+            raise JobLimitExceeded(
+                "paginas",
+                f"Extrato com {total} páginas excede o limite de "
+                f"{self.max_pages}",
+            )
+        self.check()
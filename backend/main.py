@@ -1,24 +1,76 @@
+import hashlib
+import io
 import os
-import uuid
-import csv
 import logging
-from datetime import datetime, date, timedelta
-from io import StringIO
-from typing import List, Iterable
-
-from fastapi import Depends, FastAPI, UploadFile, File, HTTPException
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import StreamingResponse
+import time
+from datetime import datetime, date
+from typing import Any, BinaryIO, List, Iterable
+
+from fastapi import (
+    Depends,
+    FastAPI,
+    UploadFile,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.responses import JSONResponse, StreamingResponse
+import orjson
+from prometheus_client import CONTENT_TYPE_LATEST
 from pydantic import BaseModel
-from rq import Queue
+from redis.exceptions import RedisError
+from sqlalchemy import String, cast, func, select
 from sqlalchemy.orm import Session
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 
 from backend.config import get_redis
-from .db import SessionLocal
-from .models import Contrato, Movimentacao, Extrato
-from .rules import classify
+from .accruals import (
+    accruals_csv,
+    closed_through,
+    iter_accrual_batches,
+    iter_ledger_batches,
+)
+from .admission import estimate_pages, upload_admission
+from .auth import authenticate_user, create_access_token, get_current_user
+from .contract_cache import contract_cache
+from .contracts import delete_contract_rows
+from .db import ReadSessionLocal, SessionLocal
+from .export_cache import empresa_data_version, empresa_tag, export_cache
+from .exports import (
+    ACCRUAL_SCHEMA,
+    BINARY_FORMATS,
+    COMPRESSED_DOWNLOADS,
+    COMPRESSED_FORMATS,
+    EXPORT_FORMATS,
+    TRANSACTION_SCHEMA,
+    available_encodings,
+    chunked,
+    column_batches,
+    compress_stream,
+    iter_arrow,
+    iter_file,
+    iter_transactions,
+    negotiate_encoding,
+    record_batches,
+    transactions_csv,
+    transactions_sci,
+)
+from .inflight import upload_registry
+from .jobs import get_queue, is_local, local_backend
+from .limits import JOB_TIMEOUT
+from .metrics import render as render_metrics
+from .models import Contrato, Extrato, Movimentacao, ResumoContrato, TaxaContrato
+from .rules import current_version
+from .scheduling import (
+    UPLOAD_LOW_QUEUE,
+    UPLOAD_QUEUE,
+    queue_depths,
+    tenant_queue,
+)
+from .storage import StorageError, get_storage
 
 
 class ContractBase(BaseModel):
@@ -54,6 +106,27 @@ class ContractUpdate(BaseModel):
     dueDate: date | None = None
 
 
+class RateCreate(BaseModel):
+    effective_from: date
+    rate: float
+
+
+class RateResponse(BaseModel):
+    id: int
+    effective_from: date
+    rate: float
+
+
+class ContractSummaryResponse(BaseModel):
+    contract_id: int
+    balance: float
+    balance_date: date | None = None
+    total_debits: float
+    total_credits: float
+    movements: int
+    last_import: datetime | None = None
+
+
 class ExtratoResponse(BaseModel):
     id: int
     status: str
@@ -63,6 +136,22 @@ class ExtratoResponse(BaseModel):
         orm_mode = True
 
 
+class MovementResponse(BaseModel):
+    id: int
+    contract_id: int | None = None
+    extrato_id: int
+    launch_date: date | None = None
+    description: str | None = None
+    debit: float | None = None
+    credit: float | None = None
+    balance: float | None = None
+
+
+class MovementSearchResponse(BaseModel):
+    items: List[MovementResponse]
+    next_cursor: int | None = None
+
+
 class UploadStatusResponse(BaseModel):
     id: int
     contrato_id: int | None = None
@@ -73,97 +162,209 @@ class UploadStatusResponse(BaseModel):
         orm_mode = True
 
 
+class QueueDepthResponse(BaseModel):
+    queue: str
+    empresa_id: int | None = None
+    queued: int
+
+
 app = FastAPI()
 logger = logging.getLogger(__name__)
 
 redis_conn = get_redis()
-queue = Queue("uploads", connection=redis_conn)
+queue = get_queue(UPLOAD_QUEUE)
+low_queue = get_queue(UPLOAD_LOW_QUEUE)
 
-storage_path = os.environ.get("UPLOAD_DIR", "storage")
-os.makedirs(storage_path, exist_ok=True)
+file_storage = get_storage()
 MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", 10 * 1024 * 1024))
-
-SECRET_KEY = os.environ.get("SECRET_KEY", "secret")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-
-fake_user = {"username": "admin", "hashed_password": pwd_context.hash("admin")}
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def authenticate_user(username: str, password: str):
-    if username != fake_user["username"]:
-        return False
-    if not verify_password(password, fake_user["hashed_password"]):
-        return False
-    return fake_user
+# Contracts with more movements than this are deleted by a background job.
+CONTRACT_PURGE_ASYNC_THRESHOLD = int(
+    os.environ.get("CONTRACT_PURGE_ASYNC_THRESHOLD", 50000)
+)
 
 
-def create_access_token(data: dict, expires_delta: timedelta | None = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (
-        expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def get_read_db():
+    """Yield a session bound to the read replica (or the primary if unset)."""
+    db = ReadSessionLocal()
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str | None = payload.get("sub")
-        if username != fake_user["username"]:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    return {"username": username}
+        yield db
+    finally:
+        db.close()
 
 
 @app.post("/token")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+def login(
+    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+):
+    # Sync endpoint: bcrypt runs in the threadpool, not on the event loop.
+    user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=401,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": user["username"]})
+    access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _contract_response(contract: Contrato) -> ContractResponse:
+    return ContractResponse(
+        id=str(contract.id),
+        bank=contract.banco,
+        balance=contract.saldo,
+        cet=contract.taxa_anual,
+        dueDate=contract.data_inicio,
+    )
+
+
+def _row_dict(row, model: type[BaseModel]) -> dict:
+    """Pick the fields of ``model`` from a row by column label.
+
+    Rows are not validated through ``model``: the selected columns already
+    have the response types, and orjson serializes them directly. A field
+    without a matching label raises ``KeyError``.
+    """
+    mapping = row._mapping
+    return {name: mapping[name] for name in model.model_fields}
+
+
+def _json_rows(rows, model: type[BaseModel]) -> list:
+    """Rows as a list of dictionaries shaped like ``model``."""
+    return [_row_dict(row, model) for row in rows]
+
+
+class ORJSONBodyResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    The ``render`` of FastAPI's ``ORJSONResponse``, now deprecated upstream,
+    except that ``bytes`` are taken as an already serialized body, such as
+    those stored in the contract cache.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# Columns of ``ContractResponse``, labeled with its field names.
+CONTRACT_COLUMNS = (
+    cast(Contrato.id, String).label("id"),
+    Contrato.banco.label("bank"),
+    Contrato.saldo.label("balance"),
+    Contrato.taxa_anual.label("cet"),
+    Contrato.data_inicio.label("dueDate"),
+)
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Import metrics in the Prometheus text format."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+def _cache_source(db: Session, read_db: Session) -> Session:
+    """Session that fills contract cache misses.
+
+    A miss right after a write bumped the cache version must not be filled
+    from a lagging replica, or the old data would be cached for the whole
+    TTL; the replica only serves these reads when the cache is disabled.
+    """
+    return db if contract_cache.ttl > 0 else read_db
 
 
 @app.get("/contracts", response_model=List[ContractResponse])
-def list_contracts(db: Session = Depends(get_db)):
-    contracts = db.query(Contrato).all()
-    return [
-        ContractResponse(
-            id=str(contract.id),
-            bank=contract.banco,
-            balance=contract.saldo,
-            cet=contract.taxa_anual,
-            dueDate=contract.data_inicio,
+def list_contracts(
+    db: Session = Depends(get_db), read_db: Session = Depends(get_read_db)
+):
+    def compute() -> bytes:
+        rows = _cache_source(db, read_db).execute(
+            select(*CONTRACT_COLUMNS).order_by(Contrato.id)
         )
-        for contract in contracts
-    ]
+        return orjson.dumps(_json_rows(rows, ContractResponse))
+
+    return ORJSONBodyResponse(contract_cache.get_or_compute("list", compute))
+
+
+def _contract_summaries(db: Session, *criteria) -> list:
+    """Read summary rows, using the registered balance before any import."""
+    return db.execute(
+        select(
+            Contrato.id.label("contract_id"),
+            func.coalesce(ResumoContrato.saldo, Contrato.saldo).label("balance"),
+            ResumoContrato.data_saldo.label("balance_date"),
+            func.coalesce(ResumoContrato.total_debitos, 0.0).label("total_debits"),
+            func.coalesce(ResumoContrato.total_creditos, 0.0).label(
+                "total_credits"
+            ),
+            func.coalesce(ResumoContrato.movimentacoes, 0).label("movements"),
+            ResumoContrato.ultima_importacao.label("last_import"),
+        )
+        .outerjoin(ResumoContrato, ResumoContrato.contrato_id == Contrato.id)
+        .where(*criteria)
+        .order_by(Contrato.id)
+    ).all()
+
+
+@app.get("/contracts/summary", response_model=List[ContractSummaryResponse])
+def list_contract_summaries(
+    empresa_id: int | None = None, db: Session = Depends(get_read_db)
+):
+    criteria = [] if empresa_id is None else [Contrato.empresa_id == empresa_id]
+    return ORJSONBodyResponse(
+        _json_rows(_contract_summaries(db, *criteria), ContractSummaryResponse)
+    )
+
+
+@app.get(
+    "/contracts/{contract_id}/summary", response_model=ContractSummaryResponse
+)
+def get_contract_summary(contract_id: int, db: Session = Depends(get_read_db)):
+    summaries = _contract_summaries(db, Contrato.id == contract_id)
+    if not summaries:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    return ORJSONBodyResponse(_row_dict(summaries[0], ContractSummaryResponse))
+
+
+@app.get("/contracts/{contract_id}", response_model=ContractResponse)
+def get_contract(
+    contract_id: int,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+):
+    def compute() -> bytes:
+        row = _cache_source(db, read_db).execute(
+            select(*CONTRACT_COLUMNS).where(Contrato.id == contract_id)
+        ).first()
+        # Misses are cached too, so unknown ids do not reach the database.
+        return orjson.dumps(_row_dict(row, ContractResponse) if row else None)
+
+    body = contract_cache.get_or_compute(f"contract:{contract_id}", compute)
+    if body == b"null":
+        raise HTTPException(status_code=404, detail="Contract not found")
+    return ORJSONBodyResponse(body)
+
+
+def _enqueue_ledger_refresh(contract_id: int, since: date | None = None) -> None:
+    """Have the worker recompute the contract's accrual ledger from ``since``.
+
+    Rewriting the ledger can take years of daily rows, so it stays out of
+    the request.
+    """
+    queue.enqueue(
+        "tasks.refresh_ledger",
+        contract_id,
+        since.isoformat() if since else None,
+    )
 
 
 @app.post("/contracts", response_model=ContractResponse, status_code=201)
@@ -179,13 +380,9 @@ def create_contract(contract: ContractCreate, db: Session = Depends(get_db)):
     db.add(model)
     db.commit()
     db.refresh(model)
-    return ContractResponse(
-        id=str(model.id),
-        bank=model.banco,
-        balance=model.saldo,
-        cet=model.taxa_anual,
-        dueDate=model.data_inicio,
-    )
+    contract_cache.invalidate()
+    _enqueue_ledger_refresh(model.id)
+    return _contract_response(model)
 
 
 @app.put("/contracts/{contract_id}", response_model=ContractResponse)
@@ -209,35 +406,90 @@ def update_contract(
         contract.data_inicio = data.dueDate
     db.commit()
     db.refresh(contract)
-    return ContractResponse(
-        id=str(contract.id),
-        bank=contract.banco,
-        balance=contract.saldo,
-        cet=contract.taxa_anual,
-        dueDate=contract.data_inicio,
-    )
+    contract_cache.invalidate()
+    if data.balance is not None or data.cet is not None or data.dueDate is not None:
+        _enqueue_ledger_refresh(contract.id)
+    return _contract_response(contract)
 
 
 @app.delete("/contracts/{contract_id}")
-def delete_contract(contract_id: int, db: Session = Depends(get_db)):
+def delete_contract(
+    contract_id: int, response: Response, db: Session = Depends(get_db)
+):
     contract = db.get(Contrato, contract_id)
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
-    db.delete(contract)
+    empresa_id = contract.empresa_id
+    movimentos = db.scalar(
+        select(func.count(Movimentacao.id))
+        .join(Extrato, Movimentacao.extrato_id == Extrato.id)
+        .where(Extrato.contrato_id == contract_id)
+    )
+    if movimentos > CONTRACT_PURGE_ASYNC_THRESHOLD:
+        queue.enqueue(
+            "tasks.purge_contract", contract_id, job_id=f"purge-contract-{contract_id}"
+        )
+        response.status_code = 202
+        return {"ok": True, "queued": True}
+    delete_contract_rows(db, contract_id)
     db.commit()
+    export_cache.invalidate(empresa_tag(empresa_id))
+    contract_cache.invalidate()
     return {"ok": True}
 
 
+@app.get("/contracts/{contract_id}/rates", response_model=List[RateResponse])
+def list_rates(contract_id: int, db: Session = Depends(get_read_db)):
+    rows = db.execute(
+        select(
+            TaxaContrato.id,
+            TaxaContrato.vigencia.label("effective_from"),
+            TaxaContrato.taxa_anual.label("rate"),
+        )
+        .where(TaxaContrato.contrato_id == contract_id)
+        .order_by(TaxaContrato.vigencia)
+    )
+    return ORJSONBodyResponse(_json_rows(rows, RateResponse))
+
+
+@app.post(
+    "/contracts/{contract_id}/rates", response_model=RateResponse, status_code=201
+)
+def create_rate(contract_id: int, data: RateCreate, db: Session = Depends(get_db)):
+    """Record a repricing: ``rate`` applies from ``effective_from`` onwards."""
+    if not db.get(Contrato, contract_id):
+        raise HTTPException(status_code=404, detail="Contract not found")
+    taxa = (
+        db.query(TaxaContrato)
+        .filter(
+            TaxaContrato.contrato_id == contract_id,
+            TaxaContrato.vigencia == data.effective_from,
+        )
+        .one_or_none()
+    )
+    if taxa is None:
+        taxa = TaxaContrato(contrato_id=contract_id, vigencia=data.effective_from)
+        db.add(taxa)
+    taxa.taxa_anual = data.rate
+    db.commit()
+    db.refresh(taxa)
+    _enqueue_ledger_refresh(contract_id, since=data.effective_from)
+    return RateResponse(
+        id=taxa.id, effective_from=taxa.vigencia, rate=taxa.taxa_anual
+    )
+
+
 @app.get(
     "/contracts/{contract_id}/extratos", response_model=List[ExtratoResponse]
 )
-def list_extratos(contract_id: int, db: Session = Depends(get_db)):
-    extratos = (
-        db.query(Extrato)
-        .filter(Extrato.contrato_id == contract_id)
-        .all()
+def list_extratos(contract_id: int, db: Session = Depends(get_read_db)):
+    rows = db.execute(
+        select(Extrato.id, Extrato.status, Extrato.meta).where(
+            Extrato.contrato_id == contract_id
+        )
     )
-    return extratos
+    return ORJSONBodyResponse(_json_rows(rows, ExtratoResponse))
+
 
 @app.post("/uploads")
 async def upload_pdf(
@@ -249,96 +501,309 @@ async def upload_pdf(
     logger.info("Upload started for file '%s'", file.filename)
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
-    file_id = f"{uuid.uuid4()}.pdf"
-    dest = os.path.join(storage_path, file_id)
     content = await file.read(MAX_UPLOAD_SIZE + 1)
     if len(content) > MAX_UPLOAD_SIZE:
         raise HTTPException(status_code=413, detail="File too large")
+    sha256 = hashlib.sha256(content).hexdigest()
+    # Re-submission of a file still being imported: attach to that job.
+    running = upload_registry.inflight(sha256, contract_id)
+    if running is not None and _still_queued(db, running):
+        return _duplicate_upload(sha256, file.filename, running)
+    contract = db.get(Contrato, contract_id)
+    # Unknown contracts are still accepted; the task records the error.
+    tenant = contract.empresa_id if contract else 0
+    pages = estimate_pages(content)
+    queue_name = upload_admission.check(tenant, pages)
     try:
-        with open(dest, "wb") as f:
-            f.write(content)
-    except OSError as e:
+        # Content addressed: an identical file is stored only once.
+        # S3 uploads block on the network: keep them off the event loop.
+        stored = await run_in_threadpool(file_storage.put, io.BytesIO(content))
+    except StorageError as e:
         logger.exception("Failed to save uploaded file '%s'", file.filename)
         raise HTTPException(status_code=500, detail="Failed to save file") from e
 
     extrato = Extrato(
         contrato_id=contract_id,
-        filepath=dest,
+        filepath=stored.uri,
         status="fila",
+        meta={
+            "empresa_id": tenant,
+            "paginas_estimadas": pages,
+            "sha256": stored.sha256,
+            "enviado_em": time.time(),
+        },
     )
     db.add(extrato)
     db.commit()
     db.refresh(extrato)
+    running = upload_registry.claim(stored.sha256, contract_id, extrato.id)
+    if running is not None:
+        if _still_queued(db, running):
+            # A concurrent request claimed the same file first.
+            db.delete(extrato)
+            db.commit()
+            return _duplicate_upload(stored.sha256, file.filename, running)
+        # Its job died without releasing the claim: take it over.
+        upload_registry.replace(stored.sha256, contract_id, running, extrato.id)
+
+    upload_admission.reserve(tenant, extrato.id, pages)
+    if queue_name == UPLOAD_LOW_QUEUE:
+        target = low_queue
+    elif tenant and not is_local():
+        # Per-empresa queue: workers rotate across tenants (see scheduling).
+        target = tenant_queue(redis_conn, tenant)
+    else:
+        target = queue
+    target.enqueue(
+        "tasks.parse_sicoob",
+        stored.uri,
+        contract_id,
+        extrato.id,
+        job_timeout=JOB_TIMEOUT,
+    )
+    logger.info("Upload finished for file '%s' as '%s'", file.filename, stored.uri)
+    return {
+        "id": stored.sha256,
+        "filename": file.filename,
+        "extrato_id": extrato.id,
+        "duplicate": False,
+    }
+
+
+def _still_queued(db: Session, extrato_id: int) -> bool:
+    extrato = db.get(Extrato, extrato_id)
+    return extrato is not None and extrato.status == "fila"
+
+
+def _duplicate_upload(sha256: str, filename: str, extrato_id: int) -> dict:
+    logger.info("Upload of '%s' attached to extrato %s", filename, extrato_id)
+    return {
+        "id": sha256,
+        "filename": filename,
+        "extrato_id": extrato_id,
+        "duplicate": True,
+    }
+
+
+@app.post("/uploads/{extrato_id}/cancel", status_code=202)
+def cancel_upload(
+    extrato_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Cancel a queued or running import; the job stops between pages."""
+    extrato = db.get(Extrato, extrato_id)
+    if extrato is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if extrato.status != "fila":
+        raise HTTPException(status_code=409, detail="Upload already finished")
+    try:
+        upload_registry.cancel(extrato_id)
+    except RedisError as exc:
+        logger.warning("Falha ao cancelar extrato %s: %s", extrato_id, exc)
+        raise HTTPException(status_code=503, detail="Queue backend unavailable")
+    return {"extrato_id": extrato_id, "cancel_requested": True}
+
+
+@app.get("/movements/search", response_model=MovementSearchResponse)
+def search_movements(
+    q: str = Query(..., min_length=3),
+    empresa_id: int | None = None,
+    contract_id: int | None = None,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    after: int | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """Find movements whose description contains ``q`` (case-insensitive).
+
+    Results come newest first; pass ``next_cursor`` as ``after`` to fetch the
+    next page. On PostgreSQL the match is served by the trigram index of
+    migration ``0007``.
+    """
+    stmt = (
+        select(
+            Movimentacao.id,
+            Extrato.contrato_id.label("contract_id"),
+            Movimentacao.extrato_id,
+            Movimentacao.data_lanc.label("launch_date"),
+            Movimentacao.descricao.label("description"),
+            Movimentacao.valor_debito.label("debit"),
+            Movimentacao.valor_credito.label("credit"),
+            Movimentacao.saldo.label("balance"),
+        )
+        .join(Extrato, Movimentacao.extrato_id == Extrato.id)
+        .where(Movimentacao.descricao.icontains(q, autoescape=True))
+        .order_by(Movimentacao.id.desc())
+        .limit(limit + 1)
+    )
+    if empresa_id is not None:
+        stmt = stmt.join(Contrato, Extrato.contrato_id == Contrato.id).where(
+            Contrato.empresa_id == empresa_id
+        )
+    if contract_id is not None:
+        stmt = stmt.where(Extrato.contrato_id == contract_id)
+    if start_date is not None:
+        stmt = stmt.where(Movimentacao.data_lanc >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(Movimentacao.data_lanc <= end_date)
+    if after is not None:
+        stmt = stmt.where(Movimentacao.id < after)
 
-    queue.enqueue("tasks.parse_sicoob", dest, contract_id, extrato.id)
-    logger.info("Upload finished for file '%s' as '%s'", file.filename, file_id)
-    return {"id": file_id, "filename": file.filename, "extrato_id": extrato.id}
+    rows = db.execute(stmt).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    items = _json_rows(rows[:limit], MovementResponse)
+    return ORJSONBodyResponse({"items": items, "next_cursor": next_cursor})
 
 
 @app.get("/uploads", response_model=List[UploadStatusResponse])
 def list_uploads(
-    db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)
+    db: Session = Depends(get_read_db), current_user: dict = Depends(get_current_user)
 ):
-    extratos = db.query(Extrato).order_by(Extrato.id.desc()).all()
-    return extratos
+    rows = db.execute(
+        select(Extrato.id, Extrato.contrato_id, Extrato.status, Extrato.meta)
+        .order_by(Extrato.id.desc())
+    )
+    return ORJSONBodyResponse(_json_rows(rows, UploadStatusResponse))
+
+
+@app.get("/uploads/queues", response_model=List[QueueDepthResponse])
+def list_upload_queues(current_user: dict = Depends(get_current_user)):
+    """Jobs waiting in each upload queue, per empresa."""
+    if is_local():
+        return local_backend().queue_depths()
+    try:
+        return queue_depths(redis_conn)
+    except RedisError as exc:
+        logger.warning("Falha ao consultar filas: %s", exc)
+        raise HTTPException(status_code=503, detail="Queue backend unavailable")
+
+
+@app.post("/rules/reclassify", status_code=202)
+def reclassify(current_user: dict = Depends(get_current_user)):
+    """Queue reclassification of movements stored under older rules.
+
+    The worker also runs it on the ``RULES_SYNC_CRON`` schedule; this route
+    applies a rules change without waiting for the next run.
+    """
+    version = current_version()
+    queue.enqueue(
+        "tasks.reclassify_movimentacoes", job_id=f"reclassify-{version}"
+    )
+    return {"version": version, "queued": True}
+
+
+def _export_format(
+    fmt: str, allowed: Iterable[str], compression: str | None
+) -> tuple[str, str]:
+    if fmt not in allowed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Use one of: {', '.join(allowed)}",
+        )
+    if compression is not None and compression not in available_encodings():
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid compression. Use one of: "
+            + ", ".join(available_encodings()),
+        )
+    return EXPORT_FORMATS[fmt]
+
+
+def _export_response(
+    request: Request,
+    body: Iterable[str | bytes] | None,
+    media_type: str,
+    filename: str,
+    fmt: str,
+    compression: str | None = None,
+    cached: BinaryIO | None = None,
+):
+    """Build the response for an export body or an open cached export file.
+
+    ``compression`` produces a compressed download (e.g. ``.txt.gz``);
+    otherwise the body is compressed on the fly when the client's
+    ``Accept-Encoding`` allows it.
+    """
+
+    headers = {}
+    encoding = None
+    if compression is not None:
+        extension, media_type = COMPRESSED_DOWNLOADS[compression]
+        filename = f"{filename}.{extension}"
+        encoding = compression
+    elif fmt not in COMPRESSED_FORMATS:
+        headers["Vary"] = "Accept-Encoding"
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+
+    if cached is not None:
+        body = iter_file(cached)
+        if encoding is None:
+            headers["Content-Length"] = str(os.fstat(cached.fileno()).st_size)
+    if encoding is not None:
+        body = compress_stream(body, encoding)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
 
 
 @app.get("/accruals/export")
 def export_accruals(
     start_date: str,
     end_date: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    format: str = "csv",
+    compression: str | None = None,
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user),
 ):
     """Export pro-rata interest accruals for contracts within a period.
 
     The interest is calculated using the formula:
     interest = principal * annual_rate * days / 365
+
+    Periods already covered by the accrual ledger are read from it, using
+    the daily balances derived from imported movements; otherwise the
+    accruals are computed on the fly from the contract balance. ``format``
+    selects CSV (default), an Arrow IPC stream or Parquet; ``compression``
+    returns a gzip/zstd compressed file.
     """
 
+    media_type, extension = _export_format(
+        format, ["csv", "arrow", "parquet"], compression
+    )
     try:
         start = datetime.strptime(start_date, "%Y-%m-%d").date()
         end = datetime.strptime(end_date, "%Y-%m-%d").date()
     except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        raise HTTPException(
+            status_code=400, detail="Invalid date format. Use YYYY-MM-DD"
+        )
 
     if start > end:
-        raise HTTPException(status_code=400, detail="start_date must be before end_date")
-
-    def iter_rows():
-        header_buffer = StringIO()
-        writer = csv.writer(header_buffer)
-        writer.writerow(["contract_id", "principal", "annual_rate", "days", "interest"])
-        yield header_buffer.getvalue()
-
-        contracts = (
-            db.query(Contrato)
-            .filter(Contrato.data_inicio <= end)
-            .yield_per(100)
+        raise HTTPException(
+            status_code=400, detail="start_date must be before end_date"
+        )
+
+    fechado = closed_through(db)
+    if fechado is not None and end <= fechado:
+        batches = iter_ledger_batches(db, start, end)
+    else:
+        batches = iter_accrual_batches(db, start, end)
+
+    if format in BINARY_FORMATS:
+        body = iter_arrow(
+            column_batches(batches, ACCRUAL_SCHEMA), ACCRUAL_SCHEMA, format
         )
-        for contract in contracts:
-            contract_start = contract.data_inicio
-            period_start = max(start, contract_start)
-            if period_start > end:
-                continue
-            days = (end - period_start).days + 1
-            interest = contract.saldo * contract.taxa_anual * days / 365
-
-            row_buffer = StringIO()
-            writer = csv.writer(row_buffer)
-            writer.writerow(
-                [
-                    contract.id,
-                    f"{contract.saldo:.2f}",
-                    contract.taxa_anual,
-                    days,
-                    f"{interest:.2f}",
-                ]
-            )
-            yield row_buffer.getvalue()
-
-    headers = {"Content-Disposition": "attachment; filename=accruals.csv"}
-    return StreamingResponse(iter_rows(), media_type="text/csv", headers=headers)
+    else:
+        body = accruals_csv(batches)
+
+    return _export_response(
+        request, body, media_type, f"accruals.{extension}", format, compression
+    )
 
 
 @app.get("/transactions/export")
@@ -346,41 +811,66 @@ def export_transactions(
     empresa_id: int,
     start_date: str,
     end_date: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    format: str = "sci",
+    compression: str | None = None,
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user),
 ):
-    """Export bank statement movements as accounting entries in SCI TXT layout."""
+    """Export bank statement movements as accounting entries.
+
+    The SCI TXT layout is the default; ``format`` may also select CSV, an
+    Arrow IPC stream or Parquet for analytics tools. ``compression`` returns
+    a compressed file such as ``transactions.txt.gz``.
+    """
 
+    media_type, extension = _export_format(
+        format, list(EXPORT_FORMATS), compression
+    )
     try:
         start = datetime.strptime(start_date, "%Y-%m-%d").date()
         end = datetime.strptime(end_date, "%Y-%m-%d").date()
     except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        raise HTTPException(
+            status_code=400, detail="Invalid date format. Use YYYY-MM-DD"
+        )
 
     if start > end:
-        raise HTTPException(status_code=400, detail="start_date must be before end_date")
-
-
-    def iter_lines() -> Iterable[str]:
-        q = (
-            db.query(Movimentacao)
-            .join(Extrato)
-            .join(Contrato)
-            .filter(
-                Contrato.empresa_id == empresa_id,
-                Movimentacao.data_lanc >= start,
-                Movimentacao.data_lanc <= end,
-            )
-            .order_by(Movimentacao.data_lanc)
+        raise HTTPException(
+            status_code=400, detail="start_date must be before end_date"
         )
 
-        for mov in q.all():
-            debito, credito = classify(mov.descricao or "")
-            valor = mov.valor_debito or mov.valor_credito or 0
-            data = (mov.data_lanc or mov.data_ref or start).strftime("%d/%m/%Y")
-            historico = mov.descricao or ""
-            line = f"{data};{debito};{credito};{valor:.2f};{historico}\n"
-            yield line
+    filename = f"transactions.{extension}"
+    cache_key = export_cache.key(
+        empresa_tag(empresa_id),
+        "transactions",
+        start=start,
+        end=end,
+        format=format,
+        rules=current_version(),
+        data=empresa_data_version(db, empresa_id),
+    )
+    cached = export_cache.get(cache_key)
+    if cached is not None:
+        return _export_response(
+            request, None, media_type, filename, format, compression, cached=cached
+        )
 
-    headers = {"Content-Disposition": "attachment; filename=transactions.txt"}
-    return StreamingResponse(iter_lines(), media_type="text/plain", headers=headers)
+    records = iter_transactions(db, empresa_id, start, end)
+    if format in BINARY_FORMATS:
+        body = iter_arrow(
+            record_batches(records, TRANSACTION_SCHEMA), TRANSACTION_SCHEMA, format
+        )
+    elif format == "csv":
+        body = transactions_csv(records)
+    else:
+        body = chunked(transactions_sci(records))
+
+    return _export_response(
+        request,
+        export_cache.store(cache_key, body),
+        media_type,
+        filename,
+        format,
+        compression,
+    )
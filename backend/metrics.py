@@ -0,0 +1,172 @@
+"""Timing and volume metrics of statement imports.
+
+``tasks.parse_sicoob`` times each stage of an import with an
+:class:`ImportTimer`: reading the file (``read``), pdfplumber text extraction
+(``extract``), OCR (``ocr``), the regular expressions that turn text into
+transactions (``regex``) and the database insert and commit (``insert``). The
+durations of a run go to ``Extrato.meta["tempos"]`` and, with the page and row
+counts and the time from upload to ``importado``, to the Prometheus metrics
+below, served at ``/metrics`` by the API and on ``WORKER_METRICS_PORT`` by the
+worker.
+
+RQ runs every job in a forked work horse, which exits afterwards. The worker
+runs its jobs inside :func:`collect` and the observations travel back to the
+worker process, which records them with :func:`replay`; the horses write
+nothing to disk. Set ``PROMETHEUS_MULTIPROC_DIR`` when the API runs several
+processes or with ``JOB_BACKEND=process``.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+STAGE_SECONDS = Histogram(
+    "loan_parser_import_stage_seconds",
+    "Duração de cada etapa da importação de extratos",
+    ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+IMPORT_LATENCY = Histogram(
+    "loan_parser_import_latency_seconds",
+    "Tempo entre o upload e o extrato importado",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600),
+)
+IMPORTS = Counter(
+    "loan_parser_imports", "Importações concluídas, por status", ["status"]
+)
+PAGES = Counter("loan_parser_import_pages", "Páginas de extratos processadas")
+ROWS = Counter("loan_parser_import_rows", "Movimentações gravadas")
+
+
+# Observations of the running job while inside ``collect``; a work horse runs
+# one job at a time.
+_collected: Optional[List[tuple]] = None
+
+
+def _observe_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(name).observe(seconds)
+
+
+def _observe_import(status: str, pages: int, rows: int) -> None:
+    IMPORTS.labels(status).inc()
+    PAGES.inc(pages)
+    ROWS.inc(rows)
+
+
+def _observe_latency(seconds: float) -> None:
+    IMPORT_LATENCY.observe(seconds)
+
+
+_OBSERVERS: Dict[str, Callable[..., None]] = {
+    "stage": _observe_stage,
+    "import": _observe_import,
+    "latency": _observe_latency,
+}
+
+
+def _observe(kind: str, *values) -> None:
+    if _collected is not None:
+        _collected.append((kind, *values))
+    else:
+        _OBSERVERS[kind](*values)
+
+
+@contextmanager
+def collect() -> Iterator[List[tuple]]:
+    """Gather the observations made inside instead of recording them."""
+
+    global _collected
+    _collected = observed = []
+    try:
+        yield observed
+    finally:
+        _collected = None
+
+
+def replay(observations: Iterable[tuple]) -> None:
+    """Record observations gathered by :func:`collect` in another process."""
+
+    for kind, *values in observations:
+        _OBSERVERS[kind](*values)
+
+
+class ImportTimer:
+    """Stage durations of one import, in seconds."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock = clock
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = self.clock()
+        try:
+            yield
+        finally:
+            elapsed = self.clock() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            _observe("stage", name, elapsed)
+
+    def meta(self) -> dict:
+        return {"tempos": {k: round(v, 4) for k, v in self.timings.items()}}
+
+
+def record_import(status: str, pages: int = 0, rows: int = 0) -> None:
+    _observe("import", status, pages, rows)
+
+
+def record_latency(uploaded_at: float) -> None:
+    """Observe the time since ``uploaded_at`` (a ``time.time()`` value)."""
+
+    _observe("latency", max(0.0, time.time() - uploaded_at))
+
+
+def remove_stale_files() -> None:
+    """Delete the multiprocess files left by other processes.
+
+    For a worker started with its own ``PROMETHEUS_MULTIPROC_DIR``: files of
+    earlier runs would otherwise pile up and be read on every scrape. The
+    current process's files survive, as the worker restarts itself with
+    ``os.execv`` under the same pid.
+    """
+
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not directory:
+        return
+    own = f"_{os.getpid()}.db"
+    for name in os.listdir(directory):
+        if name.endswith(".db") and not name.endswith(own):
+            os.remove(os.path.join(directory, name))
+
+
+def _registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
+
+
+def render() -> bytes:
+    """Current metrics in the Prometheus text format."""
+
+    return generate_latest(_registry())
+
+
+def serve(port: int) -> None:
+    """Serve the metrics on ``port`` from a background thread."""
+
+    start_http_server(port, registry=_registry())
@@ -0,0 +1,84 @@
+"""Baseline schema previously created with ``Base.metadata.create_all``.
+
+Databases created before migrations were introduced already have these
+tables: mark them with ``alembic stamp 0001`` instead of upgrading.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "empresas",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("nome", sa.String(), nullable=False),
+        sa.Column("cnpj", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("cnpj"),
+    )
+    op.create_index("ix_empresas_id", "empresas", ["id"])
+    op.create_table(
+        "contratos",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("empresa_id", sa.Integer(), nullable=False),
+        sa.Column("numero", sa.String(), nullable=False),
+        sa.Column("banco", sa.String(), nullable=False),
+        sa.Column("saldo", sa.Float(), nullable=False),
+        sa.Column("taxa_anual", sa.Float(), nullable=False),
+        sa.Column("data_inicio", sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(["empresa_id"], ["empresas.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_contratos_id", "contratos", ["id"])
+    op.create_table(
+        "extratos",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("contrato_id", sa.Integer(), nullable=True),
+        sa.Column("filepath", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("metadata", sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(["contrato_id"], ["contratos.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_extratos_id", "extratos", ["id"])
+    op.create_table(
+        "movimentacoes",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("extrato_id", sa.Integer(), nullable=False),
+        sa.Column("data_ref", sa.Date(), nullable=True),
+        sa.Column("data_lanc", sa.Date(), nullable=True),
+        sa.Column("descricao", sa.String(), nullable=True),
+        sa.Column("valor_debito", sa.Float(), nullable=True),
+        sa.Column("valor_credito", sa.Float(), nullable=True),
+        sa.Column("saldo", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(["extrato_id"], ["extratos.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_movimentacoes_id", "movimentacoes", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_movimentacoes_id", table_name="movimentacoes")
+    op.drop_table("movimentacoes")
+    op.drop_index("ix_extratos_id", table_name="extratos")
+    op.drop_table("extratos")
+    op.drop_index("ix_contratos_id", table_name="contratos")
+    op.drop_table("contratos")
+    op.drop_index("ix_empresas_id", table_name="empresas")
+    op.drop_table("empresas")
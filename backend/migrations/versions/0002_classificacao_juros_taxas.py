@@ -0,0 +1,69 @@
+"""Persisted classification, accrual ledger and contract rate history.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("movimentacoes") as batch_op:
+        batch_op.add_column(sa.Column("conta_debito", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("conta_credito", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("regras_versao", sa.String(), nullable=True))
+
+    op.create_table(
+        "taxas_contrato",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("contrato_id", sa.Integer(), nullable=False),
+        sa.Column("vigencia", sa.Date(), nullable=False),
+        sa.Column("taxa_anual", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["contrato_id"], ["contratos.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("contrato_id", "vigencia"),
+    )
+    op.create_index("ix_taxas_contrato_id", "taxas_contrato", ["id"])
+    op.create_table(
+        "juros_diarios",
+        sa.Column("contrato_id", sa.Integer(), nullable=False),
+        sa.Column("data", sa.Date(), nullable=False),
+        sa.Column("saldo", sa.Float(), nullable=False),
+        sa.Column("taxa_anual", sa.Float(), nullable=False),
+        sa.Column("juros", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["contrato_id"], ["contratos.id"]),
+        sa.PrimaryKeyConstraint("contrato_id", "data"),
+    )
+    op.create_table(
+        "fechamentos_juros",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("fechado_ate", sa.Date(), nullable=False),
+        sa.Column("executado_em", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_fechamentos_juros_id", "fechamentos_juros", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_fechamentos_juros_id", table_name="fechamentos_juros")
+    op.drop_table("fechamentos_juros")
+    op.drop_table("juros_diarios")
+    op.drop_index("ix_taxas_contrato_id", table_name="taxas_contrato")
+    op.drop_table("taxas_contrato")
+    with op.batch_alter_table("movimentacoes") as batch_op:
+        batch_op.drop_column("regras_versao")
+        batch_op.drop_column("conta_credito")
+        batch_op.drop_column("conta_debito")
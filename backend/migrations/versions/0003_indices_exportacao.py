@@ -0,0 +1,59 @@
+"""Composite indexes for the export and list queries.
+
+* ``contratos(empresa_id)`` and ``extratos(contrato_id, status)`` drive the
+  join from an empresa down to its imported statements;
+* ``movimentacoes(extrato_id, data_lanc)`` serves the per-statement date
+  range of ``/transactions/export`` and ``movimentacoes(data_lanc)`` the
+  range scans across statements;
+* ``contratos(data_inicio)`` and ``juros_diarios(data)`` serve the accrual
+  export filters.
+
+On PostgreSQL the indexes are built ``CONCURRENTLY`` so large tables stay
+writable while the migration runs.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_contratos_empresa_id", "contratos", ["empresa_id"]),
+    ("ix_contratos_data_inicio", "contratos", ["data_inicio"]),
+    ("ix_extratos_contrato_id_status", "extratos", ["contrato_id", "status"]),
+    (
+        "ix_movimentacoes_extrato_id_data_lanc",
+        "movimentacoes",
+        ["extrato_id", "data_lanc"],
+    ),
+    ("ix_movimentacoes_data_lanc", "movimentacoes", ["data_lanc"]),
+    ("ix_juros_diarios_data", "juros_diarios", ["data"]),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
@@ -0,0 +1,105 @@
+"""Partition ``movimentacoes`` by ``data_lanc`` month (PostgreSQL only).
+
+The table is rebuilt as ``PARTITION BY RANGE (data_lanc)`` with one
+partition per month holding data plus the next
+``MOVIMENTACOES_PARTITIONS_AHEAD`` months, and a default partition for rows
+without ``data_lanc``. Later months are created by ``backend.partitions``.
+
+A primary key on a partitioned table must include the partition key and
+``data_lanc`` is nullable, so ``id`` keeps its sequence and a plain index
+instead; it is still the ORM identity of ``Movimentacao``. The rows are
+copied inside the migration transaction, so schedule it in a maintenance
+window on large databases. Other databases are left untouched.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from backend import partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = """
+    id INTEGER NOT NULL DEFAULT nextval('movimentacoes_id_seq'),
+    extrato_id INTEGER NOT NULL REFERENCES extratos (id),
+    data_ref DATE,
+    data_lanc DATE,
+    descricao VARCHAR,
+    valor_debito FLOAT,
+    valor_credito FLOAT,
+    saldo FLOAT,
+    conta_debito VARCHAR,
+    conta_credito VARCHAR,
+    regras_versao VARCHAR
+"""
+COLUMN_NAMES = ", ".join(
+    line.split()[0] for line in COLUMNS.strip().splitlines()
+)
+INDEXES = [
+    ("ix_movimentacoes_id", ["id"]),
+    ("ix_movimentacoes_extrato_id_data_lanc", ["extrato_id", "data_lanc"]),
+    ("ix_movimentacoes_data_lanc", ["data_lanc"]),
+]
+
+
+def _rebuild(partitioned: bool) -> None:
+    conn = op.get_bind()
+    for name, _ in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER TABLE movimentacoes RENAME TO movimentacoes_anterior")
+    # Keep the id sequence alive when the old table is dropped.
+    op.execute("ALTER SEQUENCE movimentacoes_id_seq OWNED BY NONE")
+    if partitioned:
+        op.execute(
+            f"CREATE TABLE movimentacoes ({COLUMNS}) PARTITION BY RANGE (data_lanc)"
+        )
+        op.execute(
+            "CREATE TABLE movimentacoes_default PARTITION OF movimentacoes DEFAULT"
+        )
+        first, last_data = conn.execute(
+            sa.text("SELECT min(data_lanc), max(data_lanc) FROM movimentacoes_anterior")
+        ).one()
+        current = partitions.month_start(date.today())
+        month = partitions.month_start(first) if first else current
+        last = partitions.add_months(
+            current, partitions.MOVIMENTACOES_PARTITIONS_AHEAD
+        )
+        if last_data:
+            last = max(last, partitions.month_start(last_data))
+        while month <= last:
+            partitions.create_partition(conn, month)
+            month = partitions.add_months(month, 1)
+    else:
+        op.execute(f"CREATE TABLE movimentacoes ({COLUMNS}, PRIMARY KEY (id))")
+    op.execute(
+        f"INSERT INTO movimentacoes ({COLUMN_NAMES}) "
+        f"SELECT {COLUMN_NAMES} FROM movimentacoes_anterior"
+    )
+    op.execute("DROP TABLE movimentacoes_anterior")
+    op.execute("ALTER SEQUENCE movimentacoes_id_seq OWNED BY movimentacoes.id")
+    for name, columns in INDEXES:
+        op.create_index(name, "movimentacoes", columns)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        _rebuild(partitioned=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        _rebuild(partitioned=False)
@@ -0,0 +1,55 @@
+"""``ON DELETE CASCADE`` on the foreign keys below ``contratos``.
+
+Deleting a contract then removes its extratos, movements, rates and ledger
+rows in the database instead of through the ORM.
+
+The naming convention matches PostgreSQL's default constraint names, so the
+same operations also name the (otherwise unnamed) SQLite constraints when
+batch mode recreates those tables.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+"""
+from typing import Optional, Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NAMING_CONVENTION = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+FOREIGN_KEYS = [
+    ("extratos", "contrato_id", "contratos"),
+    ("movimentacoes", "extrato_id", "extratos"),
+    ("taxas_contrato", "contrato_id", "contratos"),
+    ("juros_diarios", "contrato_id", "contratos"),
+]
+
+
+def _replace_foreign_keys(ondelete: Optional[str]) -> None:
+    for table, column, referred in FOREIGN_KEYS:
+        name = f"{table}_{column}_fkey"
+        with op.batch_alter_table(
+            table, naming_convention=NAMING_CONVENTION
+        ) as batch_op:
+            batch_op.drop_constraint(name, type_="foreignkey")
+            batch_op.create_foreign_key(
+                name, referred, [column], ["id"], ondelete=ondelete
+            )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _replace_foreign_keys("CASCADE")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _replace_foreign_keys(None)
@@ -0,0 +1,72 @@
+"""Per-contract movement summaries (``resumos_contrato``).
+
+Existing contracts are backfilled from ``movimentacoes``; afterwards
+``tasks.parse_sicoob`` keeps the rows current at each import.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LATEST_BALANCE = """
+    SELECT m.{column} FROM movimentacoes m
+    JOIN extratos e ON e.id = m.extrato_id
+    WHERE e.contrato_id = resumos_contrato.contrato_id
+      AND m.saldo IS NOT NULL AND m.data_lanc IS NOT NULL
+    ORDER BY m.data_lanc DESC, m.id DESC
+    LIMIT 1
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "resumos_contrato",
+        sa.Column("contrato_id", sa.Integer(), nullable=False),
+        sa.Column("saldo", sa.Float(), nullable=True),
+        sa.Column("data_saldo", sa.Date(), nullable=True),
+        sa.Column("total_debitos", sa.Float(), nullable=False),
+        sa.Column("total_creditos", sa.Float(), nullable=False),
+        sa.Column("movimentacoes", sa.Integer(), nullable=False),
+        sa.Column("ultima_importacao", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["contrato_id"], ["contratos.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("contrato_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO resumos_contrato
+            (contrato_id, total_debitos, total_creditos, movimentacoes)
+        SELECT e.contrato_id,
+               COALESCE(SUM(m.valor_debito), 0),
+               COALESCE(SUM(m.valor_credito), 0),
+               COUNT(m.id)
+        FROM extratos e
+        JOIN movimentacoes m ON m.extrato_id = e.id
+        WHERE e.contrato_id IS NOT NULL
+        GROUP BY e.contrato_id
+        """
+    )
+    op.execute(
+        f"""
+        UPDATE resumos_contrato
+        SET saldo = ({LATEST_BALANCE.format(column="saldo")}),
+            data_saldo = ({LATEST_BALANCE.format(column="data_lanc")})
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("resumos_contrato")
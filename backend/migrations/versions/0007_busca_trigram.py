@@ -0,0 +1,63 @@
+"""Trigram index for substring search on ``movimentacoes.descricao``.
+
+PostgreSQL only: enables ``pg_trgm`` and builds a GIN index with
+``gin_trgm_ops``, which serves ``ILIKE '%fragment%'`` without scanning the
+table. On the partitioned table the index is declared on the parent only
+and each partition's index is built ``CONCURRENTLY`` and attached, so
+writes are never blocked; partitions created later inherit it. The index is
+not declared on the model because SQLite has no equivalent and searches
+there fall back to ``LIKE``.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from backend import partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = "ix_movimentacoes_descricao_trgm"
+INDEX_METHOD = "USING gin (descricao gin_trgm_ops)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        if not partitions.is_partitioned(conn):
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} "
+                f"ON movimentacoes {INDEX_METHOD}"
+            )
+            return
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} "
+            f"ON ONLY movimentacoes {INDEX_METHOD}"
+        )
+        for name in partitions.list_partitions(conn):
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}_descricao_trgm" '
+                f'ON "{name}" {INDEX_METHOD}'
+            )
+            op.execute(
+                f'ALTER INDEX {INDEX_NAME} ATTACH PARTITION "{name}_descricao_trgm"'
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
@@ -0,0 +1,38 @@
+"""Registered versions of the classification rules (``regras_contabeis``).
+
+``tasks.reclassify_movimentacoes`` compares the configuration a movement was
+classified with to the current one and only reclassifies the affected rows.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "regras_contabeis",
+        sa.Column("versao", sa.String(), nullable=False),
+        sa.Column("config", sa.JSON(), nullable=False),
+        sa.Column("registrada_em", sa.DateTime(), nullable=False),
+        sa.Column("sincronizada_com", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("versao"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("regras_contabeis")
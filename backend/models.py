@@ -1,4 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, JSON
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    JSON,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 
 from .db import Base
@@ -16,6 +28,10 @@ class Empresa(Base):
 
 class Contrato(Base):
     __tablename__ = "contratos"
+    __table_args__ = (
+        Index("ix_contratos_empresa_id", "empresa_id"),
+        Index("ix_contratos_data_inicio", "data_inicio"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     empresa_id = Column(Integer, ForeignKey("empresas.id"), nullable=False)
@@ -26,32 +42,173 @@ class Contrato(Base):
     data_inicio = Column(Date, nullable=False)
 
     empresa = relationship("Empresa", back_populates="contratos")
-    extratos = relationship("Extrato", back_populates="contrato", cascade="all, delete-orphan")
+    # Children are removed by ``ON DELETE CASCADE``; ``passive_deletes`` keeps
+    # the ORM from loading them just to delete them row by row.
+    extratos = relationship(
+        "Extrato",
+        back_populates="contrato",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    juros_diarios = relationship(
+        "JurosDiario",
+        back_populates="contrato",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    taxas = relationship(
+        "TaxaContrato",
+        back_populates="contrato",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="TaxaContrato.vigencia",
+    )
+    resumo = relationship(
+        "ResumoContrato",
+        back_populates="contrato",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
 
 
 class Extrato(Base):
     __tablename__ = "extratos"
+    __table_args__ = (Index("ix_extratos_contrato_id_status", "contrato_id", "status"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    contrato_id = Column(Integer, ForeignKey("contratos.id"), nullable=True)
+    contrato_id = Column(
+        Integer, ForeignKey("contratos.id", ondelete="CASCADE"), nullable=True
+    )
     filepath = Column(String, nullable=False)
     status = Column(String, nullable=False)
     meta = Column("metadata", JSON, nullable=True)
 
     contrato = relationship("Contrato", back_populates="extratos")
-    movimentacoes = relationship("Movimentacao", back_populates="extrato", cascade="all, delete-orphan")
+    movimentacoes = relationship(
+        "Movimentacao",
+        back_populates="extrato",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
 
 
 class Movimentacao(Base):
     __tablename__ = "movimentacoes"
+    __table_args__ = (
+        Index("ix_movimentacoes_extrato_id_data_lanc", "extrato_id", "data_lanc"),
+        Index("ix_movimentacoes_data_lanc", "data_lanc"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    extrato_id = Column(Integer, ForeignKey("extratos.id"), nullable=False)
+    extrato_id = Column(
+        Integer, ForeignKey("extratos.id", ondelete="CASCADE"), nullable=False
+    )
     data_ref = Column(Date)
     data_lanc = Column(Date)
     descricao = Column(String)
     valor_debito = Column(Float)
     valor_credito = Column(Float)
     saldo = Column(Float)
+    # Classification persisted at import; ``regras_versao`` is the version of
+    # ``account_rules.json`` used, so stale rows can be reclassified.
+    conta_debito = Column(String)
+    conta_credito = Column(String)
+    regras_versao = Column(String)
 
     extrato = relationship("Extrato", back_populates="movimentacoes")
+
+
+class RegrasContabeis(Base):
+    """A version of ``account_rules.json`` used to classify movements.
+
+    ``sincronizada_com`` is the latest rules version the movements still
+    stamped with ``versao`` were checked against: their stored accounts are
+    the ones that version assigns.
+    """
+
+    __tablename__ = "regras_contabeis"
+
+    versao = Column(String, primary_key=True)
+    config = Column(JSON, nullable=False)
+    registrada_em = Column(DateTime, nullable=False)
+    sincronizada_com = Column(String)
+
+
+class TaxaContrato(Base):
+    """Annual rate in effect for a contract from ``vigencia`` onwards.
+
+    Before the first entry the contract's own ``taxa_anual`` applies.
+    """
+
+    __tablename__ = "taxas_contrato"
+    __table_args__ = (UniqueConstraint("contrato_id", "vigencia"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    contrato_id = Column(
+        Integer, ForeignKey("contratos.id", ondelete="CASCADE"), nullable=False
+    )
+    vigencia = Column(Date, nullable=False)
+    taxa_anual = Column(Float, nullable=False)
+
+    contrato = relationship("Contrato", back_populates="taxas")
+
+
+class JurosDiario(Base):
+    """Daily interest accrual ledger entry for a contract."""
+
+    __tablename__ = "juros_diarios"
+    __table_args__ = (Index("ix_juros_diarios_data", "data"),)
+
+    contrato_id = Column(
+        Integer, ForeignKey("contratos.id", ondelete="CASCADE"), primary_key=True
+    )
+    data = Column(Date, primary_key=True)
+    saldo = Column(Float, nullable=False)
+    taxa_anual = Column(Float, nullable=False)
+    juros = Column(Float, nullable=False)
+
+    contrato = relationship("Contrato", back_populates="juros_diarios")
+
+
+class ResumoContrato(Base):
+    """Aggregates of a contract's movements, kept up to date at import.
+
+    ``saldo`` is the balance of the latest dated movement carrying one and
+    ``data_saldo`` its launch date.
+    """
+
+    __tablename__ = "resumos_contrato"
+
+    contrato_id = Column(
+        Integer, ForeignKey("contratos.id", ondelete="CASCADE"), primary_key=True
+    )
+    saldo = Column(Float)
+    data_saldo = Column(Date)
+    total_debitos = Column(Float, nullable=False, default=0.0)
+    total_creditos = Column(Float, nullable=False, default=0.0)
+    movimentacoes = Column(Integer, nullable=False, default=0)
+    ultima_importacao = Column(DateTime)
+
+    contrato = relationship("Contrato", back_populates="resumo")
+
+
+class FechamentoJuros(Base):
+    """Record of an accrual ledger close up to ``fechado_ate``."""
+
+    __tablename__ = "fechamentos_juros"
+
+    id = Column(Integer, primary_key=True, index=True)
+    fechado_ate = Column(Date, nullable=False)
+    executado_em = Column(DateTime, nullable=False)
+
+
+class Usuario(Base):
+    """API user; ``senha_hash`` is a passlib (bcrypt) hash."""
+
+    __tablename__ = "usuarios"
+
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, unique=True, nullable=False)
+    senha_hash = Column(String, nullable=False)
+    ativo = Column(Boolean, nullable=False, default=True)
@@ -1,6 +1,16 @@
+from contextlib import nullcontext
 from importlib import import_module
 import pkgutil
-from typing import Callable, Dict, Iterable, BinaryIO, Union, Protocol
+from typing import (
+    BinaryIO,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Optional,
+    Protocol,
+    Union,
+)
 
 
 class ParserNotFoundError(ValueError):
@@ -8,10 +18,25 @@ class ParserNotFoundError(ValueError):
 
 
 ParserInput = Union[bytes, BinaryIO, Iterable[bytes]]
+# Called with ``(page_number, total_pages)`` before each page is read; it may
+# raise to abort parsing.
+PageCallback = Callable[[int, int], None]
+# Called with a stage name ("read", "extract", "ocr" or "regex"); the stage
+# runs inside the returned context manager, which may time it.
+StageTimer = Callable[[str], ContextManager[None]]
+
+
+def untimed(stage: str) -> ContextManager[None]:
+    return nullcontext()
 
 
 class Parser(Protocol):
-    def __call__(self, pdf_stream: ParserInput) -> dict:  # pragma: no cover - interface
+    def __call__(
+        self,
+        pdf_stream: ParserInput,
+        on_page: Optional[PageCallback] = None,
+        timed: StageTimer = untimed,
+    ) -> dict:  # pragma: no cover - interface
         """Parse raw PDF data into structured information."""
 
 
@@ -33,9 +58,14 @@ def get(name: str) -> Parser:
         raise ParserNotFoundError(f"Parser '{name}' not found") from exc
 
 
-def parse(name: str, pdf_stream: ParserInput) -> dict:
+def parse(
+    name: str,
+    pdf_stream: ParserInput,
+    on_page: Optional[PageCallback] = None,
+    timed: StageTimer = untimed,
+) -> dict:
     parser = get(name)
-    return parser(pdf_stream)
+    return parser(pdf_stream, on_page=on_page, timed=timed)
 
 
 def _load_plugins() -> None:
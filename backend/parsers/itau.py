@@ -6,7 +6,7 @@ from pdf2image import convert_from_bytes
 import pdfplumber
 from pytesseract import image_to_string
 
-from . import register
+from . import PageCallback, StageTimer, register, untimed
 
 
 def _ensure_bytes(pdf_source: Union[bytes, BinaryIO, Iterable[bytes]]) -> bytes:
@@ -38,23 +38,51 @@ def _parse_currency(value: str) -> Optional[float]:
 
 
 @register("itau")
-def parse(pdf_source: Union[bytes, BinaryIO, Iterable[bytes]]) -> Dict[str, List[Dict[str, Optional[float]]]]:
+def parse(
+    pdf_source: Union[bytes, BinaryIO, Iterable[bytes]],
+    on_page: Optional[PageCallback] = None,
+    timed: StageTimer = untimed,
+) -> Dict[str, List[Dict[str, Optional[float]]]]:
     """Parse Itaú bank statement PDF data into structured information.
 
     The input may be raw bytes, a file-like object, or an iterable of byte
     chunks. The parser first attempts to extract text using pdfplumber. If the
-    PDF contains only images, it falls back to OCR using Tesseract.
+    PDF contains only images, it falls back to OCR using Tesseract. Pages are
+    processed one at a time, and ``on_page`` is called before each of them.
+    Each stage runs inside ``timed(stage)``.
     """
 
-    pdf_bytes = _ensure_bytes(pdf_source)
+    with timed("read"):
+        pdf_bytes = _ensure_bytes(pdf_source)
 
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        text = "\n".join(page.extract_text() or "" for page in pdf.pages)
+    texts = []
+    with timed("extract"), pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        total = len(pdf.pages)
+        for number, page in enumerate(pdf.pages, start=1):
+            if on_page is not None:
+                on_page(number, total)
+            texts.append(page.extract_text() or "")
+            # Release the page's layout objects before reading the next one.
+            page.close()
+    text = "\n".join(texts)
 
     if not text.strip():
-        images = convert_from_bytes(pdf_bytes)
-        text = "\n".join(image_to_string(img, lang="por") for img in images)
-
+        texts = []
+        with timed("ocr"):
+            for number in range(1, total + 1):
+                if on_page is not None:
+                    on_page(number, total)
+                images = convert_from_bytes(
+                    pdf_bytes, first_page=number, last_page=number
+                )
+                texts.extend(image_to_string(img, lang="por") for img in images)
+        text = "\n".join(texts)
+
+    with timed("regex"):
+        return _parse_text(text)
+
+
+def _parse_text(text: str) -> Dict[str, List[Dict[str, Optional[float]]]]:
     lines = [line.strip() for line in text.splitlines() if line.strip()]
 
     # Locate the table header which contains the data labels
@@ -0,0 +1,234 @@
+"""Monthly range partitions of ``movimentacoes`` on PostgreSQL.
+
+Migration ``0004`` turns ``movimentacoes`` into a table partitioned by
+``data_lanc`` month, with a default partition for rows without a date.
+Export queries filter ``data_lanc`` directly, so PostgreSQL prunes every
+partition outside the requested period.
+
+This module keeps the partition set in shape: partitions are created ahead
+of time by the cron (and, for older months, before each import writes, in a
+transaction of their own), and partitions older
+than the retention window are detached and moved to an archive schema, and
+optionally an archive tablespace, so index size and vacuum cost stay
+bounded. On other databases (e.g. SQLite in tests) every function is a
+no-op.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+from datetime import date
+from typing import Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "movimentacoes"
+MOVIMENTACOES_PARTITIONS_AHEAD = int(
+    os.environ.get("MOVIMENTACOES_PARTITIONS_AHEAD", 3)
+)
+# Months of movements kept attached; 0 disables archival.
+MOVIMENTACOES_RETENTION_MONTHS = int(
+    os.environ.get("MOVIMENTACOES_RETENTION_MONTHS", 0)
+)
+MOVIMENTACOES_ARCHIVE_SCHEMA = os.environ.get(
+    "MOVIMENTACOES_ARCHIVE_SCHEMA", "arquivo"
+)
+# Optional tablespace on cheaper storage for archived partitions.
+MOVIMENTACOES_ARCHIVE_TABLESPACE = os.environ.get(
+    "MOVIMENTACOES_ARCHIVE_TABLESPACE"
+)
+
+_PARTITION_RE = re.compile(rf"^{PARENT_TABLE}_(\d{{4}})_(\d{{2}})$")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Return the month covered by a partition name, if it is a monthly one."""
+    match = _PARTITION_RE.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def expired_partitions(
+    names: Iterable[str], today: date, keep_months: int
+) -> List[str]:
+    """Return monthly partitions entirely older than the retention window."""
+
+    if keep_months <= 0:
+        return []
+    cutoff = add_months(month_start(today), -keep_months)
+    expired = []
+    for name in names:
+        month = partition_month(name)
+        if month is not None and month < cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(
+        conn.scalar(
+            text(
+                "SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass(:parent)"
+            ),
+            {"parent": PARENT_TABLE},
+        )
+    )
+
+
+def list_partitions(conn: Connection) -> List[str]:
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:parent)"
+        ),
+        {"parent": PARENT_TABLE},
+    )
+    return [row[0] for row in rows]
+
+
+def default_partition(conn: Connection) -> Optional[str]:
+    return conn.scalar(
+        text(
+            "SELECT c.relname FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partdefid "
+            "WHERE p.partrelid = to_regclass(:parent)"
+        ),
+        {"parent": PARENT_TABLE},
+    )
+
+
+def create_partition(conn: Connection, month: date) -> None:
+    """Create the partition holding ``month`` (DDL; PostgreSQL only).
+
+    PostgreSQL refuses to create a partition for a range that already has
+    rows in the default partition, so those rows are moved into a new table
+    which is then attached in its place.
+    """
+
+    name = partition_name(month)
+    bounds = (
+        f"FOR VALUES FROM ('{month.isoformat()}') "
+        f"TO ('{add_months(month, 1).isoformat()}')"
+    )
+    default = default_partition(conn)
+    in_range = "data_lanc >= :start AND data_lanc < :end"
+    params = {"start": month, "end": add_months(month, 1)}
+    if default and conn.scalar(
+        text(f'SELECT 1 FROM "{default}" WHERE {in_range} LIMIT 1'), params
+    ):
+        conn.execute(
+            text(f'CREATE TABLE "{name}" (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)')
+        )
+        conn.execute(
+            text(
+                f'WITH moved AS (DELETE FROM "{default}" WHERE {in_range} '
+                f'RETURNING *) INSERT INTO "{name}" SELECT * FROM moved'
+            ),
+            params,
+        )
+        conn.execute(
+            text(f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION "{name}" {bounds}')
+        )
+        logger.info("Partição %s criada com linhas da partição padrão", name)
+        return
+    conn.execute(
+        text(
+            f'CREATE TABLE IF NOT EXISTS "{name}" '
+            f"PARTITION OF {PARENT_TABLE} {bounds}"
+        )
+    )
+    logger.info("Partição %s criada", name)
+
+
+def ensure_partitions(conn: Connection, days: Iterable[date]) -> List[str]:
+    """Make sure a partition exists for the month of each of ``days``.
+
+    Existing partitions are detected from the catalog first, so the DDL (and
+    its lock on the parent table) only runs for missing months.
+    """
+
+    if not is_partitioned(conn):
+        return []
+    existing = set(list_partitions(conn))
+    created = []
+    for month in sorted({month_start(d) for d in days if d is not None}):
+        if partition_name(month) not in existing:
+            create_partition(conn, month)
+            created.append(partition_name(month))
+    return created
+
+
+def ensure_partitions_for(engine: Engine, days: Iterable[Optional[date]]) -> List[str]:
+    """:func:`ensure_partitions` in a short transaction of its own.
+
+    Creating a partition locks ``movimentacoes`` exclusively until commit;
+    inside an import's transaction that would block every export and search
+    for the whole import. Call it before the import writes anything: the new
+    partition's foreign key also locks ``extratos``.
+    """
+
+    if engine.dialect.name != "postgresql":
+        return []
+    with engine.begin() as conn:
+        return ensure_partitions(conn, days)
+
+
+def archive_partition(conn: Connection, name: str) -> None:
+    """Detach a partition and move it to the archive schema/tablespace."""
+
+    conn.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{name}"'))
+    schema = MOVIMENTACOES_ARCHIVE_SCHEMA
+    conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+    conn.execute(text(f'ALTER TABLE "{name}" SET SCHEMA "{schema}"'))
+    if MOVIMENTACOES_ARCHIVE_TABLESPACE:
+        conn.execute(
+            text(
+                f'ALTER TABLE "{schema}"."{name}" '
+                f'SET TABLESPACE "{MOVIMENTACOES_ARCHIVE_TABLESPACE}"'
+            )
+        )
+    logger.info("Partição %s arquivada em %s", name, schema)
+
+
+def maintain(
+    conn: Connection,
+    today: Optional[date] = None,
+    ahead: int = MOVIMENTACOES_PARTITIONS_AHEAD,
+    keep_months: int = MOVIMENTACOES_RETENTION_MONTHS,
+) -> dict:
+    """Create the next ``ahead`` months and archive expired partitions."""
+
+    if not is_partitioned(conn):
+        return {"created": [], "archived": []}
+    today = today or date.today()
+    current = month_start(today)
+    created = ensure_partitions(
+        conn, [add_months(current, i) for i in range(ahead + 1)]
+    )
+    archived = expired_partitions(list_partitions(conn), today, keep_months)
+    for name in archived:
+        archive_partition(conn, name)
+    return {"created": created, "archived": archived}
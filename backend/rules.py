@@ -1,25 +1,205 @@
+import hashlib
 import json
 import os
-from typing import Tuple
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Pattern, Set, Tuple
 
 CONFIG_PATH = os.environ.get(
     "ACCOUNT_RULES_PATH", os.path.join(os.path.dirname(__file__), "account_rules.json")
 )
+# Seconds between ``stat`` calls checking whether the rules file changed.
+RELOAD_INTERVAL = float(os.environ.get("ACCOUNT_RULES_RELOAD_INTERVAL", 1.0))
+CLASSIFY_CACHE_SIZE = int(os.environ.get("ACCOUNT_RULES_CACHE_SIZE", 65536))
+
+DEFAULT_ACCOUNTS: Tuple[str, str] = ("000", "000")
+
 
 def load_config() -> dict:
     """Load classification rules from JSON configuration."""
     with open(CONFIG_PATH, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def classify(desc: str) -> Tuple[str, str]:
-    """Classify a description using rules from configuration."""
-    cfg = load_config()
+
+def rule_table(cfg: dict) -> Dict[str, Tuple[str, ...]]:
+    """Effective rules of ``cfg``: keyword -> accounts, in priority order."""
+
     account_map = cfg.get("account_map", {})
-    d = desc.lower()
+    table: Dict[str, Tuple[str, ...]] = {}
     for rule in cfg.get("classify_rules", []):
         keyword = rule.get("keyword", "").lower()
-        if keyword and keyword in d:
-            accounts = account_map.get(rule.get("account"))
-            if accounts:
-                return tuple(accounts)
-    return ("000", "000")
+        mapped = account_map.get(rule.get("account"))
+        # Rules without a keyword or a mapped account never match.
+        if not keyword or not mapped or keyword in table:
+            continue
+        table[keyword] = tuple(mapped)
+    return table
+
+
+def changed_keywords(old: dict, new: dict) -> Set[str]:
+    """Keywords whose descriptions may be classified differently by ``new``.
+
+    A description classified under ``old`` keeps its accounts under ``new``
+    unless it contains one of these: keywords added or removed, mapped to
+    other accounts, or moved relative to another keyword kept by both.
+    """
+
+    before, after = rule_table(old), rule_table(new)
+    changed = set(before.keys() ^ after.keys())
+    changed.update(k for k in before.keys() & after.keys() if before[k] != after[k])
+
+    def preceding(table: Dict[str, Tuple[str, ...]]) -> Dict[str, Set[str]]:
+        seen: Set[str] = set()
+        result = {}
+        for keyword in table:
+            if keyword in before and keyword in after:
+                result[keyword] = set(seen)
+                seen.add(keyword)
+        return result
+
+    order_before, order_after = preceding(before), preceding(after)
+    changed.update(k for k in order_before if order_before[k] != order_after[k])
+    return changed
+
+
+class Ruleset:
+    """One compiled configuration, replaced as a whole on reload.
+
+    ``version`` and ``config`` are the content hash and the parsed file it
+    was compiled from. Instances hash by identity, so memoized results are
+    keyed by the ruleset that produced them.
+    """
+
+    __slots__ = ("pattern", "priority", "accounts", "version", "config")
+
+    def __init__(
+        self,
+        pattern: Optional[Pattern[str]],
+        priority: Dict[str, int],
+        accounts: List[Tuple[str, ...]],
+        version: str = "",
+        config: Optional[dict] = None,
+    ) -> None:
+        self.pattern = pattern
+        self.priority = priority
+        self.accounts = accounts
+        self.version = version
+        self.config = config if config is not None else {}
+
+
+class RulesEngine:
+    """Classifier compiled from the rules configuration.
+
+    All keywords are combined into a single regular expression. Rules keep
+    their configured priority: the first rule (in file order) whose keyword
+    occurs anywhere in the description wins, as with a linear scan. Results
+    are memoized per description and the configuration is recompiled when
+    the file's modification time changes. ``version`` identifies the loaded
+    configuration by content hash so persisted classifications can be
+    checked for staleness.
+
+    The compiled rules live in a single :class:`Ruleset` swapped atomically
+    on reload; ``classify`` reads it once, so a concurrent reload never mixes
+    the pattern of one configuration with the priorities of another. Jobs
+    that stamp rows with a version take a ruleset from :meth:`snapshot` and
+    classify every row against it.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self._checked_at = 0.0
+        self._rules = Ruleset(None, {}, [])
+        self._classify = lru_cache(maxsize=CLASSIFY_CACHE_SIZE)(self._match)
+
+    def _config_path(self) -> str:
+        return self.path or CONFIG_PATH
+
+    def compile(self, cfg: dict, version: str = "") -> None:
+        """Build the combined matcher from a configuration dictionary."""
+
+        table = rule_table(cfg)
+        priority = {keyword: rank for rank, keyword in enumerate(table)}
+        accounts = list(table.values())
+
+        pattern = None
+        if priority:
+            alternatives = "|".join(re.escape(k) for k in priority)
+            # The lookahead reports a match at every position, so keywords
+            # overlapping an earlier match are not skipped.
+            pattern = re.compile(f"(?=({alternatives}))")
+
+        self._rules = Ruleset(pattern, priority, accounts, version, cfg)
+        # Entries of the previous ruleset can no longer be hit; free them.
+        self._classify.cache_clear()
+
+    def _reload_if_changed(self) -> None:
+        now = time.monotonic()
+        if self._mtime is not None and now - self._checked_at < RELOAD_INTERVAL:
+            return
+        with self._lock:
+            self._checked_at = now
+            path = self._config_path()
+            mtime = os.stat(path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            with open(path, "rb") as f:
+                raw = f.read()
+            self.compile(json.loads(raw), hashlib.sha256(raw).hexdigest()[:12])
+            self._mtime = mtime
+
+    @property
+    def version(self) -> str:
+        """Content hash of the currently loaded configuration."""
+        self._reload_if_changed()
+        return self._rules.version
+
+    def snapshot(self) -> Ruleset:
+        """The ruleset currently loaded, to classify a whole job with."""
+        self._reload_if_changed()
+        return self._rules
+
+    @staticmethod
+    def _match(rules: Ruleset, desc: str) -> Tuple[str, ...]:
+        if rules.pattern is None:
+            return DEFAULT_ACCOUNTS
+        best = None
+        for match in rules.pattern.finditer(desc.lower()):
+            rank = rules.priority[match.group(1)]
+            if best is None or rank < best:
+                best = rank
+                if rank == 0:
+                    break
+        if best is None:
+            return DEFAULT_ACCOUNTS
+        return rules.accounts[best]
+
+    def classify(
+        self, desc: str, rules: Optional[Ruleset] = None
+    ) -> Tuple[str, str]:
+        """Classify ``desc`` with ``rules``, or the current rules if omitted."""
+        if rules is None:
+            self._reload_if_changed()
+            rules = self._rules
+        return self._classify(rules, desc)
+
+
+_engine = RulesEngine()
+
+
+def get_engine() -> RulesEngine:
+    """Return the process-wide rules engine."""
+    return _engine
+
+
+def classify(desc: str) -> Tuple[str, str]:
+    """Classify a description using rules from configuration."""
+    return _engine.classify(desc)
+
+
+def current_version() -> str:
+    """Return the version of the rules currently in effect."""
+    return _engine.version
@@ -0,0 +1,201 @@
+"""Per-tenant upload queues and the fair worker that drains them.
+
+Uploads are sharded by empresa: each tenant gets its own RQ queue
+(``uploads:<empresa_id>``), registered in the ``uploads:tenants`` set when the
+first job is enqueued. Uploads without a tenant, and the other background
+jobs, keep using the shared ``uploads`` queue, which takes part in the
+rotation like any tenant; ``uploads-low`` is always polled last.
+
+:class:`FairWorker` serves the queues round-robin: after a tenant gets its
+turn (``UPLOAD_TENANT_WEIGHTS`` consecutive jobs, one by default) it moves to
+the back of the line, so a large backfill only delays a small tenant by one
+job per worker. New tenant queues are picked up every
+``UPLOAD_TENANT_REFRESH`` seconds.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from redis import Redis
+from redis.exceptions import RedisError
+from rq import Queue, Worker
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_QUEUE = "uploads"
+UPLOAD_LOW_QUEUE = "uploads-low"
+UPLOAD_TENANT_REGISTRY = "uploads:tenants"
+UPLOAD_TENANT_REFRESH = float(os.environ.get("UPLOAD_TENANT_REFRESH", 5))
+
+
+def parse_weights(value: str) -> Dict[int, int]:
+    """Parse ``"12:3,7:2"`` into ``{12: 3, 7: 2}``, ignoring malformed items."""
+
+    weights: Dict[int, int] = {}
+    for item in value.split(","):
+        tenant, _, weight = item.partition(":")
+        try:
+            weights[int(tenant)] = max(1, int(weight))
+        except ValueError:
+            if item.strip():
+                logger.warning("Peso de empresa inválido: %r", item)
+    return weights
+
+
+UPLOAD_TENANT_WEIGHTS = parse_weights(os.environ.get("UPLOAD_TENANT_WEIGHTS", ""))
+
+
+def tenant_queue_name(tenant: Optional[int]) -> str:
+    return f"{UPLOAD_QUEUE}:{tenant}" if tenant else UPLOAD_QUEUE
+
+
+def queue_tenant(name: str) -> Optional[int]:
+    """Return the empresa of a tenant queue name, ``None`` for shared queues."""
+
+    prefix, _, tenant = name.partition(":")
+    if prefix != UPLOAD_QUEUE or not tenant.isdigit():
+        return None
+    return int(tenant)
+
+
+def tenant_queue(redis: Redis, tenant: int) -> Queue:
+    """Return the upload queue of ``tenant``, registering it for the workers."""
+
+    redis.sadd(UPLOAD_TENANT_REGISTRY, tenant)
+    return Queue(tenant_queue_name(tenant), connection=redis)
+
+
+def tenant_queue_names(redis: Redis) -> List[str]:
+    tenants = sorted(int(t) for t in redis.smembers(UPLOAD_TENANT_REGISTRY))
+    return [tenant_queue_name(t) for t in tenants]
+
+
+def upload_queue_names(redis: Redis) -> List[str]:
+    """Every upload queue: shared, per tenant, then low priority."""
+
+    return [UPLOAD_QUEUE, *tenant_queue_names(redis), UPLOAD_LOW_QUEUE]
+
+
+def queue_depths(redis: Redis) -> List[dict]:
+    """Queued job count of every upload queue."""
+
+    return [
+        {
+            "queue": name,
+            "empresa_id": queue_tenant(name),
+            "queued": Queue(name, connection=redis).count,
+        }
+        for name in upload_queue_names(redis)
+    ]
+
+
+class TenantRotation:
+    """Weighted round-robin order of queue names.
+
+    ``served(name)`` records a job taken from ``name``; once the queue used
+    its weight in consecutive turns it goes to the back. ``last`` names stay
+    at the end regardless.
+    """
+
+    def __init__(
+        self,
+        names: Iterable[str],
+        weights: Optional[Dict[int, int]] = None,
+        last: Sequence[str] = (UPLOAD_LOW_QUEUE,),
+    ) -> None:
+        names = list(names)
+        self.weights = weights if weights is not None else UPLOAD_TENANT_WEIGHTS
+        self.last = [n for n in last if n in names]
+        self._order = [n for n in names if n not in self.last]
+        self._turns = 0
+
+    @property
+    def order(self) -> List[str]:
+        return self._order + self.last
+
+    def weight(self, name: str) -> int:
+        return self.weights.get(queue_tenant(name) or 0, 1)
+
+    def served(self, name: str) -> None:
+        if name not in self._order:
+            return
+        if self._order[0] == name:
+            self._turns += 1
+        else:
+            # Someone ahead was empty: ``name`` starts a fresh turn.
+            self._turns = 1
+        if self._turns < self.weight(name):
+            self._order.remove(name)
+            self._order.insert(0, name)
+            return
+        self._order.remove(name)
+        self._order.append(name)
+        self._turns = 0
+
+    def update(self, names: Iterable[str]) -> bool:
+        """Sync with ``names``; new queues join the back. Return if changed."""
+
+        names = [n for n in names if n not in self.last]
+        wanted = set(names)
+        order = [n for n in self._order if n in wanted]
+        order += [n for n in names if n not in order]
+        changed = order != self._order
+        self._order = order
+        return changed
+
+
+class FairWorker(Worker):
+    """RQ worker that rotates across the per-tenant upload queues."""
+
+    def __init__(self, queues, *args, **kwargs) -> None:
+        super().__init__(queues, *args, **kwargs)
+        self.rotation = TenantRotation(q.name for q in self.queues)
+        self._refreshed_at = 0.0
+        self.refresh_queues()
+
+    @property
+    def dequeue_timeout(self) -> int:
+        # Wake up often enough to start listening on new tenant queues.
+        return max(1, min(super().dequeue_timeout, int(UPLOAD_TENANT_REFRESH)))
+
+    def refresh_queues(self) -> None:
+        now = time.monotonic()
+        if now - self._refreshed_at < UPLOAD_TENANT_REFRESH:
+            return
+        self._refreshed_at = now
+        try:
+            tenants = tenant_queue_names(self.connection)
+        except RedisError as exc:
+            logger.warning("Falha ao listar filas das empresas: %s", exc)
+            return
+        if self.rotation.update([*self.rotation.order, *tenants]):
+            self._apply_order()
+
+    def _apply_order(self) -> None:
+        known = {q.name: q for q in self.queues}
+        self.queues = [
+            known.get(name)
+            or self.queue_class(
+                name,
+                connection=self.connection,
+                job_class=self.job_class,
+                serializer=self.serializer,
+            )
+            for name in self.rotation.order
+        ]
+        self._ordered_queues = list(self.queues)
+
+    def heartbeat(self, timeout=None, pipeline=None) -> None:
+        super().heartbeat(timeout, pipeline=pipeline)
+        if pipeline is None:
+            # Runs on every pass of the dequeue loop, idle timeouts included.
+            self.refresh_queues()
+
+    def reorder_queues(self, reference_queue: Queue) -> None:
+        self.rotation.served(reference_queue.name)
+        known = {q.name: q for q in self.queues}
+        self._ordered_queues = [known[name] for name in self.rotation.order]
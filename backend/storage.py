@@ -0,0 +1,281 @@
+"""Content-addressed storage of uploaded statements.
+
+Files are keyed by the SHA-256 of their bytes (``ab/cd/abcd….pdf``), so the
+same PDF uploaded twice is stored once. ``STORAGE_BACKEND`` selects the
+driver used for new uploads:
+
+* ``local`` (default): files under ``UPLOAD_DIR``; ``Extrato.filepath`` holds
+  the path, as before;
+* ``s3``: an S3-compatible bucket (``S3_BUCKET``, with ``S3_ENDPOINT_URL`` for
+  MinIO and similar); ``Extrato.filepath`` holds ``s3://bucket/key``. Uploads
+  go up in ``S3_PART_SIZE`` multipart chunks and workers read the object
+  with ranged ``GET`` requests, so API and workers need no shared volume.
+  Requires the optional ``boto3`` package.
+
+:func:`open_file` opens either kind of location, so statements stored before
+a switch of backend stay readable.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import BinaryIO, Iterator, Tuple, Union
+
+try:  # pragma: no cover - optional dependency
+    import boto3
+except ImportError:  # pragma: no cover - optional dependency
+    boto3 = None
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "local").lower()
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "storage")
+S3_BUCKET = os.environ.get("S3_BUCKET", "")
+S3_PREFIX = os.environ.get("S3_PREFIX", "extratos/")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None
+# S3 rejects multipart parts smaller than 5 MiB (except the last one).
+S3_PART_SIZE = max(
+    5 * 1024 * 1024, int(os.environ.get("S3_PART_SIZE", 8 * 1024 * 1024))
+)
+S3_READ_CHUNK = int(os.environ.get("S3_READ_CHUNK", 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+
+_NOT_FOUND = {"404", "NoSuchKey", "NotFound"}
+
+
+class StorageError(Exception):
+    """A file could not be stored or read."""
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    uri: str
+    sha256: str
+    size: int
+    # ``False`` when an identical file was already stored.
+    created: bool
+
+
+def content_key(sha256: str, suffix: str = ".pdf") -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{suffix}"
+
+
+def iter_chunks(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    while chunk := stream.read(chunk_size):
+        yield chunk
+
+
+class LocalStorage:
+    """Content-addressed files under ``root``."""
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def put(self, stream: BinaryIO) -> StoredFile:
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            # Hash while writing, then move into place under the final name.
+            tmp = tempfile.NamedTemporaryFile(
+                dir=self.root, suffix=".part", delete=False
+            )
+        except OSError as exc:
+            raise StorageError(str(exc)) from exc
+        try:
+            with tmp:
+                for chunk in iter_chunks(stream):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tmp.write(chunk)
+            sha256 = digest.hexdigest()
+            path = os.path.join(self.root, content_key(sha256))
+            created = not os.path.exists(path)
+            if created:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp.name, path)
+        except OSError as exc:
+            raise StorageError(str(exc)) from exc
+        finally:
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+        return StoredFile(path, sha256, size, created)
+
+    def open(self, uri: str) -> BinaryIO:
+        return open(uri, "rb")
+
+
+class S3RangeReader(io.RawIOBase):
+    """Seekable reader of an S3 object, fetched with ranged ``GET`` requests."""
+
+    def __init__(self, client, bucket: str, key: str, size: int) -> None:
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def _get(self, length: int) -> bytes:
+        if self.position >= self.size or length <= 0:
+            return b""
+        end = min(self.position + length, self.size) - 1
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=f"bytes={self.position}-{end}"
+        )
+        data = response["Body"].read()
+        self.position += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self._get(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def readall(self) -> bytes:
+        return self._get(self.size - self.position)
+
+
+class S3Storage:
+    """Content-addressed objects in an S3-compatible bucket."""
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = S3_PREFIX,
+        client=None,
+        part_size: int = S3_PART_SIZE,
+        read_chunk: int = S3_READ_CHUNK,
+    ) -> None:
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("STORAGE_BACKEND=s3 requires the boto3 package")
+            client = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client
+        self.part_size = part_size
+        self.read_chunk = read_chunk
+
+    @staticmethod
+    def parse_uri(uri: str) -> Tuple[str, str]:
+        bucket, _, key = uri[len("s3://") :].partition("/")
+        return bucket, key
+
+    def _exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except Exception as exc:
+            code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+            if code in _NOT_FOUND:
+                return False
+            raise
+        return True
+
+    def put(self, stream: BinaryIO) -> StoredFile:
+        if not stream.seekable():
+            spool = tempfile.SpooledTemporaryFile(max_size=self.part_size)
+            shutil.copyfileobj(stream, spool, CHUNK_SIZE)
+            stream = spool
+        start = stream.tell()
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in iter_chunks(stream):
+            digest.update(chunk)
+            size += len(chunk)
+        sha256 = digest.hexdigest()
+        key = self.prefix + content_key(sha256)
+        try:
+            created = not self._exists(key)
+            if created:
+                stream.seek(start)
+                self._upload(key, stream, size, sha256)
+        except Exception as exc:
+            raise StorageError(str(exc)) from exc
+        return StoredFile(f"s3://{self.bucket}/{key}", sha256, size, created)
+
+    def _upload(self, key: str, stream: BinaryIO, size: int, sha256: str) -> None:
+        options = {"ContentType": "application/pdf", "Metadata": {"sha256": sha256}}
+        if size <= self.part_size:
+            self.client.put_object(
+                Bucket=self.bucket, Key=key, Body=stream.read(), **options
+            )
+            return
+        upload_id = self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=key, **options
+        )["UploadId"]
+        parts = []
+        try:
+            for number, chunk in enumerate(iter_chunks(stream, self.part_size), 1):
+                response = self.client.upload_part(
+                    Bucket=self.bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=chunk,
+                )
+                parts.append({"ETag": response["ETag"], "PartNumber": number})
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+            raise
+
+    def open(self, uri: str) -> BinaryIO:
+        bucket, key = self.parse_uri(uri)
+        try:
+            size = self.client.head_object(Bucket=bucket, Key=key)["ContentLength"]
+        except Exception as exc:
+            raise StorageError(str(exc)) from exc
+        reader = S3RangeReader(self.client, bucket, key, size)
+        return io.BufferedReader(reader, buffer_size=self.read_chunk)
+
+
+Storage = Union[LocalStorage, S3Storage]
+
+
+@lru_cache()
+def s3_storage() -> S3Storage:
+    return S3Storage(S3_BUCKET)
+
+
+def get_storage() -> Storage:
+    """Driver for new uploads, chosen by ``STORAGE_BACKEND``."""
+
+    if STORAGE_BACKEND == "s3":
+        return s3_storage()
+    return LocalStorage(UPLOAD_DIR)
+
+
+def open_file(uri: str) -> BinaryIO:
+    """Open a stored statement given its ``Extrato.filepath``."""
+
+    if uri.startswith("s3://"):
+        return s3_storage().open(uri)
+    return open(uri, "rb")
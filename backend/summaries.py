@@ -0,0 +1,113 @@
+"""Per-contract movement aggregates stored in ``resumos_contrato``.
+
+The contracts screen reads one row per contract instead of aggregating every
+movement. :func:`apply_import` folds the rows of a newly imported extrato
+into the stored totals with a single ``INSERT ... ON CONFLICT DO UPDATE``
+of relative values, so the cost of an import depends only on its own rows and
+concurrent imports of a contract without a summary yet do not collide;
+:func:`rebuild_summary` recomputes a contract from scratch.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Iterable, Mapping, Optional
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import Extrato, Movimentacao, ResumoContrato
+
+
+def _latest_balance(rows: Iterable[Mapping[str, Any]]):
+    """Return ``(data_lanc, saldo)`` of the last dated row carrying a balance."""
+
+    latest = None
+    for row in rows:
+        if row.get("saldo") is None or row.get("data_lanc") is None:
+            continue
+        if latest is None or row["data_lanc"] >= latest[0]:
+            latest = (row["data_lanc"], row["saldo"])
+    return latest
+
+
+def apply_import(
+    db: Session,
+    contrato_id: int,
+    rows: Iterable[Mapping[str, Any]],
+    imported_at: Optional[datetime] = None,
+) -> None:
+    """Add the movement ``rows`` of one import to the contract's summary."""
+
+    rows = list(rows)
+    imported_at = imported_at or datetime.utcnow()
+    debitos = sum(row.get("valor_debito") or 0 for row in rows)
+    creditos = sum(row.get("valor_credito") or 0 for row in rows)
+    latest = _latest_balance(rows)
+
+    values = {
+        "total_debitos": ResumoContrato.total_debitos + debitos,
+        "total_creditos": ResumoContrato.total_creditos + creditos,
+        "movimentacoes": ResumoContrato.movimentacoes + len(rows),
+        "ultima_importacao": imported_at,
+    }
+    if latest is not None:
+        data, saldo = latest
+        newer = or_(
+            ResumoContrato.data_saldo.is_(None), ResumoContrato.data_saldo <= data
+        )
+        values["saldo"] = case((newer, saldo), else_=ResumoContrato.saldo)
+        values["data_saldo"] = case((newer, data), else_=ResumoContrato.data_saldo)
+
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(ResumoContrato).values(
+        contrato_id=contrato_id,
+        saldo=latest[1] if latest else None,
+        data_saldo=latest[0] if latest else None,
+        total_debitos=debitos,
+        total_creditos=creditos,
+        movimentacoes=len(rows),
+        ultima_importacao=imported_at,
+    )
+    # In ``DO UPDATE`` the table's columns refer to the existing row.
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ResumoContrato.contrato_id], set_=values
+        )
+    )
+
+
+def rebuild_summary(db: Session, contrato_id: int) -> ResumoContrato:
+    """Recompute the summary of ``contrato_id`` from its movements."""
+
+    movimentos = (
+        select(Movimentacao)
+        .join(Extrato, Movimentacao.extrato_id == Extrato.id)
+        .where(Extrato.contrato_id == contrato_id)
+        .subquery()
+    )
+    count, debitos, creditos = db.execute(
+        select(
+            func.count(movimentos.c.id),
+            func.coalesce(func.sum(movimentos.c.valor_debito), 0.0),
+            func.coalesce(func.sum(movimentos.c.valor_credito), 0.0),
+        )
+    ).one()
+    latest = db.execute(
+        select(movimentos.c.data_lanc, movimentos.c.saldo)
+        .where(movimentos.c.saldo.is_not(None), movimentos.c.data_lanc.is_not(None))
+        .order_by(movimentos.c.data_lanc.desc(), movimentos.c.id.desc())
+        .limit(1)
+    ).first()
+
+    resumo = db.get(ResumoContrato, contrato_id)
+    if resumo is None:
+        resumo = ResumoContrato(contrato_id=contrato_id)
+        db.add(resumo)
+    resumo.movimentacoes = count
+    resumo.total_debitos = debitos
+    resumo.total_creditos = creditos
+    resumo.data_saldo, resumo.saldo = latest if latest else (None, None)
+    db.flush()
+    return resumo
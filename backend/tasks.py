@@ -3,16 +3,35 @@
 from __future__ import annotations
 
 import logging
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from functools import partial
 from typing import Any, Dict, Iterable, List, Optional
 
+from sqlalchemy import delete, insert, or_, select, update
+
+from .admission import upload_admission
+from .accruals import close_ledger, sync_contract_ledger
+from .classification import register_rules
+from .contract_cache import contract_cache
+from .contracts import delete_contract_rows
 from .db import SessionLocal
-from .models import Contrato, Extrato, Movimentacao
+from .export_cache import empresa_tag, export_cache
+from .inflight import upload_registry
+from .limits import JobCancelled, JobGuard, JobLimitExceeded
+from .metrics import ImportTimer, record_import, record_latency
+from .models import Contrato, Extrato, Movimentacao, RegrasContabeis
 from .parsers import ParserNotFoundError, parse
+from .partitions import ensure_partitions_for, maintain
+from .rules import Ruleset, changed_keywords, get_engine
+from .storage import open_file
+from .summaries import apply_import, rebuild_summary
 from fastapi import HTTPException
 
 logger = logging.getLogger(__name__)
 
+RECLASSIFY_BATCH_SIZE = 1000
+PURGE_BATCH_SIZE = 10000
+
 
 def _parse_date(value: Optional[str]):
     """Convert a ``dd/mm/YYYY`` string to ``date``.
@@ -38,18 +57,38 @@ def parse_sicoob(
     On success an ``Extrato`` record is created with status ``importado`` and all
     extracted ``Movimentacao`` rows are associated with it. If parsing fails the
     ``Extrato`` is marked as ``pendente revisão``. Any unexpected database errors
-    mark the ``Extrato`` as ``erro``.
+    mark the ``Extrato`` as ``erro``, as do the page, memory and time limits of
+    :class:`~backend.limits.JobGuard` (with the limit in ``meta["limite"]``).
+    A cancelled import, checked before starting and between pages, ends as
+    ``cancelado``. Stage durations are kept in ``meta["tempos"]`` (see
+    :mod:`backend.metrics`).
     """
 
     session = SessionLocal()
+    guard = JobGuard()
     extrato: Optional[Extrato] = None
+    # Tenant whose pending pages were reserved at upload (admission control).
+    tenant: Optional[int] = None
+    # (sha256, contract) claimed at upload against duplicate submissions.
+    claim: Optional[tuple] = None
+    timer = ImportTimer()
+    uploaded_at: Optional[float] = None
 
     try:
         if extrato_id is not None:
+            guard.cancelled = partial(upload_registry.is_cancelled, extrato_id)
             extrato = session.get(Extrato, extrato_id)
             if extrato is not None:
                 filepath = extrato.filepath
                 contract_id = extrato.contrato_id
+                meta = extrato.meta or {}
+                if "paginas_estimadas" in meta:
+                    tenant = meta.get("empresa_id")
+                if "sha256" in meta:
+                    claim = (meta["sha256"], contract_id)
+                uploaded_at = meta.get("enviado_em")
+                # Cancelled while it waited in the queue.
+                guard.check()
         if contract_id is not None:
             contrato = session.get(Contrato, contract_id)
             if contrato is None:
@@ -76,64 +115,142 @@ def parse_sicoob(
                 return {"status": "erro", "error": "Contrato não encontrado"}
 
         try:
-            with open(filepath, "rb") as f:
+            guard.start("parse")
+            with open_file(filepath) as f:
                 def _iter_file(file_obj, chunk_size: int = 65536) -> Iterable[bytes]:
                     while chunk := file_obj.read(chunk_size):
                         yield chunk
 
-                data = parse("sicoob", _iter_file(f))
+                data = parse(
+                    "sicoob", _iter_file(f), on_page=guard.on_page, timed=timer.stage
+                )
         except ParserNotFoundError as exc:
             logger.error("Parser não encontrado: %s", exc)
             raise HTTPException(status_code=404, detail=str(exc)) from exc
+        except (JobLimitExceeded, JobCancelled):
+            raise
         except Exception as exc:
             logger.error("Falha ao interpretar extrato %s: %s", filepath, exc)
+            meta = {"error": str(exc), **timer.meta()}
             if extrato is None:
                 extrato = Extrato(
                     contrato_id=contract_id,
                     filepath=filepath,
                     status="pendente revisão",
-                    meta={"error": str(exc)},
+                    meta=meta,
                 )
                 session.add(extrato)
             else:
                 extrato.status = "pendente revisão"
-                extrato.meta = {"error": str(exc)}
+                extrato.meta = meta
             session.commit()
+            record_import("pendente revisão", guard.pages)
             return {"status": "pendente revisão", "error": str(exc)}
 
+        guard.start("save")
+        with timer.stage("insert"):
+            transactions: List[Dict[str, Any]] = data.get("transactions", [])
+            datas_lanc = [_parse_date(tx.get("data_lanc")) for tx in transactions]
+            # Before this session writes anything (see ensure_partitions_for).
+            ensure_partitions_for(session.get_bind(), datas_lanc)
+            if extrato is None:
+                extrato = Extrato(
+                    contrato_id=contract_id,
+                    filepath=filepath,
+                    status="importado",
+                    meta={"header": data.get("header")},
+                )
+                session.add(extrato)
+                session.flush()  # obtain extrato.id
+            else:
+                extrato.status = "importado"
+                extrato.meta = {"header": data.get("header")}
+                session.add(extrato)
+
+            # One ruleset for the whole import: a reload midway must not
+            # classify rows with rules other than the version stamped on them.
+            engine = get_engine()
+            regras = engine.snapshot()
+            versao = regras.version
+            register_rules(session, versao, regras.config)
+            rows = []
+            for tx, data_lanc in zip(transactions, datas_lanc):
+                debito, credito = engine.classify(tx.get("descricao") or "", regras)
+                rows.append(
+                    {
+                        "extrato_id": extrato.id,
+                        "data_ref": _parse_date(tx.get("data_ref")),
+                        "data_lanc": data_lanc,
+                        "descricao": tx.get("descricao"),
+                        "valor_debito": tx.get("valor_debito"),
+                        "valor_credito": tx.get("valor_credito"),
+                        "saldo": tx.get("saldo"),
+                        "conta_debito": debito,
+                        "conta_credito": credito,
+                        "regras_versao": versao,
+                    }
+                )
+            if rows:
+                session.execute(insert(Movimentacao), rows)
+                datas = [r["data_lanc"] for r in rows if r["data_lanc"]]
+                if contract_id is not None and datas:
+                    # Balances changed from the earliest launched date onwards.
+                    sync_contract_ledger(session, contract_id, since=min(datas))
+            if contract_id is not None:
+                apply_import(session, contract_id, rows)
+        extrato.meta = {
+            **extrato.meta,
+            "paginas": guard.pages,
+            "movimentacoes": len(rows),
+            **timer.meta(),
+        }
+
+        # Last checkpoint: give up now rather than be killed mid-commit.
+        guard.check()
+        session.commit()
+        if contract_id is not None:
+            # Cached exports of this empresa no longer reflect its movements.
+            export_cache.invalidate(empresa_tag(contrato.empresa_id))
+        record_import("importado", guard.pages, len(rows))
+        if uploaded_at is not None:
+            record_latency(uploaded_at)
+        logger.info(
+            "Extrato %s importado com %d movimentacoes em %s",
+            filepath,
+            len(transactions),
+            timer.meta()["tempos"],
+        )
+        return data
+
+    except JobCancelled as exc:
+        session.rollback()
+        logger.info("Extrato %s cancelado", filepath)
+        if extrato is not None:
+            extrato.status = "cancelado"
+            extrato.meta = {"error": str(exc)}
+            session.add(extrato)
+            session.commit()
+        record_import("cancelado", guard.pages)
+        return {"status": "cancelado"}
+    except JobLimitExceeded as exc:
+        session.rollback()
+        logger.warning("Extrato %s interrompido: %s", filepath, exc)
+        meta = {**exc.meta(), **timer.meta()}
         if extrato is None:
             extrato = Extrato(
                 contrato_id=contract_id,
                 filepath=filepath,
-                status="importado",
-                meta={"header": data.get("header")},
+                status="erro",
+                meta=meta,
             )
             session.add(extrato)
-            session.flush()  # obtain extrato.id
         else:
-            extrato.status = "importado"
-            extrato.meta = {"header": data.get("header")}
+            extrato.status = "erro"
+            extrato.meta = meta
             session.add(extrato)
-
-        transactions: List[Dict[str, Any]] = data.get("transactions", [])
-        for tx in transactions:
-            mov = Movimentacao(
-                extrato_id=extrato.id,
-                data_ref=_parse_date(tx.get("data_ref")),
-                data_lanc=_parse_date(tx.get("data_lanc")),
-                descricao=tx.get("descricao"),
-                valor_debito=tx.get("valor_debito"),
-                valor_credito=tx.get("valor_credito"),
-                saldo=tx.get("saldo"),
-            )
-            session.add(mov)
-
         session.commit()
-        logger.info(
-            "Extrato %s importado com %d movimentacoes", filepath, len(transactions)
-        )
-        return data
-
+        record_import("erro", guard.pages)
+        return {"status": "erro", **exc.meta()}
     except Exception as exc:  # pragma: no cover - defensive
         session.rollback()
         if isinstance(exc, HTTPException):
@@ -155,4 +272,261 @@ def parse_sicoob(
         return {"status": "erro", "error": str(exc)}
     finally:
         session.close()
+        if extrato_id is not None:
+            upload_admission.release(tenant, extrato_id)
+            if claim is not None:
+                upload_registry.release(*claim, extrato_id)
+
+
+def abandon_import(extrato_id: int, reason: str) -> None:
+    """Close the import of ``extrato_id`` after its job died.
+
+    A work horse killed by the kernel or by RQ never reaches the error
+    handling of :func:`parse_sicoob`: its extrato would stay in ``fila`` and
+    keep its reserved pages and in-flight claim.
+    """
+
+    session = SessionLocal()
+    try:
+        extrato = session.get(Extrato, extrato_id)
+        if extrato is None or extrato.status != "fila":
+            return
+        meta = extrato.meta or {}
+        extrato.status = "erro"
+        extrato.meta = {"error": reason}
+        session.commit()
+        contract_id = extrato.contrato_id
+    finally:
+        session.close()
+    logger.warning("Extrato %s abandonado: %s", extrato_id, reason)
+    if "paginas_estimadas" in meta:
+        upload_admission.release(meta.get("empresa_id"), extrato_id)
+    if "sha256" in meta:
+        upload_registry.release(meta["sha256"], contract_id, extrato_id)
+    record_import("erro")
+
 
+def _reclassify(session, criteria, regras: Ruleset, batch_size: int) -> int:
+    """Classify again the movements matching ``criteria`` with ``regras``.
+
+    Rows are walked in primary-key order in batches of ``batch_size``; each
+    batch is committed on its own so the job can be interrupted and resumed
+    without holding long transactions.
+    """
+
+    engine = get_engine()
+    updated = 0
+    last_id = 0
+    while True:
+        batch = session.execute(
+            select(Movimentacao.id, Movimentacao.descricao)
+            .where(Movimentacao.id > last_id, *criteria)
+            .order_by(Movimentacao.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            return updated
+        changes = []
+        for mov_id, descricao in batch:
+            debito, credito = engine.classify(descricao or "", regras)
+            changes.append(
+                {
+                    "id": mov_id,
+                    "conta_debito": debito,
+                    "conta_credito": credito,
+                    "regras_versao": regras.version,
+                }
+            )
+        session.execute(update(Movimentacao), changes)
+        session.commit()
+        updated += len(changes)
+        last_id = batch[-1][0]
+
+
+def reclassify_movimentacoes(batch_size: int = RECLASSIFY_BATCH_SIZE) -> int:
+    """Bring stored classifications up to date with the current rules.
+
+    Scheduled through ``backend/cron.py`` and queued by
+    ``POST /rules/reclassify``; returns at once when the current version was
+    already applied. For each older version still stamped on movements and
+    registered in ``regras_contabeis``, only the rows whose description
+    contains a keyword the change affects (:func:`rules.changed_keywords`)
+    are reclassified; the others keep their accounts and version. Rows
+    without a version or with an unregistered one are all reclassified.
+    Returns the number of rows updated.
+    """
+
+    session = SessionLocal()
+    regras = get_engine().snapshot()
+    versao = regras.version
+    updated = 0
+    try:
+        register_rules(session, versao, regras.config)
+        atual = session.get(RegrasContabeis, versao)
+        if atual.sincronizada_com == versao:
+            return 0
+        antigas = session.scalars(
+            select(Movimentacao.regras_versao)
+            .where(
+                or_(
+                    Movimentacao.regras_versao.is_(None),
+                    Movimentacao.regras_versao != versao,
+                )
+            )
+            .distinct()
+        ).all()
+        for antiga in antigas:
+            registro = session.get(RegrasContabeis, antiga) if antiga else None
+            if registro is None:
+                criteria = [
+                    Movimentacao.regras_versao.is_(None)
+                    if antiga is None
+                    else Movimentacao.regras_versao == antiga
+                ]
+                updated += _reclassify(session, criteria, regras, batch_size)
+                continue
+            if registro.sincronizada_com == versao:
+                continue
+            keywords = sorted(changed_keywords(registro.config, regras.config))
+            if keywords:
+                criteria = [
+                    Movimentacao.regras_versao == antiga,
+                    or_(
+                        *(
+                            Movimentacao.descricao.icontains(k, autoescape=True)
+                            for k in keywords
+                        )
+                    ),
+                ]
+                updated += _reclassify(session, criteria, regras, batch_size)
+            registro.sincronizada_com = versao
+            session.commit()
+        atual.sincronizada_com = versao
+        session.commit()
+        logger.info("%d movimentacoes reclassificadas (regras %s)", updated, versao)
+        return updated
+    finally:
+        session.close()
+
+
+def refresh_ledger(contract_id: int, since: Optional[str] = None) -> int:
+    """Recompute a contract's accrual ledger from ``since`` (ISO date).
+
+    Queued by the API when a contract's balance, rate, start date or rate
+    history changes; without ``since`` the ledger is rebuilt from the
+    contract start. Returns the number of ledger rows written.
+    """
+
+    session = SessionLocal()
+    try:
+        written = sync_contract_ledger(
+            session, contract_id, date.fromisoformat(since) if since else None
+        )
+        session.commit()
+        return written
+    finally:
+        session.close()
+
+
+def close_accruals(until: Optional[str] = None) -> int:
+    """Extend the accrual ledger through ``until`` (ISO date, default yesterday).
+
+    Scheduled daily through ``backend/cron.py``. Returns the number of ledger
+    rows written.
+    """
+
+    fim = (
+        date.fromisoformat(until) if until else date.today() - timedelta(days=1)
+    )
+    session = SessionLocal()
+    try:
+        written = close_ledger(session, fim)
+        session.commit()
+        logger.info("Juros apurados até %s: %d lançamentos", fim, written)
+        return written
+    finally:
+        session.close()
+
+
+def purge_contract(contract_id: int, batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Delete a large contract in the background.
+
+    Movements are removed in batches of ``batch_size`` rows, each committed
+    on its own, so no single transaction holds the whole delete; the
+    contract and its remaining rows go last. Returns the number of movements
+    deleted.
+    """
+
+    session = SessionLocal()
+    deleted = 0
+    try:
+        contrato = session.get(Contrato, contract_id)
+        if contrato is None:
+            return 0
+        empresa_id = contrato.empresa_id
+        extratos = select(Extrato.id).where(Extrato.contrato_id == contract_id)
+        while True:
+            ids = select(Movimentacao.id).where(
+                Movimentacao.extrato_id.in_(extratos)
+            ).limit(batch_size)
+            result = session.execute(
+                delete(Movimentacao).where(Movimentacao.id.in_(ids)),
+                execution_options={"synchronize_session": False},
+            )
+            session.commit()
+            if not result.rowcount:
+                break
+            deleted += result.rowcount
+        delete_contract_rows(session, contract_id)
+        session.commit()
+        export_cache.invalidate(empresa_tag(empresa_id))
+        contract_cache.invalidate()
+        logger.info(
+            "Contrato %s removido (%d movimentacoes)", contract_id, deleted
+        )
+        return deleted
+    finally:
+        session.close()
+
+
+def rebuild_summaries(contract_id: Optional[int] = None) -> int:
+    """Recompute ``resumos_contrato`` from the stored movements.
+
+    Imports keep the summaries current incrementally; this job repairs them
+    after out-of-band changes to ``movimentacoes``. Returns the number of
+    contracts rebuilt.
+    """
+
+    session = SessionLocal()
+    try:
+        if contract_id is not None:
+            ids = [contract_id]
+        else:
+            ids = session.scalars(select(Contrato.id)).all()
+        for contrato_id in ids:
+            rebuild_summary(session, contrato_id)
+            session.commit()
+        return len(ids)
+    finally:
+        session.close()
+
+
+def maintain_partitions() -> Dict[str, List[str]]:
+    """Create upcoming ``movimentacoes`` partitions and archive expired ones.
+
+    Scheduled through ``backend/cron.py``; a no-op unless the table is
+    partitioned (PostgreSQL after migration ``0004``).
+    """
+
+    session = SessionLocal()
+    try:
+        result = maintain(session.connection())
+        session.commit()
+        logger.info(
+            "Partições criadas: %s; arquivadas: %s",
+            result["created"],
+            result["archived"],
+        )
+        return result
+    finally:
+        session.close()
@@ -0,0 +1,274 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from backend.accruals import (
+    accruals_csv,
+    close_ledger,
+    closed_through,
+    compute_accruals,
+    effective_rate,
+    iter_accrual_batches,
+    iter_ledger_batches,
+    sync_contract_ledger,
+)
+from backend.db import Base
+from backend.models import (
+    Contrato,
+    Empresa,
+    Extrato,
+    JurosDiario,
+    Movimentacao,
+    TaxaContrato,
+)
+
+
+def test_compute_accruals_prorates_by_start_date():
+    saldo = np.array([1000.0, 365.0, 100.0])
+    taxa = np.array([0.1, 1.0, 0.5])
+    inicio = np.array(["2022-06-01", "2023-01-16", "2023-03-01"], dtype="datetime64[D]")
+
+    days, interest = compute_accruals(
+        saldo, taxa, inicio, date(2023, 1, 1), date(2023, 1, 31)
+    )
+
+    assert days.tolist() == [31, 16, 0]
+    assert np.allclose(interest, [1000.0 * 0.1 * 31 / 365, 16.0, 0.0])
+
+
+def _session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db")
+    Session = sessionmaker(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return Session()
+
+
+def test_accruals_csv_from_contract_batches(tmp_path):
+    session = _session(tmp_path)
+    empresa = Empresa(nome="ACME", cnpj="1")
+    session.add(empresa)
+    session.flush()
+    for i, inicio in enumerate([date(2023, 1, 1), date(2023, 1, 11), date(2024, 1, 1)]):
+        session.add(
+            Contrato(
+                empresa_id=empresa.id,
+                numero=str(i),
+                banco="Sicoob",
+                saldo=1000.0,
+                taxa_anual=0.365,
+                data_inicio=inicio,
+            )
+        )
+    session.commit()
+
+    output = "".join(
+        accruals_csv(
+            iter_accrual_batches(session, date(2023, 1, 1), date(2023, 1, 20), 1),
+            chunk_size=1,
+        )
+    )
+    session.close()
+
+    assert output.splitlines() == [
+        "contract_id,principal,annual_rate,days,interest",
+        "1,1000.00,0.365,20,20.00",
+        "2,1000.00,0.365,10,10.00",
+    ]
+
+
+def _contract_with_movements(session):
+    empresa = Empresa(nome="ACME", cnpj="1")
+    session.add(empresa)
+    session.flush()
+    contrato = Contrato(
+        empresa_id=empresa.id,
+        numero="1",
+        banco="Sicoob",
+        saldo=3650.0,
+        taxa_anual=0.1,
+        data_inicio=date(2023, 1, 1),
+    )
+    session.add(contrato)
+    session.flush()
+    extrato = Extrato(contrato_id=contrato.id, filepath="dummy", status="importado")
+    session.add(extrato)
+    session.flush()
+    session.add(
+        Movimentacao(
+            extrato_id=extrato.id,
+            data_lanc=date(2023, 1, 6),
+            descricao="amortizacao",
+            valor_debito=1825.0,
+            saldo=1825.0,
+        )
+    )
+    session.commit()
+    return contrato, extrato
+
+
+def test_close_ledger_uses_movement_balances(tmp_path):
+    session = _session(tmp_path)
+    contrato, _ = _contract_with_movements(session)
+
+    assert close_ledger(session, date(2023, 1, 10)) == 10
+    session.commit()
+    assert closed_through(session) == date(2023, 1, 10)
+
+    # A second close only computes the new days.
+    assert close_ledger(session, date(2023, 1, 12)) == 2
+    session.commit()
+
+    output = "".join(
+        accruals_csv(iter_ledger_batches(session, date(2023, 1, 1), date(2023, 1, 10)))
+    )
+    contrato_id = contrato.id
+    session.close()
+
+    # 5 days at 3650 (1.00/day) and 5 days at 1825 (0.50/day).
+    assert output.splitlines()[1] == f"{contrato_id},1825.00,0.1,10,7.50"
+
+
+def _close_statements(tmp_path, contracts):
+    """Statements issued by a daily close of ``contracts`` contracts."""
+
+    session = _session(tmp_path)
+    empresa = Empresa(nome="ACME", cnpj="1")
+    session.add(empresa)
+    session.flush()
+    for i in range(contracts):
+        contrato = Contrato(
+            empresa_id=empresa.id,
+            numero=str(i),
+            banco="Sicoob",
+            saldo=3650.0,
+            taxa_anual=0.1,
+            data_inicio=date(2023, 1, 1),
+        )
+        session.add(contrato)
+        session.flush()
+        extrato = Extrato(contrato_id=contrato.id, filepath="dummy", status="ok")
+        session.add(extrato)
+        session.flush()
+        session.add(
+            Movimentacao(
+                extrato_id=extrato.id,
+                data_lanc=date(2023, 1, 11),
+                descricao="amortizacao",
+                saldo=1825.0,
+            )
+        )
+    session.commit()
+    close_ledger(session, date(2023, 1, 10))
+    session.commit()
+
+    statements = []
+    event.listen(
+        session.get_bind(),
+        "before_cursor_execute",
+        lambda conn, cursor, sql, *args: statements.append(sql),
+    )
+    assert close_ledger(session, date(2023, 1, 11)) == contracts
+    session.commit()
+    saldos = session.scalars(
+        select(JurosDiario.saldo).where(JurosDiario.data == date(2023, 1, 11))
+    ).all()
+    session.close()
+    assert saldos == [1825.0] * contracts
+    return len(statements)
+
+
+def test_close_ledger_statements_do_not_grow_with_contracts(tmp_path):
+    (tmp_path / "few").mkdir()
+    (tmp_path / "many").mkdir()
+    few = _close_statements(tmp_path / "few", 2)
+    many = _close_statements(tmp_path / "many", 12)
+
+    assert few == many
+
+
+def test_sync_contract_ledger_recomputes_from_change(tmp_path):
+    session = _session(tmp_path)
+    contrato, extrato = _contract_with_movements(session)
+    close_ledger(session, date(2023, 1, 10))
+    session.commit()
+
+    session.add(
+        Movimentacao(
+            extrato_id=extrato.id,
+            data_lanc=date(2023, 1, 9),
+            descricao="amortizacao",
+            saldo=0.0,
+        )
+    )
+    assert sync_contract_ledger(session, contrato.id, since=date(2023, 1, 9)) == 2
+    session.commit()
+
+    juros = session.get(JurosDiario, (contrato.id, date(2023, 1, 10))).juros
+    rows = session.query(JurosDiario).count()
+    session.close()
+
+    assert juros == 0.0
+    assert rows == 10
+
+
+def test_sync_contract_ledger_drops_days_before_new_start(tmp_path):
+    session = _session(tmp_path)
+    contrato, _ = _contract_with_movements(session)
+    close_ledger(session, date(2023, 1, 10))
+    session.commit()
+
+    contrato.data_inicio = date(2023, 1, 6)
+    session.flush()
+    assert sync_contract_ledger(session, contrato.id) == 5
+    session.commit()
+
+    first = session.query(func.min(JurosDiario.data)).scalar()
+    rows = session.query(JurosDiario).count()
+    session.close()
+
+    assert (first, rows) == (date(2023, 1, 6), 5)
+
+
+def test_effective_rate_sums_across_breakpoints():
+    history = [(date(2023, 1, 11), 0.2), (date(2023, 1, 21), 0.3)]
+
+    # 10 days at 0.1, 10 at 0.2 and 11 at 0.3.
+    rate = effective_rate(0.1, history, date(2023, 1, 1), date(2023, 1, 31))
+    assert rate == pytest.approx((0.1 * 10 + 0.2 * 10 + 0.3 * 11) / 31)
+
+    # Periods after the last breakpoint use its rate only.
+    assert effective_rate(0.1, history, date(2023, 2, 1), date(2023, 2, 5)) == 0.3
+    assert effective_rate(0.1, [], date(2023, 2, 1), date(2023, 2, 5)) == 0.1
+
+
+def test_accruals_apply_rate_history(tmp_path):
+    session = _session(tmp_path)
+    contrato, _ = _contract_with_movements(session)
+    session.add(
+        TaxaContrato(
+            contrato_id=contrato.id, vigencia=date(2023, 1, 6), taxa_anual=0.2
+        )
+    )
+    session.commit()
+
+    live = "".join(
+        accruals_csv(iter_accrual_batches(session, date(2023, 1, 1), date(2023, 1, 10)))
+    )
+    close_ledger(session, date(2023, 1, 10))
+    session.commit()
+    ledger = "".join(
+        accruals_csv(iter_ledger_batches(session, date(2023, 1, 1), date(2023, 1, 10)))
+    )
+    session.close()
+
+    # Contract balance 3650: 5 days at 0.1 (1.00/day) and 5 at 0.2 (2.00/day).
+    assert live.splitlines()[1].endswith(",10,15.00")
+    # Ledger balances follow the movement on 06/01 (1825 -> 1.00/day at 0.2).
+    assert ledger.splitlines()[1] == "1,1825.00,0.2,10,10.00"
@@ -0,0 +1,79 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import pytest
+from fastapi import HTTPException
+
+from backend.admission import (
+    UPLOAD_LOW_QUEUE,
+    UPLOAD_QUEUE,
+    UploadAdmission,
+    estimate_pages,
+)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    def hvals(self, key):
+        return [str(v).encode() for v in self.hashes.get(key, {}).values()]
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(field, None)
+
+    def expire(self, key, ttl):
+        pass
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        pass
+
+
+def _admission(depth=0):
+    admission = UploadAdmission(FakeRedis())
+    admission.max_queue_depth = 10
+    admission.max_pending_pages = 100
+    admission.defer_pending_pages = 50
+    admission.queue_depth = lambda: depth
+    return admission
+
+
+def test_estimate_pages():
+    pdf = b"%PDF-1.4 /Type /Pages /Count 2 /Type /Page /Type/Page"
+    assert estimate_pages(pdf) == 2
+    assert estimate_pages(b"%PDF-1.5 compressed") == 1
+
+
+def test_tenant_backlog_defers_then_rejects():
+    admission = _admission()
+
+    assert admission.check(1, 40) == UPLOAD_QUEUE
+    admission.reserve(1, 10, 40)
+    assert admission.check(1, 20) == UPLOAD_LOW_QUEUE
+    admission.reserve(1, 11, 50)
+
+    with pytest.raises(HTTPException) as exc:
+        admission.check(1, 20)
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) >= 10
+    # Other tenants are not affected.
+    assert admission.check(2, 20) == UPLOAD_QUEUE
+
+    admission.release(1, 11)
+    admission.release(1, 11)
+    assert admission.pending_pages(1) == 40
+
+
+def test_full_queue_rejects():
+    with pytest.raises(HTTPException) as exc:
+        _admission(depth=10).check(1, 1)
+    assert exc.value.status_code == 429
+    assert "Retry-After" in exc.value.headers
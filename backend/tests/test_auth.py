@@ -0,0 +1,69 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import auth
+from backend.db import Base
+from backend.models import Usuario
+
+
+def test_token_cache_ttl_and_size(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(auth.time, "monotonic", lambda: now[0])
+    cache = auth.TokenCache(maxsize=2, ttl=10)
+
+    cache.put("a", {"username": "a"})
+    cache.put("b", {"username": "b"})
+    assert cache.get("a") == {"username": "a"}
+    cache.put("c", {"username": "c"})
+    # "b" was the least recently used entry.
+    assert cache.get("b") is None
+    assert cache.get("c") == {"username": "c"}
+
+    now[0] += 10
+    assert cache.get("a") is None
+
+    cache.put("expired", {"username": "x"}, exp=time.time() - 1)
+    assert cache.get("expired") is None
+
+
+def test_authenticate_user_against_store():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Usuario(username="ana", senha_hash=auth.hash_password("s3cret")))
+    db.add(
+        Usuario(username="inativo", senha_hash=auth.hash_password("x"), ativo=False)
+    )
+    db.commit()
+
+    assert auth.authenticate_user(db, "ana", "s3cret").username == "ana"
+    assert auth.authenticate_user(db, "ana", "wrong") is None
+    assert auth.authenticate_user(db, "nobody", "s3cret") is None
+    assert auth.authenticate_user(db, "inativo", "x") is None
+    db.close()
+    engine.dispose()
+
+
+def test_get_current_user_caches_verified_tokens(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(
+        auth, "_user_is_active", lambda username: lookups.append(username) or True
+    )
+    monkeypatch.setattr(auth, "token_cache", auth.TokenCache(maxsize=8, ttl=60))
+    token = auth.create_access_token({"sub": "ana"})
+
+    for _ in range(3):
+        assert asyncio.run(auth.get_current_user(token)) == {"username": "ana"}
+    assert lookups == ["ana"]
+
+    with pytest.raises(HTTPException):
+        asyncio.run(auth.get_current_user("not-a-token"))
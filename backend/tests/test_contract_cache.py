@@ -0,0 +1,95 @@
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from redis.exceptions import ConnectionError
+
+from backend.contract_cache import ContractCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, px=None, ex=None):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value.encode() if isinstance(value, str) else value
+            return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+
+
+class BrokenRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("down")
+
+        return fail
+
+
+def test_hit_miss_and_invalidation():
+    cache = ContractCache(FakeRedis(), ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return b"[1]"
+
+    assert cache.get_or_compute("list", compute) == b"[1]"
+    assert cache.get_or_compute("list", compute) == b"[1]"
+    assert len(calls) == 1
+
+    cache.invalidate()
+    assert cache.get_or_compute("list", compute) == b"[1]"
+    assert len(calls) == 2
+
+
+def test_single_flight_recomputation():
+    cache = ContractCache(FakeRedis(), ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_compute():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return b"[2]"
+
+    results = []
+    leader = threading.Thread(
+        target=lambda: results.append(cache.get_or_compute("list", slow_compute))
+    )
+    leader.start()
+    started.wait(1)
+    follower = threading.Thread(
+        target=lambda: results.append(cache.get_or_compute("list", slow_compute))
+    )
+    follower.start()
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert results == [b"[2]", b"[2]"]
+    assert len(calls) == 1
+
+
+def test_redis_errors_fail_open():
+    cache = ContractCache(BrokenRedis(), ttl=60)
+
+    assert cache.get_or_compute("list", lambda: b"[]") == b"[]"
+    cache.invalidate()
+    # The cache is bypassed after a failure instead of retrying each time.
+    assert not cache._available()
@@ -0,0 +1,57 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend import db
+
+
+def test_engine_options_postgres_includes_pool_sizing():
+    options = db.engine_options("postgresql://u:p@host/db", 20, 5)
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == 5
+    assert options["pool_pre_ping"] == db.DB_POOL_PRE_PING
+    assert options["pool_recycle"] == db.DB_POOL_RECYCLE
+
+
+def test_engine_options_sqlite_skips_pool_sizing():
+    options = db.engine_options("sqlite:///./test.db", 20, 5)
+    assert "pool_size" not in options
+    assert "max_overflow" not in options
+
+
+def _load_db(monkeypatch, url, read_url=None):
+    """Import a private copy of ``backend.db`` under the given settings.
+
+    Reloading ``backend.db`` itself would replace ``Base`` under the models.
+    """
+    monkeypatch.setenv("DATABASE_URL", url)
+    if read_url is None:
+        monkeypatch.delenv("DATABASE_READ_URL", raising=False)
+    else:
+        monkeypatch.setenv("DATABASE_READ_URL", read_url)
+    spec = importlib.util.spec_from_file_location("_db_under_test", db.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_read_session_falls_back_to_primary(monkeypatch, tmp_path):
+    fresh = _load_db(monkeypatch, f"sqlite:///{tmp_path}/primary.db")
+
+    assert fresh.DATABASE_READ_URL == fresh.DATABASE_URL
+    assert fresh.read_engine is fresh.engine
+    assert fresh.ReadSessionLocal.kw["bind"] is fresh.engine
+
+
+def test_read_session_uses_configured_replica(monkeypatch, tmp_path):
+    fresh = _load_db(
+        monkeypatch,
+        f"sqlite:///{tmp_path}/primary.db",
+        read_url=f"sqlite:///{tmp_path}/replica.db",
+    )
+
+    assert fresh.read_engine is not fresh.engine
+    assert fresh.read_engine.url.database == f"{tmp_path}/replica.db"
+    assert fresh.ReadSessionLocal.kw["bind"] is fresh.read_engine
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import pytest
+
+from backend.export_cache import ExportCache
+
+
+def _read(cache, key):
+    cached = cache.get(key)
+    if cached is None:
+        return None
+    with cached:
+        return cached.read()
+
+
+def test_store_and_get(tmp_path):
+    cache = ExportCache(str(tmp_path), 1024)
+    key = cache.key("empresa1", "transactions", start="2023-01-01", format="sci")
+
+    assert cache.get(key) is None
+    assert list(cache.store(key, ["a;b\n", b"c;d\n"])) == ["a;b\n", b"c;d\n"]
+    assert _read(cache, key) == b"a;b\nc;d\n"
+    other = cache.key("empresa1", "transactions", start="2023-01-02", format="sci")
+    assert other != key
+
+
+def test_aborted_stream_is_not_cached(tmp_path):
+    cache = ExportCache(str(tmp_path), 1024)
+
+    def failing():
+        yield "partial"
+        raise RuntimeError("cursor lost")
+
+    with pytest.raises(RuntimeError):
+        list(cache.store("empresa1-x", failing()))
+
+    assert cache.get("empresa1-x") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ExportCache(str(tmp_path), 10)
+    list(cache.store("empresa1-a", [b"12345"]))
+    list(cache.store("empresa1-b", [b"12345"]))
+    past = time.time() - 60
+    os.utime(tmp_path / "empresa1-a", (past, past))
+    os.utime(tmp_path / "empresa1-b", (past - 10, past - 10))
+
+    list(cache.store("empresa1-c", [b"12345"]))
+
+    assert _read(cache, "empresa1-a") is not None
+    assert _read(cache, "empresa1-b") is None
+    assert _read(cache, "empresa1-c") is not None
+
+
+def test_invalidate_by_tag(tmp_path):
+    cache = ExportCache(str(tmp_path), 1024)
+    list(cache.store("empresa1-a", [b"x"]))
+    list(cache.store("empresa12-a", [b"x"]))
+
+    assert cache.invalidate("empresa1") == 1
+    assert _read(cache, "empresa12-a") is not None
+
+
+def test_open_entry_survives_eviction(tmp_path):
+    cache = ExportCache(str(tmp_path), 1024)
+    list(cache.store("empresa1-a", [b"12345"]))
+
+    cached = cache.get("empresa1-a")
+    cache.invalidate("empresa1")
+
+    assert cache.get("empresa1-a") is None
+    with cached:
+        assert cached.read() == b"12345"
@@ -0,0 +1,95 @@
+import gzip
+import io
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import pyarrow as pa
+import pytest
+import pyarrow.parquet as pq
+
+from backend.exports import (
+    TRANSACTION_SCHEMA,
+    available_encodings,
+    chunked,
+    compress_stream,
+    iter_arrow,
+    negotiate_encoding,
+    record_batches,
+    transactions_csv,
+)
+
+
+def test_chunked_groups_lines():
+    lines = [f"{i:04d}\n" for i in range(10)]
+    chunks = list(chunked(lines, chunk_size=12))
+    assert "".join(chunks) == "".join(lines)
+    assert len(chunks) == 4
+
+
+def test_chunked_empty():
+    assert list(chunked([])) == []
+
+
+def _rows():
+    return [
+        (date(2023, 1, i), "631", "111", float(i), f"juros {i}") for i in range(1, 8)
+    ]
+
+
+def test_iter_arrow_stream_roundtrip():
+    body = b"".join(
+        iter_arrow(
+            record_batches(_rows(), TRANSACTION_SCHEMA, batch_size=3),
+            TRANSACTION_SCHEMA,
+            "arrow",
+        )
+    )
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.num_rows == 7
+    assert table.column("description")[6].as_py() == "juros 7"
+
+
+def test_iter_arrow_parquet_row_groups():
+    body = b"".join(
+        iter_arrow(
+            record_batches(_rows(), TRANSACTION_SCHEMA, batch_size=3),
+            TRANSACTION_SCHEMA,
+            "parquet",
+        )
+    )
+    parquet = pq.ParquetFile(io.BytesIO(body))
+    assert parquet.metadata.num_row_groups == 3
+    assert parquet.read().column("date")[0].as_py() == date(2023, 1, 1)
+
+
+def test_transactions_csv():
+    output = "".join(transactions_csv(_rows()[:1]))
+    assert output.splitlines() == [
+        "date,debit_account,credit_account,amount,description",
+        "2023-01-01,631,111,1.00,juros 1",
+    ]
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("*") == available_encodings()[0]
+
+
+def test_compress_stream_gzip():
+    chunks = ["a;b\n" * 1000, b"c;d\n" * 1000]
+    body = b"".join(compress_stream(chunks, "gzip"))
+    assert gzip.decompress(body) == b"a;b\n" * 1000 + b"c;d\n" * 1000
+    assert len(body) < 100
+
+
+def test_compress_stream_zstd():
+    zstandard = pytest.importorskip("zstandard")
+    body = b"".join(compress_stream(["x" * 5000], "zstd"))
+    reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body))
+    assert reader.read() == b"x" * 5000
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from redis.exceptions import RedisError
+
+from backend.inflight import MemoryStore, UploadRegistry
+
+
+class BrokenRedis:
+    def get(self, key):
+        raise RedisError("down")
+
+    def set(self, *args, **kwargs):
+        raise RedisError("down")
+
+
+def test_claim_returns_owner_until_released():
+    registry = UploadRegistry(MemoryStore())
+
+    assert registry.claim("abc", 1, 10) is None
+    assert registry.claim("abc", 1, 11) == 10
+    assert registry.claim("abc", 2, 12) is None
+    assert registry.inflight("abc", 1) == 10
+
+    # Only the owner releases the claim.
+    registry.release("abc", 1, 11)
+    assert registry.inflight("abc", 1) == 10
+    registry.release("abc", 1, 10)
+    assert registry.inflight("abc", 1) is None
+
+
+def test_replace_only_takes_over_the_stale_claim():
+    registry = UploadRegistry(MemoryStore())
+    registry.claim("abc", 1, 10)
+
+    assert not registry.replace("abc", 1, 9, 11)
+    assert registry.replace("abc", 1, 10, 11)
+    assert registry.inflight("abc", 1) == 11
+
+
+def test_cancel_flag():
+    registry = UploadRegistry(MemoryStore())
+
+    assert not registry.is_cancelled(10)
+    registry.cancel(10)
+    assert registry.is_cancelled(10)
+    assert not registry.is_cancelled(11)
+
+
+def test_redis_errors_fail_open():
+    registry = UploadRegistry(BrokenRedis())
+
+    assert registry.claim("abc", 1, 10) is None
+    assert registry.inflight("abc", 1) is None
+    assert not registry.is_cancelled(10)
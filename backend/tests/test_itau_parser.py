@@ -16,6 +16,9 @@ class DummyPage:
     def extract_text(self):
         return self._text
 
+    def close(self):
+        pass
+
 
 class DummyPDF:
     def __init__(self, text: str):
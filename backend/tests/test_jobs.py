@@ -0,0 +1,69 @@
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import tasks
+from backend.db import Base
+from backend.inflight import MemoryStore, UploadRegistry
+from backend.jobs import LocalBackend, LocalQueue, resolve
+from backend.models import Extrato
+
+
+def test_resolve_prefers_package_modules():
+    assert resolve("tasks.parse_sicoob") is tasks.parse_sicoob
+    assert resolve("os.path.join").__name__ == "join"
+
+
+def test_local_queue_runs_jobs_and_dedupes_ids():
+    backend = LocalBackend("thread", 1)
+    queue = LocalQueue("uploads", backend)
+    release = threading.Event()
+
+    first = queue.enqueue(release.wait, 5, job_id="job-1", job_timeout=60)
+    assert queue.enqueue(release.wait, 5, job_id="job-1") is first
+    assert queue.count == 1
+    assert backend.queue_depths() == [
+        {"queue": "uploads", "empresa_id": None, "queued": 1}
+    ]
+
+    release.set()
+    assert first.result(timeout=5) is True
+    backend.shutdown()
+    assert queue.count == 0
+
+
+def test_thread_backend_imports_statement(tmp_path, monkeypatch):
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/jobs.db", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+    monkeypatch.setattr(tasks, "upload_registry", UploadRegistry(MemoryStore()))
+    monkeypatch.setattr(
+        tasks, "parse", lambda *args, **kwargs: {"header": [], "transactions": []}
+    )
+
+    pdf_path = tmp_path / "file.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    with Session() as session:
+        extrato = Extrato(filepath=str(pdf_path), status="fila")
+        session.add(extrato)
+        session.commit()
+        extrato_id = extrato.id
+
+    backend = LocalBackend("thread", 2)
+    job = LocalQueue("uploads", backend).enqueue(
+        "tasks.parse_sicoob", str(pdf_path), None, extrato_id
+    )
+    job.result(timeout=10)
+    backend.shutdown()
+
+    with Session() as session:
+        assert session.get(Extrato, extrato_id).status == "importado"
+    engine.dispose()
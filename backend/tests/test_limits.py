@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import pytest
+
+from backend.limits import JobGuard, JobLimitExceeded, rss_mb
+
+
+def test_page_limit():
+    guard = JobGuard(max_pages=3, max_rss_mb=0, stage_timeout=0)
+    guard.on_page(1, 3)
+
+    with pytest.raises(JobLimitExceeded) as exc_info:
+        guard.on_page(1, 4)
+    assert exc_info.value.meta()["limite"] == "paginas"
+
+
+def test_stage_timeout_restarts_per_stage():
+    now = [0.0]
+    guard = JobGuard(max_rss_mb=0, stage_timeout=10, clock=lambda: now[0])
+
+    guard.start("parse")
+    now[0] = 9
+    guard.check()
+    guard.start("save")
+    now[0] = 18
+    guard.check()
+    now[0] = 20
+
+    with pytest.raises(JobLimitExceeded) as exc_info:
+        guard.check()
+    assert exc_info.value.reason == "tempo"
+    assert "save" in str(exc_info.value)
+
+
+def test_memory_limit():
+    assert rss_mb() > 0
+    JobGuard(max_rss_mb=0).check()
+
+    with pytest.raises(JobLimitExceeded) as exc_info:
+        JobGuard(max_rss_mb=1).check()
+    assert exc_info.value.reason == "memoria"
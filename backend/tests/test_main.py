@@ -1,16 +1,48 @@
+import gzip
+import hashlib
+import io
 import sys
+import tempfile
 from pathlib import Path
 from datetime import date
 
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, literal, null, select
 from sqlalchemy.orm import sessionmaker
 
-from backend.main import app, get_db, get_current_user
+from backend.main import (
+    ContractResponse,
+    ContractSummaryResponse,
+    ExtratoResponse,
+    UploadStatusResponse,
+    _row_dict,
+    app,
+    get_current_user,
+    get_db,
+    get_read_db,
+)
+from backend.main import queue as app_queue
+from backend.admission import upload_admission
+from backend.auth import hash_password
+from backend.contract_cache import contract_cache
+from backend.export_cache import empresa_tag, export_cache
+from backend.inflight import MemoryStore, UploadRegistry, upload_registry
+from backend.limits import JOB_STAGE_TIMEOUT
+from backend.storage import LocalStorage
 from backend.db import Base
-from backend.models import Empresa, Contrato, Extrato, Movimentacao
+from backend.models import (
+    Empresa,
+    Contrato,
+    Extrato,
+    Movimentacao,
+    ResumoContrato,
+    Usuario,
+)
 
 
 engine = create_engine(
@@ -29,6 +61,7 @@ def override_get_db():
 
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 
 
 def override_current_user():
@@ -36,6 +69,14 @@ def override_current_user():
 
 
 app.dependency_overrides[get_current_user] = override_current_user
+export_cache.directory = tempfile.mkdtemp()
+# Redis is not available in tests; these are covered in their own test modules.
+contract_cache.ttl = 0
+upload_admission.enabled = False
+upload_registry.enabled = False
+# Ledger refreshes queued by the contract endpoints; tests that check a job
+# patch ``enqueue`` themselves.
+app_queue.enqueue = lambda *args, **kwargs: None
 client = TestClient(app)
 
 
@@ -45,6 +86,24 @@ def test_list_contracts_empty():
     assert response.json() == []
 
 
+def test_contract_cache_misses_are_filled_from_primary(monkeypatch):
+    class LaggingReplica:
+        def execute(self, *args, **kwargs):
+            raise AssertionError("cache misses must not read the replica")
+
+    def replica():
+        yield LaggingReplica()
+
+    monkeypatch.setitem(app.dependency_overrides, get_read_db, replica)
+    monkeypatch.setattr(contract_cache, "ttl", 300)
+    monkeypatch.setattr(
+        contract_cache, "get_or_compute", lambda name, compute: compute()
+    )
+
+    assert client.get("/contracts").status_code == 200
+    assert client.get("/contracts/999999").status_code == 404
+
+
 def test_export_accruals_header_only():
     response = client.get("/accruals/export?start_date=2023-01-01&end_date=2023-01-31")
     assert response.status_code == 200
@@ -55,7 +114,7 @@ def test_upload_requires_contract_id(tmp_path, monkeypatch):
     pdf = tmp_path / "file.pdf"
     pdf.write_bytes(b"%PDF-1.4 test")
 
-    monkeypatch.setattr("backend.main.storage_path", str(tmp_path))
+    monkeypatch.setattr("backend.main.file_storage", LocalStorage(str(tmp_path)))
 
     with pdf.open("rb") as f:
         response = client.post(
@@ -72,12 +131,13 @@ def test_upload_enqueues_with_contract_id(tmp_path, monkeypatch):
 
     called: dict = {}
 
-    def fake_enqueue(name, *args):
+    def fake_enqueue(name, *args, **kwargs):
         called["name"] = name
         called["args"] = args
+        called["kwargs"] = kwargs
 
     monkeypatch.setattr("backend.main.queue.enqueue", fake_enqueue)
-    monkeypatch.setattr("backend.main.storage_path", str(tmp_path))
+    monkeypatch.setattr("backend.main.file_storage", LocalStorage(str(tmp_path)))
 
     with pdf.open("rb") as f:
         response = client.post(
@@ -89,6 +149,10 @@ def test_upload_enqueues_with_contract_id(tmp_path, monkeypatch):
     data = response.json()
     assert called["name"] == "tasks.parse_sicoob"
     assert called["args"][2] == data["extrato_id"]
+    # RQ must not kill the job before the per-stage limits can fire.
+    assert called["kwargs"]["job_timeout"] > 2 * JOB_STAGE_TIMEOUT
+    assert data["id"] == hashlib.sha256(b"%PDF-1.4 test").hexdigest()
+    assert Path(called["args"][0]).read_bytes() == b"%PDF-1.4 test"
 
     # verify extrato persisted with status 'fila'
     res = client.get("/uploads")
@@ -99,6 +163,161 @@ def test_upload_enqueues_with_contract_id(tmp_path, monkeypatch):
     )
 
 
+def test_upload_backpressure_returns_429(tmp_path, monkeypatch):
+    pdf = tmp_path / "file.pdf"
+    pdf.write_bytes(b"%PDF-1.4 test")
+    storage = tmp_path / "storage"
+    storage.mkdir()
+
+    def reject(tenant, pages):
+        raise HTTPException(
+            status_code=429, detail="busy", headers={"Retry-After": "30"}
+        )
+
+    monkeypatch.setattr("backend.main.upload_admission.check", reject)
+    monkeypatch.setattr("backend.main.file_storage", LocalStorage(str(storage)))
+
+    with pdf.open("rb") as f:
+        response = client.post(
+            "/uploads?contract_id=123",
+            files={"file": ("file.pdf", f, "application/pdf")},
+        )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+    assert list(storage.iterdir()) == []
+
+
+def test_upload_goes_to_tenant_queue(tmp_path, monkeypatch):
+    session = TestingSessionLocal()
+    empresa = Empresa(nome="Fila", cnpj="4545")
+    session.add(empresa)
+    session.flush()
+    contrato = Contrato(
+        empresa_id=empresa.id,
+        numero="F1",
+        banco="Sicoob",
+        saldo=0.0,
+        taxa_anual=0.0,
+        data_inicio=date(2023, 1, 1),
+    )
+    session.add(contrato)
+    session.commit()
+    empresa_id, contract_id = empresa.id, contrato.id
+    session.close()
+
+    calls = []
+
+    class FakeQueue:
+        def enqueue(self, name, *args, **kwargs):
+            calls.append((name, args))
+
+    def fake_tenant_queue(redis, tenant):
+        calls.append(("queue", tenant))
+        return FakeQueue()
+
+    monkeypatch.setattr("backend.main.tenant_queue", fake_tenant_queue)
+    monkeypatch.setattr("backend.main.file_storage", LocalStorage(str(tmp_path)))
+
+    response = client.post(
+        f"/uploads?contract_id={contract_id}",
+        files={"file": ("file.pdf", b"%PDF-1.4 test", "application/pdf")},
+    )
+
+    assert response.status_code == 200
+    assert calls[0] == ("queue", empresa_id)
+    assert calls[1][0] == "tasks.parse_sicoob"
+
+
+def test_duplicate_upload_attaches_to_inflight_job(tmp_path, monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(
+        "backend.main.queue.enqueue", lambda name, *args, **kw: enqueued.append(args)
+    )
+    monkeypatch.setattr("backend.main.file_storage", LocalStorage(str(tmp_path)))
+    monkeypatch.setattr(
+        "backend.main.upload_registry", UploadRegistry(MemoryStore())
+    )
+
+    responses = [
+        client.post(
+            "/uploads?contract_id=321",
+            files={"file": ("a.pdf", b"%PDF-1.4 dup", "application/pdf")},
+        ).json()
+        for _ in range(2)
+    ]
+
+    assert len(enqueued) == 1
+    assert [r["duplicate"] for r in responses] == [False, True]
+    assert responses[1]["extrato_id"] == responses[0]["extrato_id"]
+
+
+def test_upload_takes_over_claim_of_dead_job(tmp_path, monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(
+        "backend.main.queue.enqueue", lambda name, *args, **kw: enqueued.append(args)
+    )
+    monkeypatch.setattr("backend.main.file_storage", LocalStorage(str(tmp_path)))
+    registry = UploadRegistry(MemoryStore())
+    monkeypatch.setattr("backend.main.upload_registry", registry)
+    db = TestingSessionLocal()
+    dead = Extrato(filepath="dead.pdf", status="erro")
+    db.add(dead)
+    db.commit()
+    dead_id = dead.id
+    db.close()
+    content = b"%PDF-1.4 dead"
+    registry.claim(hashlib.sha256(content).hexdigest(), 322, dead_id)
+
+    data = client.post(
+        "/uploads?contract_id=322",
+        files={"file": ("a.pdf", content, "application/pdf")},
+    ).json()
+
+    assert data["duplicate"] is False
+    assert data["extrato_id"] != dead_id
+    assert len(enqueued) == 1
+    assert registry.inflight(data["id"], 322) == data["extrato_id"]
+
+
+def test_cancel_upload(monkeypatch):
+    registry = UploadRegistry(MemoryStore())
+    monkeypatch.setattr("backend.main.upload_registry", registry)
+    db = TestingSessionLocal()
+    queued = Extrato(filepath="x.pdf", status="fila")
+    done = Extrato(filepath="y.pdf", status="importado")
+    db.add_all([queued, done])
+    db.commit()
+    queued_id, done_id = queued.id, done.id
+    db.close()
+
+    response = client.post(f"/uploads/{queued_id}/cancel")
+    assert response.status_code == 202
+    assert response.json() == {"extrato_id": queued_id, "cancel_requested": True}
+    assert registry.is_cancelled(queued_id)
+
+    assert client.post(f"/uploads/{done_id}/cancel").status_code == 409
+    assert client.post("/uploads/999999/cancel").status_code == 404
+
+
+def test_metrics_endpoint():
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "loan_parser_import_stage_seconds" in response.text
+
+
+def test_upload_queue_depths(monkeypatch):
+    depths = [{"queue": "uploads:3", "empresa_id": 3, "queued": 12}]
+    monkeypatch.setattr("backend.main.queue_depths", lambda redis: depths)
+
+    response = client.get("/uploads/queues")
+
+    assert response.status_code == 200
+    assert response.json() == depths
+
+
 def test_upload_rejects_non_pdf(tmp_path):
     txt = tmp_path / "file.txt"
     txt.write_text("not pdf")
@@ -117,7 +336,7 @@ def test_upload_file_too_large(tmp_path, monkeypatch):
     pdf.write_bytes(b"%PDF-1.4" + b"a" * 20)
 
     monkeypatch.setattr("backend.main.MAX_UPLOAD_SIZE", 10)
-    monkeypatch.setattr("backend.main.storage_path", str(tmp_path))
+    monkeypatch.setattr("backend.main.file_storage", LocalStorage(str(tmp_path)))
 
     with pdf.open("rb") as f:
         response = client.post(
@@ -166,12 +385,96 @@ def test_transactions_export_success():
     session.close()
 
     response = client.get(
-        f"/transactions/export?empresa_id={empresa_id}&start_date=2023-01-01&end_date=2023-01-31"
+        f"/transactions/export?empresa_id={empresa_id}&start_date=2023-01-01"
+        "&end_date=2023-01-31"
     )
 
     assert response.status_code == 200
     assert "01/01/2023;631;111;100.00;juros recebidos" in response.text
 
+    # A repeated download is served from the export cache.
+    cached = client.get(
+        f"/transactions/export?empresa_id={empresa_id}&start_date=2023-01-01"
+        "&end_date=2023-01-31",
+        headers={"Accept-Encoding": "identity"},
+    )
+    assert cached.text == response.text
+    assert "content-length" in cached.headers
+
+    compressed = client.get(
+        f"/transactions/export?empresa_id={empresa_id}&start_date=2023-01-01"
+        "&end_date=2023-01-31",
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.text == response.text
+
+    download = client.get(
+        f"/transactions/export?empresa_id={empresa_id}&start_date=2023-01-01"
+        "&end_date=2023-01-31&compression=gzip",
+        headers={"Accept-Encoding": "identity"},
+    )
+    assert "transactions.txt.gz" in download.headers["content-disposition"]
+    assert "content-encoding" not in download.headers
+    assert gzip.decompress(download.content).decode() == response.text
+
+
+def test_cached_export_survives_eviction_before_response(monkeypatch):
+    session = TestingSessionLocal()
+    empresa = Empresa(nome="EvictCo", cnpj="4242")
+    session.add(empresa)
+    session.flush()
+    contrato = Contrato(
+        empresa_id=empresa.id,
+        numero="1",
+        banco="Sicoob",
+        saldo=0.0,
+        taxa_anual=0.0,
+        data_inicio=date(2023, 1, 1),
+    )
+    session.add(contrato)
+    session.flush()
+    extrato = Extrato(contrato_id=contrato.id, filepath="dummy", status="importado")
+    session.add(extrato)
+    session.flush()
+    session.add(
+        Movimentacao(
+            extrato_id=extrato.id,
+            data_ref=date(2023, 1, 1),
+            data_lanc=date(2023, 1, 1),
+            descricao="juros recebidos",
+            valor_credito=100.0,
+            saldo=100.0,
+        )
+    )
+    session.commit()
+    empresa_id = empresa.id
+    session.close()
+
+    url = (
+        f"/transactions/export?empresa_id={empresa_id}&start_date=2023-01-01"
+        "&end_date=2023-01-31"
+    )
+    first = client.get(url)
+    assert first.status_code == 200
+
+    get = export_cache.get
+
+    def get_then_evict(key):
+        cached = get(key)
+        assert cached is not None
+        # A concurrent import drops the entry before the response is sent.
+        export_cache.invalidate(empresa_tag(empresa_id))
+        return cached
+
+    for encoding in ("identity", "gzip"):
+        monkeypatch.setattr(export_cache, "get", get)
+        client.get(url)
+        monkeypatch.setattr(export_cache, "get", get_then_evict)
+        response = client.get(url, headers={"Accept-Encoding": encoding})
+        assert response.status_code == 200
+        assert response.text == first.text
+
 
 def test_transactions_export_invalid_date():
     response = client.get(
@@ -205,10 +508,18 @@ def test_contract_crud_and_extratos():
     assert res.status_code == 200
     assert res.json()["bank"] == "Itau"
 
+    res = client.get(f"/contracts/{contract_id}")
+    assert res.status_code == 200
+    assert res.json()["bank"] == "Itau"
+    assert client.get("/contracts/999999").status_code == 404
+
     session = TestingSessionLocal()
     extrato = Extrato(contrato_id=int(contract_id), filepath="dummy", status="ok")
     session.add(extrato)
+    session.flush()
+    session.add(Movimentacao(extrato_id=extrato.id, descricao="juros"))
     session.commit()
+    extrato_id = extrato.id
     session.close()
 
     res = client.get(f"/contracts/{contract_id}/extratos")
@@ -218,3 +529,310 @@ def test_contract_crud_and_extratos():
     res = client.delete(f"/contracts/{contract_id}")
     assert res.status_code == 200
     assert res.json() == {"ok": True}
+
+    session = TestingSessionLocal()
+    assert session.get(Extrato, extrato_id) is None
+    assert session.query(Movimentacao).filter_by(extrato_id=extrato_id).count() == 0
+    session.close()
+
+
+def test_delete_large_contract_is_queued(monkeypatch):
+    session = TestingSessionLocal()
+    empresa = Empresa(nome="BigCo", cnpj="777")
+    session.add(empresa)
+    session.commit()
+    empresa_id = empresa.id
+    session.close()
+
+    res = client.post(
+        "/contracts",
+        json={
+            "empresa_id": empresa_id,
+            "numero": "B1",
+            "bank": "Sicoob",
+            "balance": 100.0,
+            "cet": 0.1,
+            "dueDate": "2023-01-01",
+        },
+    )
+    contract_id = int(res.json()["id"])
+    calls = []
+
+    def fake_enqueue(name, *args, **kwargs):
+        calls.append((name, args))
+
+    monkeypatch.setattr("backend.main.queue.enqueue", fake_enqueue)
+    monkeypatch.setattr("backend.main.CONTRACT_PURGE_ASYNC_THRESHOLD", -1)
+
+    res = client.delete(f"/contracts/{contract_id}")
+    assert res.status_code == 202
+    assert res.json() == {"ok": True, "queued": True}
+    assert calls == [("tasks.purge_contract", (contract_id,))]
+
+
+def test_contract_changes_queue_a_ledger_refresh(monkeypatch):
+    session = TestingSessionLocal()
+    empresa = Empresa(nome="LedgerCo", cnpj="818")
+    session.add(empresa)
+    session.commit()
+    empresa_id = empresa.id
+    session.close()
+    calls = []
+
+    def fake_enqueue(name, *args, **kwargs):
+        calls.append((name, args))
+
+    monkeypatch.setattr("backend.main.queue.enqueue", fake_enqueue)
+
+    res = client.post(
+        "/contracts",
+        json={
+            "empresa_id": empresa_id,
+            "numero": "L1",
+            "bank": "Sicoob",
+            "balance": 100.0,
+            "cet": 0.1,
+            "dueDate": "2023-01-01",
+        },
+    )
+    contract_id = int(res.json()["id"])
+    client.put(f"/contracts/{contract_id}", json={"bank": "Itau"})
+    client.put(f"/contracts/{contract_id}", json={"cet": 0.2})
+    client.post(
+        f"/contracts/{contract_id}/rates",
+        json={"effective_from": "2023-07-01", "rate": 0.12},
+    )
+
+    # The bank change leaves the ledger alone.
+    assert calls == [
+        ("tasks.refresh_ledger", (contract_id, None)),
+        ("tasks.refresh_ledger", (contract_id, None)),
+        ("tasks.refresh_ledger", (contract_id, "2023-07-01")),
+    ]
+
+
+def test_contract_rate_history():
+    session = TestingSessionLocal()
+    empresa = Empresa(nome="RateCo", cnpj="555")
+    session.add(empresa)
+    session.commit()
+    empresa_id = empresa.id
+    session.close()
+
+    res = client.post(
+        "/contracts",
+        json={
+            "empresa_id": empresa_id,
+            "numero": "R1",
+            "bank": "Sicoob",
+            "balance": 1000.0,
+            "cet": 0.1,
+            "dueDate": "2023-01-01",
+        },
+    )
+    contract_id = res.json()["id"]
+
+    res = client.post(
+        f"/contracts/{contract_id}/rates",
+        json={"effective_from": "2023-07-01", "rate": 0.12},
+    )
+    assert res.status_code == 201
+
+    res = client.get(f"/contracts/{contract_id}/rates")
+    assert res.status_code == 200
+    assert [(r["effective_from"], r["rate"]) for r in res.json()] == [
+        ("2023-07-01", 0.12)
+    ]
+
+    res = client.post(
+        "/contracts/999999/rates", json={"effective_from": "2023-07-01", "rate": 0.1}
+    )
+    assert res.status_code == 404
+
+    client.delete(f"/contracts/{contract_id}")
+
+
+def test_export_formats():
+    response = client.get(
+        "/accruals/export?start_date=2023-01-01&end_date=2023-01-31&format=arrow"
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    assert pa.ipc.open_stream(response.content).schema.names[0] == "contract_id"
+
+    response = client.get(
+        "/transactions/export?empresa_id=1&start_date=2023-01-01"
+        "&end_date=2023-01-31&format=parquet"
+    )
+    assert response.status_code == 200
+    assert "transactions.parquet" in response.headers["content-disposition"]
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.schema.names[-1] == "description"
+
+    response = client.get(
+        "/accruals/export?start_date=2023-01-01&end_date=2023-01-31&format=sci"
+    )
+    assert response.status_code == 400
+
+
+def test_contract_summary():
+    session = TestingSessionLocal()
+    empresa = Empresa(nome="SumCo", cnpj="888")
+    session.add(empresa)
+    session.commit()
+    empresa_id = empresa.id
+    session.close()
+
+    res = client.post(
+        "/contracts",
+        json={
+            "empresa_id": empresa_id,
+            "numero": "S1",
+            "bank": "Sicoob",
+            "balance": 500.0,
+            "cet": 0.1,
+            "dueDate": "2023-01-01",
+        },
+    )
+    contract_id = int(res.json()["id"])
+
+    res = client.get(f"/contracts/{contract_id}/summary")
+    assert res.status_code == 200
+    assert res.json()["balance"] == 500.0
+    assert res.json()["movements"] == 0
+
+    session = TestingSessionLocal()
+    session.add(
+        ResumoContrato(
+            contrato_id=contract_id,
+            saldo=450.0,
+            data_saldo=date(2023, 2, 1),
+            total_debitos=50.0,
+            total_creditos=0.0,
+            movimentacoes=3,
+        )
+    )
+    session.commit()
+    session.close()
+
+    res = client.get(f"/contracts/summary?empresa_id={empresa_id}")
+    assert res.status_code == 200
+    assert [(s["contract_id"], s["balance"], s["movements"]) for s in res.json()] == [
+        (contract_id, 450.0, 3)
+    ]
+    assert client.get("/contracts/999999/summary").status_code == 404
+
+
+def test_search_movements_paginates():
+    session = TestingSessionLocal()
+    empresa = Empresa(nome="SearchCo", cnpj="666")
+    session.add(empresa)
+    session.flush()
+    contrato = Contrato(
+        empresa_id=empresa.id,
+        numero="Q1",
+        banco="Sicoob",
+        saldo=100.0,
+        taxa_anual=0.1,
+        data_inicio=date(2023, 1, 1),
+    )
+    session.add(contrato)
+    session.flush()
+    extrato = Extrato(contrato_id=contrato.id, filepath="f", status="importado")
+    session.add(extrato)
+    session.flush()
+    session.add_all(
+        [
+            Movimentacao(
+                extrato_id=extrato.id,
+                data_lanc=date(2023, 1, day),
+                descricao=descricao,
+                valor_debito=1.0,
+            )
+            for day, descricao in [
+                (2, "JUROS CONTRATUAIS"),
+                (3, "LIBERACAO DE CREDITO"),
+                (4, "juros de mora"),
+                (5, "Juros 100%"),
+            ]
+        ]
+    )
+    session.commit()
+    empresa_id = empresa.id
+    session.close()
+
+    params = {"q": "juros", "empresa_id": empresa_id, "limit": 2}
+    res = client.get("/movements/search", params=params)
+    assert res.status_code == 200
+    page = res.json()
+    assert [m["description"] for m in page["items"]] == ["Juros 100%", "juros de mora"]
+    assert page["next_cursor"] is not None
+
+    res = client.get(
+        "/movements/search", params={**params, "after": page["next_cursor"]}
+    )
+    page = res.json()
+    assert [m["description"] for m in page["items"]] == ["JUROS CONTRATUAIS"]
+    assert page["next_cursor"] is None
+
+    res = client.get(
+        "/movements/search",
+        params={"q": "00%", "empresa_id": empresa_id, "end_date": "2023-01-04"},
+    )
+    assert res.json()["items"] == []
+    assert client.get("/movements/search", params={"q": "ju"}).status_code == 422
+
+
+def test_search_movements_requires_auth(monkeypatch):
+    monkeypatch.delitem(app.dependency_overrides, get_current_user)
+
+    res = client.get("/movements/search", params={"q": "juros"})
+
+    assert res.status_code == 401
+
+
+def test_list_responses_match_schemas():
+    cases = [
+        ("/contracts", ContractResponse),
+        ("/contracts/summary", ContractSummaryResponse),
+        ("/uploads", UploadStatusResponse),
+    ]
+    for url, model in cases:
+        res = client.get(url)
+        assert res.status_code == 200
+        assert res.json()
+        for item in res.json():
+            assert model.model_validate(item).model_dump(mode="json") == item
+
+
+def test_row_dict_maps_by_label():
+    session = TestingSessionLocal()
+    row = session.execute(
+        select(
+            literal("importado").label("status"),
+            null().label("meta"),
+            literal(7).label("id"),
+        )
+    ).one()
+    session.close()
+
+    # Columns in another order than the model's fields still land right.
+    assert _row_dict(row, ExtratoResponse) == {
+        "id": 7,
+        "status": "importado",
+        "meta": None,
+    }
+
+
+def test_login_uses_user_store():
+    session = TestingSessionLocal()
+    session.add(Usuario(username="analista", senha_hash=hash_password("pw")))
+    session.commit()
+    session.close()
+
+    res = client.post("/token", data={"username": "analista", "password": "pw"})
+    assert res.status_code == 200
+    assert res.json()["token_type"] == "bearer"
+
+    res = client.post("/token", data={"username": "analista", "password": "no"})
+    assert res.status_code == 401
@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import pytest
+
+from backend import metrics
+from backend.metrics import ImportTimer, record_import, render
+
+
+def test_timer_accumulates_stages():
+    now = [0.0]
+    timer = ImportTimer(clock=lambda: now[0])
+
+    with timer.stage("ocr"):
+        now[0] += 1.5
+    with timer.stage("ocr"):
+        now[0] += 0.5
+    with pytest.raises(ValueError):
+        with timer.stage("regex"):
+            now[0] += 0.25
+            raise ValueError("linha inválida")
+
+    assert timer.meta() == {"tempos": {"ocr": 2.0, "regex": 0.25}}
+
+
+def test_render_exposes_import_metrics():
+    with ImportTimer().stage("insert"):
+        record_import("importado", pages=3, rows=10)
+
+    body = render().decode()
+
+    assert 'loan_parser_imports_total{status="importado"}' in body
+    assert "loan_parser_import_rows_total" in body
+    assert 'loan_parser_import_stage_seconds_count{stage="insert"}' in body
+
+
+# Runs jobs in forked children the way the worker does: the child records
+# inside ``collect`` and the parent replays what it gathered.
+FORKED_JOBS = textwrap.dedent(
+    """
+    import os
+    import pickle
+    import sys
+
+    from backend import metrics
+
+    def job():
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            with metrics.collect() as observed:
+                with metrics.ImportTimer().stage("insert"):
+                    metrics.record_import("importado", pages=2, rows=5)
+            os.write(write_fd, pickle.dumps(observed))
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd, "rb") as pipe:
+            observed = pickle.loads(pipe.read())
+        os.waitpid(pid, 0)
+        metrics.replay(observed)
+
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    job()
+    after_one = len(os.listdir(directory))
+    for _ in range(5):
+        job()
+    print(after_one, len(os.listdir(directory)))
+    print(metrics.render().decode())
+    """
+)
+
+
+def test_forked_jobs_do_not_add_metric_files(tmp_path):
+    root = Path(__file__).resolve().parents[2]
+    env = {
+        **os.environ,
+        "PROMETHEUS_MULTIPROC_DIR": str(tmp_path),
+        "PYTHONPATH": str(root),
+    }
+
+    result = subprocess.run(
+        [sys.executable, "-c", FORKED_JOBS],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    counts, body = result.stdout.split("\n", 1)
+
+    after_one, after_six = map(int, counts.split())
+    assert after_six == after_one
+    assert 'loan_parser_imports_total{status="importado"} 6.0' in body
+    assert "loan_parser_import_rows_total 30.0" in body
+
+
+def test_remove_stale_files_keeps_current_process(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    own = tmp_path / f"counter_{os.getpid()}.db"
+    stale = tmp_path / "histogram_1.db"
+    own.touch()
+    stale.touch()
+
+    metrics.remove_stale_files()
+
+    assert own.exists()
+    assert not stale.exists()
@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, inspect
+
+from backend.db import Base
+from backend import models  # noqa: F401 - registers the tables
+
+ALEMBIC_INI = Path(__file__).resolve().parents[1] / "alembic.ini"
+
+
+def _config(url):
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("sqlalchemy.url", url)
+    return config
+
+
+def test_migrations_match_models(tmp_path):
+    url = f"sqlite:///{tmp_path}/migrations.db"
+    command.upgrade(_config(url), "head")
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        diff = compare_metadata(MigrationContext.configure(conn), Base.metadata)
+        indexes = {i["name"] for i in inspect(conn).get_indexes("movimentacoes")}
+
+    assert diff == []
+    assert "ix_movimentacoes_extrato_id_data_lanc" in indexes
+
+
+def test_migrations_downgrade(tmp_path):
+    url = f"sqlite:///{tmp_path}/migrations.db"
+    command.upgrade(_config(url), "head")
+    command.downgrade(_config(url), "base")
+
+    engine = create_engine(url)
+    assert inspect(engine).get_table_names() == ["alembic_version"]
@@ -0,0 +1,86 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from sqlalchemy import create_engine
+
+from backend import partitions
+
+
+def test_month_arithmetic_and_names():
+    month = partitions.month_start(date(2023, 11, 17))
+    assert month == date(2023, 11, 1)
+    assert partitions.add_months(month, 2) == date(2024, 1, 1)
+    assert partitions.add_months(month, -11) == date(2022, 12, 1)
+    assert partitions.partition_name(month) == "movimentacoes_2023_11"
+    assert partitions.partition_month("movimentacoes_2023_11") == month
+    assert partitions.partition_month("movimentacoes_default") is None
+
+
+def test_expired_partitions_respects_retention():
+    names = [
+        "movimentacoes_default",
+        "movimentacoes_2022_12",
+        "movimentacoes_2023_01",
+        "movimentacoes_2023_02",
+    ]
+    today = date(2024, 2, 10)
+
+    assert partitions.expired_partitions(names, today, 12) == [
+        "movimentacoes_2022_12",
+        "movimentacoes_2023_01",
+    ]
+    assert partitions.expired_partitions(names, today, 0) == []
+
+
+def test_non_partitioned_database_is_noop():
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn:
+        assert not partitions.is_partitioned(conn)
+        assert partitions.ensure_partitions(conn, [date(2023, 1, 5)]) == []
+        assert partitions.maintain(conn) == {"created": [], "archived": []}
+    assert partitions.ensure_partitions_for(engine, [date(2023, 1, 5)]) == []
+
+
+class RecordingConnection:
+    """Answers the catalog queries of ``create_partition`` and records DDL."""
+
+    def __init__(self, rows_in_default: bool) -> None:
+        self.rows_in_default = rows_in_default
+        self.statements = []
+
+    def scalar(self, statement, params=None):
+        if "partdefid" in str(statement):
+            return "movimentacoes_default"
+        return 1 if self.rows_in_default else None
+
+    def execute(self, statement, params=None):
+        self.statements.append(" ".join(str(statement).split()))
+
+
+def test_create_partition_of_empty_range():
+    conn = RecordingConnection(rows_in_default=False)
+
+    partitions.create_partition(conn, date(2023, 1, 1))
+
+    assert conn.statements == [
+        'CREATE TABLE IF NOT EXISTS "movimentacoes_2023_01" PARTITION OF '
+        "movimentacoes FOR VALUES FROM ('2023-01-01') TO ('2023-02-01')"
+    ]
+
+
+def test_create_partition_moves_rows_out_of_default():
+    conn = RecordingConnection(rows_in_default=True)
+
+    partitions.create_partition(conn, date(2023, 1, 1))
+
+    create, move, attach = conn.statements
+    assert create.startswith('CREATE TABLE "movimentacoes_2023_01" (LIKE')
+    assert 'DELETE FROM "movimentacoes_default"' in move
+    assert 'INSERT INTO "movimentacoes_2023_01"' in move
+    assert attach == (
+        'ALTER TABLE movimentacoes ATTACH PARTITION "movimentacoes_2023_01" '
+        "FOR VALUES FROM ('2023-01-01') TO ('2023-02-01')"
+    )
@@ -1,7 +1,19 @@
 import json
+import os
 from importlib import reload
+
+import pytest
+
 import backend.rules as rules
 
+
+@pytest.fixture(autouse=True)
+def _restore_rules():
+    yield
+    # Undo module reloads pointing at temporary configuration files.
+    reload(rules)
+
+
 def test_classify_uses_config(tmp_path, monkeypatch):
     cfg = {
         "account_map": {"test": ["123", "321"]},
@@ -14,3 +26,108 @@ def test_classify_uses_config(tmp_path, monkeypatch):
     reload(rules)
     assert rules.classify("sample description") == ("123", "321")
     assert rules.classify("other") == ("000", "000")
+
+
+def _write_cfg(path, rules_list, account_map):
+    path.write_text(
+        json.dumps({"account_map": account_map, "classify_rules": rules_list})
+    )
+
+
+def test_classify_respects_rule_order(tmp_path):
+    cfg_file = tmp_path / "cfg.json"
+    _write_cfg(
+        cfg_file,
+        [
+            {"keyword": "juros", "account": "juros"},
+            {"keyword": "libera", "account": "liberacao"},
+        ],
+        {"juros": ["631", "111"], "liberacao": ["111", "211"]},
+    )
+    engine = rules.RulesEngine(str(cfg_file))
+
+    # "libera" appears first in the text but "juros" has priority.
+    assert engine.classify("liberacao com juros") == ("631", "111")
+    assert engine.classify("LIBERACAO") == ("111", "211")
+
+
+def test_classify_overlapping_keywords(tmp_path):
+    cfg_file = tmp_path / "cfg.json"
+    _write_cfg(
+        cfg_file,
+        [
+            {"keyword": "ros", "account": "a"},
+            {"keyword": "missing", "account": "unmapped"},
+            {"keyword": "juros", "account": "b"},
+        ],
+        {"a": ["1", "2"], "b": ["3", "4"]},
+    )
+    engine = rules.RulesEngine(str(cfg_file))
+
+    assert engine.classify("juros") == ("1", "2")
+    assert engine.classify("missing") == ("000", "000")
+
+
+def test_classify_hot_reloads_on_change(tmp_path, monkeypatch):
+    monkeypatch.setattr(rules, "RELOAD_INTERVAL", 0)
+    cfg_file = tmp_path / "cfg.json"
+    _write_cfg(cfg_file, [{"keyword": "tarifa", "account": "t"}], {"t": ["1", "2"]})
+    engine = rules.RulesEngine(str(cfg_file))
+    assert engine.classify("tarifa mensal") == ("1", "2")
+
+    _write_cfg(cfg_file, [{"keyword": "tarifa", "account": "t"}], {"t": ["5", "6"]})
+    stat = cfg_file.stat()
+    os.utime(cfg_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert engine.classify("tarifa mensal") == ("5", "6")
+
+
+def test_result_of_replaced_ruleset_is_not_served(tmp_path):
+    cfg_file = tmp_path / "cfg.json"
+    _write_cfg(cfg_file, [{"keyword": "tarifa", "account": "t"}], {"t": ["1", "2"]})
+    engine = rules.RulesEngine(str(cfg_file))
+    assert engine.classify("tarifa") == ("1", "2")
+    old = engine._rules
+
+    engine.compile(
+        {
+            "account_map": {"t": ["5", "6"]},
+            "classify_rules": [{"keyword": "tarifa", "account": "t"}],
+        }
+    )
+    # A classification that started before the swap finishes afterwards and
+    # memoizes its result; it is keyed by the old ruleset and never returned.
+    assert engine._classify(old, "tarifa mensal") == ("1", "2")
+    assert engine.classify("tarifa mensal") == ("5", "6")
+
+
+def test_changed_keywords():
+    old = {
+        "account_map": {"a": ["1", "2"], "b": ["3", "4"], "c": ["5", "6"]},
+        "classify_rules": [
+            {"keyword": "juros", "account": "a"},
+            {"keyword": "tarifa", "account": "b"},
+            {"keyword": "amort", "account": "c"},
+            {"keyword": "iof", "account": "c"},
+        ],
+    }
+    new = {
+        "account_map": {"a": ["1", "2"], "b": ["3", "4"], "c": ["7", "8"]},
+        "classify_rules": [
+            {"keyword": "tarifa", "account": "b"},
+            {"keyword": "juros", "account": "a"},
+            {"keyword": "amort", "account": "c"},
+            {"keyword": "libera", "account": "a"},
+        ],
+    }
+
+    # "juros" and "tarifa" swapped priority, "amort" changed accounts,
+    # "iof" was removed and "libera" added.
+    assert rules.changed_keywords(old, new) == {
+        "juros",
+        "tarifa",
+        "amort",
+        "iof",
+        "libera",
+    }
+    assert rules.changed_keywords(old, old) == set()
@@ -0,0 +1,97 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.scheduling import (
+    UPLOAD_LOW_QUEUE,
+    UPLOAD_QUEUE,
+    TenantRotation,
+    parse_weights,
+    queue_depths,
+    queue_tenant,
+    tenant_queue,
+    tenant_queue_name,
+)
+
+
+class FakeRedis:
+    def __init__(self, lengths=None):
+        self.sets = {}
+        self.lengths = lengths or {}
+
+    def sadd(self, key, value):
+        self.sets.setdefault(key, set()).add(str(value).encode())
+
+    def smembers(self, key):
+        return self.sets.get(key, set())
+
+    def llen(self, key):
+        return self.lengths.get(key, 0)
+
+
+def _serve(rotation, backlog, jobs):
+    """Simulate ``jobs`` dequeues: first non-empty queue in rotation order."""
+
+    served = []
+    for _ in range(jobs):
+        name = next(n for n in rotation.order if backlog.get(n))
+        backlog[name] -= 1
+        rotation.served(name)
+        served.append(name)
+    return served
+
+
+def test_queue_names():
+    assert tenant_queue_name(12) == "uploads:12"
+    assert tenant_queue_name(0) == UPLOAD_QUEUE
+    assert queue_tenant("uploads:12") == 12
+    assert queue_tenant(UPLOAD_QUEUE) is None
+    assert queue_tenant(UPLOAD_LOW_QUEUE) is None
+
+
+def test_parse_weights_ignores_malformed_items():
+    assert parse_weights("12:3, 7:2,x:1,,5:0") == {12: 3, 7: 2, 5: 1}
+    assert parse_weights("") == {}
+
+
+def test_small_tenant_is_not_starved_by_backfill():
+    rotation = TenantRotation(
+        [UPLOAD_QUEUE, "uploads:1", "uploads:2", UPLOAD_LOW_QUEUE], weights={}
+    )
+    backlog = {"uploads:1": 2000, "uploads:2": 2, UPLOAD_LOW_QUEUE: 10}
+
+    served = _serve(rotation, backlog, 4)
+
+    assert served == ["uploads:1", "uploads:2", "uploads:1", "uploads:2"]
+    assert rotation.order[-1] == UPLOAD_LOW_QUEUE
+
+
+def test_weights_give_consecutive_turns():
+    rotation = TenantRotation(["uploads:1", "uploads:2"], weights={1: 3})
+    backlog = {"uploads:1": 100, "uploads:2": 100}
+
+    served = _serve(rotation, backlog, 8)
+
+    assert served == ["uploads:1"] * 3 + ["uploads:2"] + ["uploads:1"] * 3 + [
+        "uploads:2"
+    ]
+
+
+def test_new_tenants_join_the_back():
+    rotation = TenantRotation([UPLOAD_QUEUE, "uploads:1", UPLOAD_LOW_QUEUE])
+
+    assert rotation.update([*rotation.order, "uploads:9"])
+    assert not rotation.update([*rotation.order, "uploads:9"])
+    assert rotation.order == [UPLOAD_QUEUE, "uploads:1", "uploads:9", UPLOAD_LOW_QUEUE]
+
+
+def test_queue_depths_per_tenant():
+    redis = FakeRedis({"rq:queue:uploads:7": 3, "rq:queue:uploads": 1})
+    tenant_queue(redis, 7)
+
+    assert queue_depths(redis) == [
+        {"queue": UPLOAD_QUEUE, "empresa_id": None, "queued": 1},
+        {"queue": "uploads:7", "empresa_id": 7, "queued": 3},
+        {"queue": UPLOAD_LOW_QUEUE, "empresa_id": None, "queued": 0},
+    ]
@@ -1,4 +1,4 @@
-import io
+import contextlib
 import io
 import sys
 from pathlib import Path
@@ -17,6 +17,9 @@ class DummyPage:
     def extract_text(self):
         return self._text
 
+    def close(self):
+        pass
+
 
 class DummyPDF:
     def __init__(self, text: str):
@@ -81,6 +84,33 @@ def test_parse_image_pdf(monkeypatch):
     assert result["transactions"][0]["data_ref"] == "01/01/2023"
 
 
+def test_parse_times_each_stage(monkeypatch):
+    monkeypatch.setattr("parsers.sicoob.pdfplumber.open", lambda *a, **k: DummyPDF(""))
+    monkeypatch.setattr("parsers.sicoob.convert_from_bytes", lambda *a, **k: [object()])
+    monkeypatch.setattr("parsers.sicoob.image_to_string", lambda *a, **k: TEXT_CONTENT)
+    stages = []
+
+    def timed(stage):
+        stages.append(stage)
+        return contextlib.nullcontext()
+
+    parse(io.BytesIO(b""), timed=timed)
+
+    assert stages == ["read", "extract", "ocr", "regex"]
+
+
+def test_parse_reports_pages(monkeypatch):
+    def fake_open(*args, **kwargs):
+        return DummyPDF(TEXT_CONTENT)
+
+    monkeypatch.setattr("parsers.sicoob.pdfplumber.open", fake_open)
+    seen = []
+
+    parse(io.BytesIO(b""), on_page=lambda number, total: seen.append((number, total)))
+
+    assert seen == [(1, 1)]
+
+
 def test_parse_missing_header(monkeypatch):
     def fake_open(*args, **kwargs):
         return DummyPDF("irrelevant text")
@@ -0,0 +1,104 @@
+import io
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+import pytest
+
+from backend.storage import LocalStorage, S3Storage, StorageError, content_key
+
+
+class NotFound(Exception):
+    response = {"Error": {"Code": "404"}}
+
+
+class FakeS3:
+    """In-memory stand-in for the subset of the S3 API used by the driver."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise NotFound()
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.calls.append("put_object")
+        self.objects[(Bucket, Key)] = Body
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.calls.append("create_multipart_upload")
+        self.uploads["u1"] = {}
+        return {"UploadId": "u1"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.calls.append("upload_part")
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"etag{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        self.objects[(Bucket, Key)] = b"".join(parts[n] for n in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+
+    def get_object(self, Bucket, Key, Range):
+        self.calls.append(Range)
+        start, end = map(int, Range[len("bytes=") :].split("-"))
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)][start : end + 1])}
+
+
+def test_local_storage_dedupes_by_content(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+
+    first = storage.put(io.BytesIO(b"%PDF-1.4 a"))
+    second = storage.put(io.BytesIO(b"%PDF-1.4 a"))
+
+    assert first.uri == second.uri
+    assert (first.created, second.created) == (True, False)
+    assert first.uri.endswith(content_key(first.sha256))
+    assert storage.open(first.uri).read() == b"%PDF-1.4 a"
+    assert [p.name for p in tmp_path.iterdir()] == [first.sha256[:2]]
+
+
+def test_local_storage_errors(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+
+    with pytest.raises(StorageError):
+        LocalStorage(str(blocker)).put(io.BytesIO(b"x"))
+
+
+def test_s3_multipart_upload_and_ranged_reads():
+    client = FakeS3()
+    storage = S3Storage("bucket", prefix="p/", client=client, part_size=4, read_chunk=3)
+    data = b"0123456789"
+
+    stored = storage.put(io.BytesIO(data))
+
+    assert stored.uri == f"s3://bucket/p/{content_key(stored.sha256)}"
+    assert client.calls.count("upload_part") == 3
+    assert not storage.put(io.BytesIO(data)).created
+
+    client.calls.clear()
+    with storage.open(stored.uri) as f:
+        assert f.read(2) == b"01"
+        f.seek(8)
+        assert f.read() == b"89"
+    assert client.calls == ["bytes=0-2", "bytes=8-9"]
+
+
+def test_s3_small_files_use_a_single_put():
+    client = FakeS3()
+    storage = S3Storage("bucket", prefix="", client=client, part_size=1024)
+
+    stored = storage.put(io.BytesIO(b"%PDF"))
+
+    assert client.calls == ["put_object"]
+    assert storage.open(stored.uri).read() == b"%PDF"
@@ -0,0 +1,84 @@
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import Base
+from backend.models import Contrato, Empresa, Extrato, Movimentacao, ResumoContrato
+from backend.summaries import apply_import, rebuild_summary
+
+
+def _session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    empresa = Empresa(nome="Resumo", cnpj="42")
+    session.add(empresa)
+    session.flush()
+    contrato = Contrato(
+        empresa_id=empresa.id,
+        numero="1",
+        banco="Sicoob",
+        saldo=1000.0,
+        taxa_anual=0.1,
+        data_inicio=date(2023, 1, 1),
+    )
+    session.add(contrato)
+    session.flush()
+    return session, contrato.id
+
+
+def _import(session, contrato_id, rows):
+    extrato = Extrato(contrato_id=contrato_id, filepath="f", status="importado")
+    session.add(extrato)
+    session.flush()
+    rows = [dict(row, extrato_id=extrato.id) for row in rows]
+    session.add_all(Movimentacao(**row) for row in rows)
+    apply_import(session, contrato_id, rows, datetime(2023, 3, 1))
+    session.flush()
+
+
+def test_apply_import_accumulates_and_keeps_latest_balance():
+    session, contrato_id = _session()
+    _import(
+        session,
+        contrato_id,
+        [
+            {"data_lanc": date(2023, 2, 1), "valor_debito": 10.0, "saldo": 990.0},
+            {"data_lanc": date(2023, 2, 5), "valor_credito": 5.0, "saldo": 995.0},
+        ],
+    )
+    # An older statement imported later must not replace the balance.
+    _import(
+        session,
+        contrato_id,
+        [{"data_lanc": date(2023, 1, 10), "valor_debito": 20.0, "saldo": 980.0}],
+    )
+    session.expire_all()
+
+    resumo = session.get(ResumoContrato, contrato_id)
+    assert resumo.movimentacoes == 3
+    assert resumo.total_debitos == 30.0
+    assert resumo.total_creditos == 5.0
+    assert (resumo.data_saldo, resumo.saldo) == (date(2023, 2, 5), 995.0)
+    assert resumo.ultima_importacao == datetime(2023, 3, 1)
+
+    incremental = (
+        resumo.movimentacoes,
+        resumo.total_debitos,
+        resumo.total_creditos,
+        resumo.saldo,
+        resumo.data_saldo,
+    )
+    rebuilt = rebuild_summary(session, contrato_id)
+    assert (
+        rebuilt.movimentacoes,
+        rebuilt.total_debitos,
+        rebuilt.total_creditos,
+        rebuilt.saldo,
+        rebuilt.data_saldo,
+    ) == incremental
@@ -1,4 +1,6 @@
-from datetime import date
+import json
+import os
+from datetime import date, datetime
 from pathlib import Path
 
 from sqlalchemy import create_engine
@@ -6,14 +8,30 @@ from sqlalchemy.orm import sessionmaker
 
 from backend.db import Base
 from backend import tasks
+from backend.inflight import MemoryStore, UploadRegistry
+from backend.limits import JobGuard
 from backend.parsers import ParserNotFoundError
 from fastapi import HTTPException
-from backend.models import Contrato, Empresa, Extrato
+from backend.classification import valid_versions
+from backend.models import (
+    Contrato,
+    Empresa,
+    Extrato,
+    FechamentoJuros,
+    JurosDiario,
+    Movimentacao,
+    RegrasContabeis,
+    ResumoContrato,
+    TaxaContrato,
+)
+from backend import rules
 import pytest
 
 
 def _setup_db(tmp_path):
-    engine = create_engine(f"sqlite:///{tmp_path}/test.db", connect_args={"check_same_thread": False})
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/test.db", connect_args={"check_same_thread": False}
+    )
     TestingSessionLocal = sessionmaker(bind=engine)
     Base.metadata.create_all(bind=engine)
     return TestingSessionLocal
@@ -22,7 +40,9 @@ def _setup_db(tmp_path):
 def test_parse_sicoob_invalid_contract(tmp_path, monkeypatch):
     Session = _setup_db(tmp_path)
     monkeypatch.setattr(tasks, "SessionLocal", Session)
-    monkeypatch.setattr(tasks, "parse", lambda *args, **kwargs: {"header": [], "transactions": []})
+    monkeypatch.setattr(
+        tasks, "parse", lambda *args, **kwargs: {"header": [], "transactions": []}
+    )
 
     pdf_path = Path(tmp_path) / "dummy.pdf"
     pdf_path.write_bytes(b"%PDF-1.4")
@@ -58,6 +78,7 @@ def test_parse_sicoob_persists_data(tmp_path, monkeypatch):
     session.add(contrato)
     session.commit()
     contrato_id = contrato.id
+    empresa_id = empresa.id
     session.close()
 
     monkeypatch.setattr(
@@ -81,8 +102,12 @@ def test_parse_sicoob_persists_data(tmp_path, monkeypatch):
     pdf_path = Path(tmp_path) / "dummy.pdf"
     pdf_path.write_bytes(b"%PDF-1.4")
 
+    invalidated = []
+    monkeypatch.setattr(tasks.export_cache, "invalidate", invalidated.append)
+
     result = tasks.parse_sicoob(str(pdf_path), contract_id=contrato_id)
     assert result["transactions"]
+    assert invalidated == [f"empresa{empresa_id}"]
 
     session = Session()
     extratos = session.query(Extrato).all()
@@ -90,6 +115,151 @@ def test_parse_sicoob_persists_data(tmp_path, monkeypatch):
 
     assert len(extratos) == 1
     assert extratos[0].contrato_id == contrato_id
+    assert extratos[0].meta["movimentacoes"] == 1
+    assert "insert" in extratos[0].meta["tempos"]
+
+    session = Session()
+    resumo = session.get(ResumoContrato, contrato_id)
+    session.close()
+
+    assert (resumo.movimentacoes, resumo.total_creditos, resumo.saldo) == (1, 1.0, 1.0)
+    assert resumo.ultima_importacao is not None
+
+
+def test_parse_sicoob_page_limit_marks_extrato(tmp_path, monkeypatch):
+    Session = _setup_db(tmp_path)
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+    monkeypatch.setattr(tasks, "JobGuard", lambda: JobGuard(max_pages=10))
+
+    def fake_parse(name, stream, on_page=None, timed=None):
+        on_page(1, 11)
+
+    monkeypatch.setattr(tasks, "parse", fake_parse)
+
+    pdf_path = Path(tmp_path) / "dummy.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+
+    result = tasks.parse_sicoob(str(pdf_path))
+    assert result["status"] == "erro"
+
+    session = Session()
+    extrato = session.query(Extrato).one()
+    session.close()
+
+    assert extrato.status == "erro"
+    assert extrato.meta["limite"] == "paginas"
+
+
+def test_parse_sicoob_memory_limit_stops_before_commit(tmp_path, monkeypatch):
+    Session = _setup_db(tmp_path)
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+    monkeypatch.setattr(tasks, "JobGuard", lambda: JobGuard(max_rss_mb=1))
+    monkeypatch.setattr(tasks, "upload_registry", UploadRegistry(MemoryStore()))
+    monkeypatch.setattr(
+        tasks,
+        "parse",
+        lambda *args, **kwargs: {
+            "header": [],
+            "transactions": [
+                {"data_ref": "01/01/2023", "data_lanc": "01/01/2023", "saldo": 1.0}
+            ],
+        },
+    )
+
+    pdf_path = Path(tmp_path) / "dummy.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+
+    session = Session()
+    extrato = Extrato(filepath=str(pdf_path), status="fila")
+    session.add(extrato)
+    session.commit()
+    extrato_id = extrato.id
+    session.close()
+
+    result = tasks.parse_sicoob(str(pdf_path), extrato_id=extrato_id)
+    assert result["limite"] == "memoria"
+
+    session = Session()
+    extrato = session.get(Extrato, extrato_id)
+    movimentos = session.query(Movimentacao).count()
+    session.close()
+
+    assert (extrato.status, extrato.meta["limite"]) == ("erro", "memoria")
+    assert movimentos == 0
+
+
+def test_parse_sicoob_cancelled_between_pages(tmp_path, monkeypatch):
+    Session = _setup_db(tmp_path)
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+    registry = UploadRegistry(MemoryStore())
+    monkeypatch.setattr(tasks, "upload_registry", registry)
+
+    pdf_path = Path(tmp_path) / "dummy.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    session = Session()
+    empresa = Empresa(nome="ACME", cnpj="123")
+    session.add(empresa)
+    session.flush()
+    contrato = Contrato(
+        empresa_id=empresa.id,
+        numero="1",
+        banco="Sicoob",
+        saldo=1000.0,
+        taxa_anual=0.1,
+        data_inicio=date(2023, 1, 1),
+    )
+    session.add(contrato)
+    session.flush()
+    extrato = Extrato(
+        filepath=str(pdf_path),
+        contrato_id=contrato.id,
+        status="fila",
+        meta={"sha256": "ab"},
+    )
+    session.add(extrato)
+    session.commit()
+    contrato_id, extrato_id = contrato.id, extrato.id
+    session.close()
+    assert registry.claim("ab", contrato_id, extrato_id) is None
+
+    def fake_parse(name, stream, on_page=None, timed=None):
+        on_page(1, 3)
+        registry.cancel(extrato_id)
+        on_page(2, 3)
+        raise AssertionError("parse should have stopped")
+
+    monkeypatch.setattr(tasks, "parse", fake_parse)
+
+    result = tasks.parse_sicoob(str(pdf_path), extrato_id=extrato_id)
+    assert result == {"status": "cancelado"}
+
+    session = Session()
+    extrato = session.get(Extrato, extrato_id)
+    session.close()
+    assert extrato.status == "cancelado"
+    assert registry.inflight("ab", contrato_id) is None
+
+
+def test_abandon_import_closes_queued_extrato(tmp_path, monkeypatch):
+    Session = _setup_db(tmp_path)
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+    registry = UploadRegistry(MemoryStore())
+    monkeypatch.setattr(tasks, "upload_registry", registry)
+    session = Session()
+    extrato = Extrato(filepath="x.pdf", status="fila", meta={"sha256": "ab"})
+    session.add(extrato)
+    session.commit()
+    extrato_id = extrato.id
+    session.close()
+    registry.claim("ab", None, extrato_id)
+
+    tasks.abandon_import(extrato_id, "morto")
+
+    session = Session()
+    extrato = session.get(Extrato, extrato_id)
+    session.close()
+    assert (extrato.status, extrato.meta) == ("erro", {"error": "morto"})
+    assert registry.inflight("ab", None) is None
 
 
 def test_parse_sicoob_unknown_parser(tmp_path, monkeypatch):
@@ -148,3 +318,294 @@ def test_parse_sicoob_parser_error_marks_pending_review(tmp_path, monkeypatch):
     session.close()
 
     assert extrato.status == "pendente revisão"
+
+
+def test_parse_sicoob_persists_classification(tmp_path, monkeypatch):
+    Session = _setup_db(tmp_path)
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+    monkeypatch.setattr(
+        tasks,
+        "parse",
+        lambda *args, **kwargs: {
+            "header": ["Sicoob"],
+            "transactions": [
+                {
+                    "data_ref": "01/01/2023",
+                    "data_lanc": "01/01/2023",
+                    "descricao": "JUROS CONTRATO",
+                    "valor_debito": 10.0,
+                    "valor_credito": None,
+                    "saldo": 990.0,
+                }
+            ],
+        },
+    )
+
+    pdf_path = Path(tmp_path) / "dummy.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    tasks.parse_sicoob(str(pdf_path))
+
+    session = Session()
+    mov = session.query(Movimentacao).one()
+    session.close()
+
+    assert (mov.conta_debito, mov.conta_credito) == ("631", "111")
+    assert mov.regras_versao == rules.current_version()
+    session = Session()
+    registro = session.get(RegrasContabeis, mov.regras_versao)
+    session.close()
+    assert registro.config == rules.get_engine().snapshot().config
+
+
+def test_parse_sicoob_classifies_with_one_ruleset(tmp_path, monkeypatch):
+    Session = _setup_db(tmp_path)
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+    monkeypatch.setattr(rules, "RELOAD_INTERVAL", 0)
+    cfg_file = tmp_path / "rules.json"
+
+    def write_rules(accounts):
+        cfg_file.write_text(
+            json.dumps(
+                {
+                    "account_map": {"juros": accounts},
+                    "classify_rules": [{"keyword": "juros", "account": "juros"}],
+                }
+            )
+        )
+
+    write_rules(["631", "111"])
+    engine = rules.RulesEngine(str(cfg_file))
+    monkeypatch.setattr(tasks, "get_engine", lambda: engine)
+    versao = engine.version
+
+    class ReloadingTx(dict):
+        """Changes the rules file just before its description is read."""
+
+        def get(self, key, default=None):
+            if key == "descricao":
+                write_rules(["999", "999"])
+                stat = cfg_file.stat()
+                os.utime(cfg_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            return super().get(key, default)
+
+    tx = {"data_lanc": "01/01/2023", "valor_debito": 10.0}
+    monkeypatch.setattr(
+        tasks,
+        "parse",
+        lambda *args, **kwargs: {
+            "header": ["Sicoob"],
+            "transactions": [
+                {**tx, "descricao": "JUROS 1"},
+                ReloadingTx(tx, descricao="JUROS 2"),
+                {**tx, "descricao": "JUROS 3"},
+            ],
+        },
+    )
+    pdf_path = Path(tmp_path) / "dummy.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    tasks.parse_sicoob(str(pdf_path))
+
+    session = Session()
+    movs = session.query(Movimentacao).all()
+    registro = session.get(RegrasContabeis, versao)
+    session.close()
+
+    # The file changed midway, but every row matches the version it carries.
+    assert engine.version != versao
+    assert {(m.conta_debito, m.regras_versao) for m in movs} == {("631", versao)}
+    assert registro.config["account_map"]["juros"] == ["631", "111"]
+
+
+def test_reclassify_updates_stale_rows(tmp_path, monkeypatch):
+    Session = _setup_db(tmp_path)
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+
+    session = Session()
+    extrato = Extrato(contrato_id=None, filepath="dummy", status="importado")
+    session.add(extrato)
+    session.flush()
+    session.add_all(
+        [
+            Movimentacao(
+                extrato_id=extrato.id,
+                descricao="liberacao de credito",
+                conta_debito="999",
+                conta_credito="999",
+                regras_versao="old",
+            ),
+            Movimentacao(
+                extrato_id=extrato.id,
+                descricao="amortizacao",
+                conta_debito="211",
+                conta_credito="111",
+                regras_versao=rules.current_version(),
+            ),
+            Movimentacao(extrato_id=extrato.id, descricao="juros"),
+        ]
+    )
+    session.commit()
+    session.close()
+
+    assert tasks.reclassify_movimentacoes(batch_size=1) == 2
+
+    session = Session()
+    movs = {m.descricao: m for m in session.query(Movimentacao).all()}
+    session.close()
+
+    assert movs["liberacao de credito"].conta_debito == "111"
+    assert movs["juros"].conta_credito == "111"
+    assert all(m.regras_versao == rules.current_version() for m in movs.values())
+    # The current version is now applied: later runs return at once.
+    assert tasks.reclassify_movimentacoes() == 0
+
+
+def test_reclassify_only_rows_affected_by_the_change(tmp_path, monkeypatch):
+    Session = _setup_db(tmp_path)
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+    atual = rules.get_engine().snapshot().config
+    # Same rules except for the accounts of "juros".
+    antiga = {
+        "account_map": {**atual["account_map"], "juros": ["999", "999"]},
+        "classify_rules": atual["classify_rules"],
+    }
+
+    session = Session()
+    session.add(
+        RegrasContabeis(
+            versao="old", config=antiga, registrada_em=datetime(2026, 1, 1)
+        )
+    )
+    extrato = Extrato(contrato_id=None, filepath="dummy", status="importado")
+    session.add(extrato)
+    session.flush()
+    session.add_all(
+        [
+            Movimentacao(
+                extrato_id=extrato.id,
+                descricao="JUROS CONTRATO",
+                conta_debito="999",
+                conta_credito="999",
+                regras_versao="old",
+            ),
+            Movimentacao(
+                extrato_id=extrato.id,
+                descricao="amortizacao",
+                conta_debito="211",
+                conta_credito="111",
+                regras_versao="old",
+            ),
+        ]
+    )
+    session.commit()
+    session.close()
+
+    assert tasks.reclassify_movimentacoes() == 1
+
+    session = Session()
+    movs = {m.descricao: m for m in session.query(Movimentacao).all()}
+    versoes = valid_versions(session, rules.current_version())
+    session.close()
+
+    assert movs["JUROS CONTRATO"].conta_debito == "631"
+    assert movs["JUROS CONTRATO"].regras_versao == rules.current_version()
+    # Untouched: "amort" maps to the same accounts in both versions.
+    assert movs["amortizacao"].regras_versao == "old"
+    assert versoes == {rules.current_version(), "old"}
+
+
+def test_purge_contract_deletes_in_batches(tmp_path, monkeypatch):
+    Session = _setup_db(tmp_path)
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+    invalidated = []
+    monkeypatch.setattr(tasks.export_cache, "invalidate", invalidated.append)
+    monkeypatch.setattr(tasks.contract_cache, "invalidate", lambda: None)
+
+    session = Session()
+    empresa = Empresa(nome="Purge", cnpj="987")
+    session.add(empresa)
+    session.flush()
+    contratos = [
+        Contrato(
+            empresa_id=empresa.id,
+            numero=numero,
+            banco="Sicoob",
+            saldo=1000.0,
+            taxa_anual=0.1,
+            data_inicio=date(2023, 1, 1),
+        )
+        for numero in ("1", "2")
+    ]
+    session.add_all(contratos)
+    session.flush()
+    for contrato in contratos:
+        extrato = Extrato(contrato_id=contrato.id, filepath="f", status="importado")
+        session.add(extrato)
+        session.flush()
+        session.add_all(
+            [Movimentacao(extrato_id=extrato.id, descricao="x") for _ in range(5)]
+        )
+        session.add(
+            TaxaContrato(
+                contrato_id=contrato.id, vigencia=date(2023, 6, 1), taxa_anual=0.2
+            )
+        )
+        session.add(
+            JurosDiario(
+                contrato_id=contrato.id,
+                data=date(2023, 1, 1),
+                saldo=1000.0,
+                taxa_anual=0.1,
+                juros=0.27,
+            )
+        )
+        session.add(ResumoContrato(contrato_id=contrato.id, movimentacoes=5))
+    session.commit()
+    removido, mantido = contratos[0].id, contratos[1].id
+    empresa_id = empresa.id
+    session.close()
+
+    assert tasks.purge_contract(removido, batch_size=2) == 5
+    assert tasks.purge_contract(removido) == 0
+
+    session = Session()
+    assert session.get(Contrato, removido) is None
+    assert session.query(Contrato).one().id == mantido
+    assert session.query(Extrato).count() == 1
+    assert session.query(Movimentacao).count() == 5
+    assert session.query(TaxaContrato).count() == 1
+    assert session.query(JurosDiario).count() == 1
+    assert session.query(ResumoContrato).one().contrato_id == mantido
+    session.close()
+    assert invalidated == [f"empresa{empresa_id}"]
+
+
+def test_refresh_ledger_recomputes_from_since(tmp_path, monkeypatch):
+    Session = _setup_db(tmp_path)
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+    session = Session()
+    empresa = Empresa(nome="ACME", cnpj="1")
+    session.add(empresa)
+    session.flush()
+    contrato = Contrato(
+        empresa_id=empresa.id,
+        numero="1",
+        banco="Sicoob",
+        saldo=3650.0,
+        taxa_anual=0.1,
+        data_inicio=date(2023, 1, 1),
+    )
+    session.add(contrato)
+    session.add(
+        FechamentoJuros(fechado_ate=date(2023, 1, 10), executado_em=datetime.now())
+    )
+    session.commit()
+    contrato_id = contrato.id
+    session.close()
+
+    assert tasks.refresh_ledger(contrato_id) == 10
+    assert tasks.refresh_ledger(contrato_id, "2023-01-09") == 2
+
+    session = Session()
+    rows = session.query(JurosDiario).count()
+    session.close()
+    assert rows == 10
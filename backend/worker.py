@@ -1,15 +1,107 @@
-from rq import Connection, Worker, Queue
+import logging
+import os
+import sys
+
+from redis.exceptions import RedisError
+from rq.job import Job
 
 from backend.config import get_redis
+from backend.metrics import collect, remove_stale_files, replay
+from backend.metrics import serve as serve_metrics
+from backend.scheduling import UPLOAD_LOW_QUEUE, UPLOAD_QUEUE, FairWorker
+from backend.tasks import abandon_import
+
+logger = logging.getLogger(__name__)
+
+# Shared queues; per-empresa queues ("uploads:<empresa_id>") are discovered by
+# the worker and served round-robin. "uploads-low" is only drained when every
+# other queue is empty.
+listen = [UPLOAD_QUEUE, UPLOAD_LOW_QUEUE]
+
+# The worker process restarts itself after this many jobs (0 disables it).
+# Statements are parsed in a forked work horse whose memory is returned when
+# it exits, so there is no memory check here: JOB_MAX_RSS_MB bounds the horse.
+WORKER_MAX_JOBS = int(os.environ.get("WORKER_MAX_JOBS", 200))
+# Port of the worker's Prometheus endpoint (0 disables it).
+WORKER_METRICS_PORT = int(os.environ.get("WORKER_METRICS_PORT", 9200))
+
+
+# Job meta key carrying a job's metric observations from the work horse.
+METRICS_META = "metricas"
+
+
+class MetricsJob(Job):
+    """Job whose metric observations are handed to the worker process.
+
+    Each work horse is a new process; recording there would leave one set of
+    Prometheus files per job (or lose the values). The horse stores them in
+    the job's meta instead and :class:`RecyclingWorker` replays them.
+    """
+
+    def perform(self):
+        with collect() as observed:
+            try:
+                return super().perform()
+            finally:
+                if observed:
+                    self.meta[METRICS_META] = observed
+                    self.save_meta()
+
+
+class RecyclingWorker(FairWorker):
+    """Fair worker that stops between jobs when it is due for a restart."""
+
+    job_class = MetricsJob
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.jobs_executed = 0
+        self.recycle = False
+
+    def recycle_reason(self):
+        if WORKER_MAX_JOBS and self.jobs_executed >= WORKER_MAX_JOBS:
+            return f"{self.jobs_executed} jobs executados"
+        return None
+
+    def handle_work_horse_killed(self, job, retpid, ret_val, rusage) -> None:
+        super().handle_work_horse_killed(job, retpid, ret_val, rusage)
+        if job.func_name != "tasks.parse_sicoob":
+            return
+        extrato_id = job.kwargs.get("extrato_id", (job.args[2:3] or [None])[0])
+        if extrato_id is not None:
+            abandon_import(extrato_id, "Importação interrompida pelo worker")
+
+    def execute_job(self, job, queue) -> None:
+        super().execute_job(job, queue)
+        self.replay_metrics(job)
+        self.jobs_executed += 1
+        reason = self.recycle_reason()
+        if reason:
+            logger.info("Reiniciando worker %s: %s", self.name, reason)
+            self.recycle = True
+            # Checked by the work loop before the next dequeue.
+            self._stop_requested = True
 
-listen = ["uploads"]
+    def replay_metrics(self, job) -> None:
+        try:
+            observed = job.get_meta(refresh=True).get(METRICS_META)
+        except RedisError as exc:
+            logger.warning("Falha ao ler métricas do job %s: %s", job.id, exc)
+            return
+        if observed:
+            replay(observed)
 
 
 def run_worker() -> None:
+    remove_stale_files()
+    if WORKER_METRICS_PORT:
+        serve_metrics(WORKER_METRICS_PORT)
     redis_conn = get_redis()
-    with Connection(redis_conn):
-        worker = Worker(list(map(Queue, listen)))
-        worker.work()
+    worker = RecyclingWorker(listen, connection=redis_conn)
+    worker.work()
+    if worker.recycle:
+        # A fresh interpreter returns the memory the old one kept.
+        os.execv(sys.executable, [sys.executable, "-m", "backend.worker"])
 
 
 if __name__ == "__main__":